@@ -1,10 +1,25 @@
+import asyncio
+import logging
+
 import aiohttp
 
+logger = logging.getLogger(__name__)
+
+# 等待停止事件后清除下载结果的 GID 上限，防止事件丢失时无限增长
+_MAX_PENDING_CLEARS = 1024
+# 已 forceRemove、等待 aria2 停止事件后清除下载结果的 GID（按插入顺序淘汰）。
+# 在模块级共享：取消接口、sync 循环和监听器可能持有不同的客户端实例，配置变化时
+# 客户端也会被替换
+_pending_clears: dict[str, None] = {}
+
 
 class Aria2Client:
     def __init__(self, rpc_url: str, secret: str = "") -> None:
         self._rpc_url = rpc_url
         self._secret = secret
+        # 持久会话复用连接池；会话绑定创建它的事件循环，循环变化时重新创建
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
 
     def _build_params(self, params: list) -> list:
         if self._secret:
@@ -12,19 +27,33 @@ class Aria2Client:
         return params
 
     async def _call(self, method: str, params: list | None = None) -> dict:
+        return await self._post(method, self._build_params(params or []))
+
+    async def _post(self, method: str, params: list) -> dict:
         payload = {
             "jsonrpc": "2.0",
             "id": "aria2",
             "method": method,
-            "params": self._build_params(params or []),
+            "params": params,
         }
-        timeout = aiohttp.ClientTimeout(total=30)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(self._rpc_url, json=payload) as resp:
-                data = await resp.json()
-                if "error" in data:
-                    raise RuntimeError(data["error"])
-                return data["result"]
+        async with self._get_session().post(self._rpc_url, json=payload) as resp:
+            data = await resp.json()
+            if "error" in data:
+                raise RuntimeError(data["error"])
+            return data["result"]
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+            self._session_loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        """关闭持久会话及其连接池（关闭应用或客户端被替换时调用）"""
+        session, self._session = self._session, None
+        if session is not None and not session.closed and self._session_loop is asyncio.get_running_loop():
+            await session.close()
 
     async def add_uri(self, uris: list[str], options: dict | None = None) -> str:
         params = [uris]
@@ -54,8 +83,72 @@ class Aria2Client:
             params.append(options)
         return await self._call("aria2.addTorrent", params)
 
-    async def tell_status(self, gid: str) -> dict:
-        return await self._call("aria2.tellStatus", [gid])
+    async def tell_status(self, gid: str, clear_removed: bool = False) -> dict:
+        """查询任务状态
+
+        Args:
+            gid: 任务 GID
+            clear_removed: 为 True 且该任务由 force_remove_and_clear 移除时，在同一个
+                system.multicall 中清除其下载结果（任务停止事件中使用）
+        """
+        if not clear_removed or gid not in _pending_clears:
+            return await self._call("aria2.tellStatus", [gid])
+        del _pending_clears[gid]
+        status, cleared = await self._multicall([
+            ("aria2.tellStatus", [gid]),
+            ("aria2.removeDownloadResult", [gid]),
+        ])
+        if isinstance(cleared, RuntimeError):
+            logger.warning(f"[Aria2] 清除 GID {gid} 的下载结果失败: {cleared}")
+        if isinstance(status, RuntimeError):
+            raise status
+        return status
+
+    async def _multicall(self, calls: list[tuple[str, list]]) -> list:
+        """通过 system.multicall 一次请求执行多个调用
+
+        Returns:
+            与 calls 顺序一致的结果列表，单个调用失败时对应位置为 RuntimeError
+        """
+        if not calls:
+            return []
+        # system.multicall 本身不接受 token，token 放在每个子调用的参数中
+        payload = [
+            {"methodName": method, "params": self._build_params(params)}
+            for method, params in calls
+        ]
+        results = await self._post("system.multicall", [payload])
+        return [
+            result[0] if isinstance(result, list) else RuntimeError(result)
+            for result in results
+        ]
+
+    async def multi_tell_status(self, gids: list[str]) -> list[dict | RuntimeError]:
+        """通过 system.multicall 一次请求批量查询任务状态
+
+        Args:
+            gids: 任务 GID 列表
+
+        Returns:
+            与 gids 顺序一致的结果列表，单个任务查询失败时对应位置为 RuntimeError
+        """
+        return await self._multicall([("aria2.tellStatus", [gid]) for gid in gids])
+
+    async def force_remove_and_clear(self, gid: str) -> None:
+        """强制移除任务并清除其下载结果
+
+        任务已停止时 forceRemove 失败，直接清除下载结果；活动任务由 aria2 异步停止，
+        此时立即 removeDownloadResult 会失败，改为记录 GID，等监听器收到停止事件后
+        与 tellStatus 合并为一次 system.multicall 清除。
+        """
+        try:
+            await self.force_remove(gid)
+        except RuntimeError:
+            await self.remove_download_result(gid)
+            return
+        _pending_clears[gid] = None
+        if len(_pending_clears) > _MAX_PENDING_CLEARS:
+            del _pending_clears[next(iter(_pending_clears))]
 
     async def pause(self, gid: str) -> str:
         return await self._call("aria2.pause", [gid])
@@ -3,6 +3,7 @@
 将 aria2 的错误码映射为用户友好的中文提示。
 参考: https://aria2.github.io/manual/en/html/aria2c.html#exit-status
 """
+import re
 
 # aria2 错误码到中文描述的映射
 ERROR_CODE_MAP: dict[int, str] = {
@@ -41,6 +42,30 @@ ERROR_CODE_MAP: dict[int, str] = {
     32: "校验和验证失败",
 }
 
+# 错误码提取正则
+_ERROR_CODE_RE = re.compile(r'errorCode[=:\s]*(\d+)', re.IGNORECASE)
+
+# 常见错误消息模式（按顺序匹配，已转为小写后比较）
+_ERROR_PATTERNS: list[tuple[re.Pattern, str]] = [
+    (re.compile(pattern), message)
+    for pattern, message in (
+        (r'timeout', "网络超时"),
+        (r'404|not found', "资源未找到 (404)"),
+        (r'403|forbidden', "访问被拒绝 (403)"),
+        (r'401|unauthorized', "需要认证 (401)"),
+        (r'500|internal server error', "服务器内部错误 (500)"),
+        (r'502|bad gateway', "网关错误 (502)"),
+        (r'503|service unavailable', "服务不可用 (503)"),
+        (r'dns|name.*resolution', "DNS 解析失败"),
+        (r'connection refused', "连接被拒绝"),
+        (r'connection reset', "连接被重置"),
+        (r'no space', "磁盘空间不足"),
+        (r'permission denied', "权限不足"),
+        (r'ssl|certificate', "SSL/TLS 证书错误"),
+        (r'too many redirect', "重定向次数过多"),
+    )
+]
+
 
 def get_error_message(error_code: int | str | None, fallback: str | None = None) -> str:
     """获取错误码对应的中文描述
@@ -77,10 +102,9 @@ def parse_error_message(aria2_error: str | None) -> str:
 
     # aria2 错误消息格式通常是 "errorCode=X errorMessage=..."
     # 或直接是错误描述
-    import re
 
     # 尝试提取错误码
-    match = re.search(r'errorCode[=:\s]*(\d+)', aria2_error, re.IGNORECASE)
+    match = _ERROR_CODE_RE.search(aria2_error)
     if match:
         code = int(match.group(1))
         translated = ERROR_CODE_MAP.get(code)
@@ -88,26 +112,9 @@ def parse_error_message(aria2_error: str | None) -> str:
             return translated
 
     # 常见错误消息模式匹配
-    error_patterns = [
-        (r'timeout', "网络超时"),
-        (r'404|not found', "资源未找到 (404)"),
-        (r'403|forbidden', "访问被拒绝 (403)"),
-        (r'401|unauthorized', "需要认证 (401)"),
-        (r'500|internal server error', "服务器内部错误 (500)"),
-        (r'502|bad gateway', "网关错误 (502)"),
-        (r'503|service unavailable', "服务不可用 (503)"),
-        (r'dns|name.*resolution', "DNS 解析失败"),
-        (r'connection refused', "连接被拒绝"),
-        (r'connection reset', "连接被重置"),
-        (r'no space', "磁盘空间不足"),
-        (r'permission denied', "权限不足"),
-        (r'ssl|certificate', "SSL/TLS 证书错误"),
-        (r'too many redirect', "重定向次数过多"),
-    ]
-
     aria2_error_lower = aria2_error.lower()
-    for pattern, message in error_patterns:
-        if re.search(pattern, aria2_error_lower):
+    for pattern, message in _ERROR_PATTERNS:
+        if pattern.search(aria2_error_lower):
             return message
 
     # 无法识别，返回通用后端错误提示（避免暴露敏感信息）
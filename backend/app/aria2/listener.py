@@ -91,7 +91,7 @@ async def handle_aria2_event(
     from sqlmodel import select
 
     from app.aria2.errors import parse_error_message
-    from app.core.state import get_aria2_client, get_user_space_lock
+    from app.core.state import get_aria2_client, get_user_space_lock, invalidate_active_tasks
     from app.database import get_session
     from app.models import (
         DownloadTask,
@@ -107,7 +107,8 @@ async def handle_aria2_event(
 
     # 1. 获取 aria2 状态
     try:
-        aria2_status = await client.tell_status(gid)
+        # 已强制移除的任务停止后，在同一次请求中清除其下载结果
+        aria2_status = await client.tell_status(gid, clear_removed=event == "stop")
     except Exception as exc:
         logger.warning(f"获取 GID {gid} 状态失败: {exc}")
         aria2_status = {}
@@ -305,6 +306,7 @@ async def handle_aria2_event(
         await _handle_task_stop_or_error(task_id, error_display)
 
     # 6. 广播到所有订阅者
+    invalidate_active_tasks(state)
     await broadcast_task_update_to_subscribers(state, task_id)
     logger.debug(f"[WS] 事件处理完成: GID={gid}, event={event}, status={new_status}")
 
@@ -553,6 +555,7 @@ async def _cancel_task(
     """取消任务并通知所有订阅者"""
     from sqlmodel import select
 
+    from app.core.state import invalidate_active_tasks
     from app.database import get_session
     from app.models import DownloadTask, UserTaskSubscription, utc_now_str
     from app.routers.tasks import broadcast_task_update_to_subscribers
@@ -562,11 +565,7 @@ async def _cancel_task(
 
     # Stop aria2 task
     try:
-        await client.force_remove(gid)
-    except Exception:
-        pass
-    try:
-        await client.remove_download_result(gid)
+        await client.force_remove_and_clear(gid)
     except Exception:
         pass
 
@@ -630,6 +629,7 @@ async def _cancel_task(
     await cleanup_task_download_dir(task.id)
 
     # Broadcast update
+    invalidate_active_tasks(state)
     await broadcast_task_update_to_subscribers(state, task.id)
 
 
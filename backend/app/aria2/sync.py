@@ -4,19 +4,25 @@
 主要功能：
 - 同步任务进度
 - 检测大小变化（HTTP 下载）
-- 清理孤立任务
+- 清理孤立任务（aria2 中已被外部移除的任务在同一轮轮询中标记为错误，无单独扫描）
 """
 from __future__ import annotations
 
 import asyncio
 import logging
-from pathlib import Path
+import time
+from operator import itemgetter
 
-from sqlalchemy import case, update
+import orjson
+
+from sqlalchemy import bindparam, case, update
+from sqlalchemy.sql.dml import Update
 from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.aria2.client import Aria2Client
 from app.aria2.errors import parse_error_message
+from app.core.fs import preallocate_file
 from app.core.security import sanitize_string
 from app.core.state import AppState
 from app.database import get_session
@@ -24,55 +30,222 @@ from app.models import DownloadTask, User, UserTaskSubscription, utc_now_str
 
 logger = logging.getLogger(__name__)
 
+# 活跃任务快照的最长有效期（秒），用于兜底外部对数据库的修改
+_ACTIVE_TASKS_REFRESH_INTERVAL = 60.0
+# sync 循环轮询的任务状态
+_SYNC_STATUSES = ("queued", "active")
+
+# 单轮任务数达到该值时，状态映射放到线程中执行
+_MAP_OFFLOAD_THRESHOLD = 64
+
+# 只增不减的峰值字段，UPDATE 时使用 CASE 原子比较
+_PEAK_FIELDS = frozenset({"peak_download_speed", "peak_connections"})
+# sync 循环每轮写入的固定字段集合
+_SYNC_UPDATE_FIELDS = frozenset({
+    "status", "name", "total_length", "completed_length",
+    "download_speed", "upload_speed", *_PEAK_FIELDS,
+})
+# 按字段集合缓存的 UPDATE 语句 {frozenset(keys): Update}
+_UPDATE_STMT_CACHE: dict[frozenset, Update] = {}
+
+
+# tellStatus 必定返回的字段，一次 itemgetter 取出
+_STATUS_KEYS = itemgetter(
+    "status", "totalLength", "completedLength", "downloadSpeed", "uploadSpeed"
+)
+
 
-def _sanitize_path(file_path: str | None, task_id: int) -> str | None:
+def _sanitize_path(file_path: str | None) -> str | None:
     """将绝对路径转换为文件名"""
     if not file_path:
         return None
 
-    try:
-        abs_path = Path(file_path)
-        return abs_path.name if abs_path.name else file_path
-    except Exception:
-        return file_path
+    return file_path.rstrip("/").rsplit("/", 1)[-1] or file_path
+
+
+def _status_name(status: dict) -> str | None:
+    """从 aria2 状态中取任务名：BT 取种子名，否则取首个文件的文件名"""
+    bt_name = ((status.get("bittorrent") or {}).get("info") or {}).get("name")
+    if bt_name:
+        return bt_name
+    files = status.get("files")
+    if files:
+        return _sanitize_path(files[0].get("path"))
+    return None
 
 
 def _map_status(status: dict, task_id: int) -> dict:
     """映射 aria2 状态到数据库字段"""
-    raw_name = (
-        status.get("bittorrent", {}).get("info", {}).get("name")
-        or status.get("files", [{}])[0].get("path")
-    )
-
-    sanitized_name = _sanitize_path(raw_name, task_id)
-    sanitized_name = sanitize_string(sanitized_name)
+    try:
+        aria2_status, total, completed, down_speed, up_speed = _STATUS_KEYS(status)
+    except KeyError:
+        get = status.get
+        aria2_status = get("status", "unknown")
+        total = get("totalLength", 0)
+        completed = get("completedLength", 0)
+        down_speed = get("downloadSpeed", 0)
+        up_speed = get("uploadSpeed", 0)
 
     raw_error = status.get("errorMessage")
-    error_display = parse_error_message(raw_error) if raw_error else None
-    error_display = sanitize_string(error_display) if error_display else None
+    error_display = sanitize_string(parse_error_message(raw_error)) if raw_error else None
 
     return {
-        "status": status.get("status", "unknown"),
-        "name": sanitized_name,
-        "total_length": int(status.get("totalLength", 0)),
-        "completed_length": int(status.get("completedLength", 0)),
-        "download_speed": int(status.get("downloadSpeed", 0)),
-        "upload_speed": int(status.get("uploadSpeed", 0)),
+        "status": aria2_status,
+        "name": sanitize_string(_status_name(status)),
+        "total_length": int(total),
+        "completed_length": int(completed),
+        "download_speed": int(down_speed),
+        "upload_speed": int(up_speed),
         "error": raw_error,
         "error_display": error_display,
     }
 
 
+def _map_all(fetched: list[tuple[DownloadTask, dict]]) -> list[dict]:
+    """批量映射 aria2 状态（可在线程中执行）"""
+    return [_map_status(status, task.id) for task, status in fetched]
+
+
+def _update_task_stmt(keys: frozenset) -> Update:
+    """获取指定字段集合的 UPDATE 语句（按字段集合缓存，参数通过 bindparam 传入）"""
+    stmt = _UPDATE_STMT_CACHE.get(keys)
+    if stmt is None:
+        values = {}
+        for key in sorted(keys):
+            param = bindparam(f"v_{key}")
+            if key in _PEAK_FIELDS:
+                column = getattr(DownloadTask, key)
+                values[key] = case((column < param, param), else_=column)
+            else:
+                values[key] = param
+        values["updated_at"] = bindparam("v_updated_at")
+        stmt = (
+            update(DownloadTask)
+            .where(DownloadTask.id == bindparam("v_task_id"))
+            .values(**values)
+        )
+        _UPDATE_STMT_CACHE[keys] = stmt
+    return stmt
+
+
+def _update_task_params(task_id: int, values: dict, now: str) -> tuple[frozenset, dict]:
+    """构造 _update_task_stmt 的字段集合和绑定参数"""
+    keys = frozenset(values) - {"updated_at"}
+    params = {f"v_{key}": values[key] for key in keys}
+    params["v_updated_at"] = now
+    params["v_task_id"] = task_id
+    return keys, params
+
+
 async def _update_task(task_id: int, values: dict) -> None:
-    """更新任务字段"""
+    """更新任务字段
+
+    峰值字段（peak_*）只在新值更大时写入。
+    """
+    keys, params = _update_task_params(task_id, values, utc_now_str())
     async with get_session() as db:
-        result = await db.exec(select(DownloadTask).where(DownloadTask.id == task_id))
-        task = result.first()
-        if task:
-            for key, value in values.items():
+        await db.execute(_update_task_stmt(keys), params)
+
+
+async def _bulk_update_tasks(db: AsyncSession, updates: list[tuple[int, dict]]) -> None:
+    """批量更新任务字段：按字段集合分组，每组一条 UPDATE 以 executemany 执行"""
+    now = utc_now_str()
+    groups: dict[frozenset, list[dict]] = {}
+    for task_id, values in updates:
+        keys, params = _update_task_params(task_id, values, now)
+        groups.setdefault(keys, []).append(params)
+
+    conn = await db.connection()
+    for keys, params_list in groups.items():
+        await conn.execute(_update_task_stmt(keys), params_list)
+
+
+# 预热 sync 循环的常用语句
+_update_task_stmt(_SYNC_UPDATE_FIELDS)
+_update_task_stmt(_SYNC_UPDATE_FIELDS | {"error", "error_display"})
+
+
+async def _preallocate_download(status: dict, total_length: int) -> None:
+    """为单文件（HTTP/FTP）下载预分配磁盘空间，BT 多文件任务跳过"""
+    if "bittorrent" in status:
+        return
+    files = status.get("files") or []
+    if len(files) != 1 or not files[0].get("path"):
+        return
+    await asyncio.to_thread(preallocate_file, files[0]["path"], total_length)
+
+
+def _needs_size_check(task: DownloadTask, status: dict) -> bool:
+    """任务大小首次已知时需要检查系统限制和订阅者空间"""
+    return (
+        status.get("status") == "active"
+        and int(status.get("totalLength", 0)) > 0
+        and (task.total_length or 0) == 0
+    )
+
+
+async def _load_pending_subscribers(
+    task_ids: list[int],
+) -> dict[int, list[tuple[UserTaskSubscription, User]]]:
+    """批量获取任务的待处理订阅及其用户 {task_id: [(sub, user)]}"""
+    if not task_ids:
+        return {}
+
+    async with get_session() as db:
+        result = await db.exec(
+            select(UserTaskSubscription, User)
+            .join(User, UserTaskSubscription.owner_id == User.id)
+            .where(
+                UserTaskSubscription.task_id.in_(task_ids),
+                UserTaskSubscription.status == "pending",
+            )
+        )
+        rows = result.all()
+
+    grouped: dict[int, list[tuple[UserTaskSubscription, User]]] = {}
+    for sub, user in rows:
+        grouped.setdefault(sub.task_id, []).append((sub, user))
+    return grouped
+
+
+async def _load_active_tasks(state: AppState) -> list[DownloadTask]:
+    """获取需要轮询的任务
+
+    优先使用 AppState 中的快照；快照失效（任务新增/取消/事件更新）或超过有效期时
+    才从数据库重新加载。
+    """
+    now = time.monotonic()
+    if (
+        state.active_tasks_loaded_at
+        and now - state.active_tasks_loaded_at < _ACTIVE_TASKS_REFRESH_INTERVAL
+    ):
+        return list(state.active_tasks.values())
+
+    async with get_session() as db:
+        result = await db.exec(
+            select(DownloadTask).where(
+                DownloadTask.gid.isnot(None),
+                DownloadTask.status.in_(_SYNC_STATUSES),
+            )
+        )
+        tasks = result.all()
+
+    state.active_tasks = {task.id: task for task in tasks}
+    state.active_tasks_loaded_at = now
+    return list(tasks)
+
+
+def _apply_to_active_tasks(state: AppState, updates: list[tuple[int, dict]]) -> None:
+    """将本轮写入同步到活跃任务快照，离开轮询范围的任务从快照移除"""
+    for task_id, values in updates:
+        task = state.active_tasks.get(task_id)
+        if task is None:
+            continue
+        for key, value in values.items():
+            if key not in _PEAK_FIELDS:
                 setattr(task, key, value)
-            task.updated_at = utc_now_str()
-            db.add(task)
+        if not task.gid or task.status not in _SYNC_STATUSES:
+            state.active_tasks.pop(task_id, None)
 
 
 async def sync_tasks(
@@ -85,46 +258,33 @@ async def sync_tasks(
     """
     from app.core.state import get_aria2_client, get_user_space_lock
     from app.routers.config import get_max_task_size
-    from app.routers.tasks import broadcast_task_update_to_subscribers
-    from app.services.storage import get_user_space_info
+    from app.routers.tasks import broadcast_task_updates_to_subscribers
+    from app.services.storage import get_machine_free_space, get_user_space_info
 
     while True:
         client = get_aria2_client()
 
         # Get all active tasks
-        async with get_session() as db:
-            result = await db.exec(
-                select(DownloadTask).where(
-                    DownloadTask.gid.isnot(None),
-                    DownloadTask.status.in_(["queued", "active"]),
-                )
-            )
-            tasks = result.all()
-
-        async def fetch_and_update(task: DownloadTask) -> None:
-            gid = task.gid
-            if not gid:
-                return
-
-            try:
-                status = await client.tell_status(gid)
-            except Exception as exc:
-                logger.error(f"[Sync] 获取 GID {gid} 状态失败: {exc}")
-                await _update_task(
-                    task.id,
-                    {
-                        "status": "error",
-                        "error": str(exc),
-                        "error_display": "后端错误",
-                    }
-                )
-                return
+        tasks = await _load_active_tasks(state)
 
-            aria2_status = status.get("status")
+        # 本轮待写入的任务更新 [(task_id, values)]，在 gather 结束后用一个会话统一提交
+        pending_updates: list[tuple[int, dict]] = []
+        # 写入后需要推送的任务 ID
+        broadcast_ids: list[int] = []
+
+        # 本轮磁盘剩余空间：首次需要时获取一次，供本轮所有大小检查复用
+        tick_machine_free: list[int] = []
+
+        def get_tick_machine_free() -> int:
+            if not tick_machine_free:
+                tick_machine_free.append(get_machine_free_space())
+            return tick_machine_free[0]
+
+        async def process_status(task: DownloadTask, status: dict, mapped: dict) -> None:
             total_length = int(status.get("totalLength", 0))
 
             # Check size when it becomes known
-            if aria2_status == "active" and total_length > 0 and (task.total_length or 0) == 0:
+            if _needs_size_check(task, status):
                 # Check system limit
                 max_task_size = get_max_task_size()
                 if total_length > max_task_size:
@@ -138,24 +298,18 @@ async def sync_tasks(
                     )
                     return
 
-                # Check all subscribers' space
-                async with get_session() as db:
-                    result = await db.exec(
-                        select(UserTaskSubscription, User)
-                        .join(User, UserTaskSubscription.owner_id == User.id)
-                        .where(
-                            UserTaskSubscription.task_id == task.id,
-                            UserTaskSubscription.status == "pending",
-                        )
-                    )
-                    subscriptions = result.all()
+                # Check all subscribers' space (prefetched for the whole cycle)
+                subscriptions = pending_subscribers.get(task.id, [])
 
                 valid_subscribers = []
+                machine_free = get_tick_machine_free()
 
                 for sub, user in subscriptions:
                     user_lock = await get_user_space_lock(state, user.id)
                     async with user_lock:
-                        space_info = await get_user_space_info(user.id, user.quota)
+                        space_info = await get_user_space_info(
+                            user.id, user.quota, machine_free=machine_free
+                        )
                         # Each user's space is independent, use available directly
                         effective_available = space_info["available"]
 
@@ -205,8 +359,10 @@ async def sync_tasks(
                     )
                     return
 
+                # 大小已知且空间校验通过，为单文件下载预留磁盘空间
+                await _preallocate_download(status, total_length)
+
             # Update task status with atomic peak value updates
-            mapped = _map_status(status, task.id)
             mapped_status = mapped["status"]
             raw_error = mapped.get("error")
             error_display = mapped.get("error_display")
@@ -239,48 +395,78 @@ async def sync_tasks(
                 if followed_by:
                     new_gid = followed_by[0]
                     logger.info(f"[Sync] 磁力链接元数据完成，更新 GID: {task.gid} -> {new_gid}")
-                    await _update_task(task.id, {"gid": new_gid})
+                    pending_updates.append((task.id, {"gid": new_gid}))
                     return
 
             # Track peak values using SQL CASE for atomic conditional update
             current_speed = mapped["download_speed"]
             current_connections = int(status.get("connections", 0))
 
-            async with get_session() as db:
-                update_values = dict(
-                    status=mapped_status,
-                    name=mapped["name"],
-                    total_length=mapped["total_length"],
-                    completed_length=mapped["completed_length"],
-                    download_speed=mapped["download_speed"],
-                    upload_speed=mapped["upload_speed"],
-                    updated_at=utc_now_str(),
-                    # Atomic peak value update: only update if new value is greater
-                    peak_download_speed=case(
-                        (DownloadTask.peak_download_speed < current_speed, current_speed),
-                        else_=DownloadTask.peak_download_speed
-                    ),
-                    peak_connections=case(
-                        (DownloadTask.peak_connections < current_connections, current_connections),
-                        else_=DownloadTask.peak_connections
-                    ),
-                )
+            update_values = dict(
+                status=mapped_status,
+                name=mapped["name"],
+                total_length=mapped["total_length"],
+                completed_length=mapped["completed_length"],
+                download_speed=mapped["download_speed"],
+                upload_speed=mapped["upload_speed"],
+                # Atomic peak value update: only update if new value is greater
+                peak_download_speed=current_speed,
+                peak_connections=current_connections,
+            )
 
-                if mapped_status == "error":
-                    update_values["error"] = raw_error
-                    update_values["error_display"] = error_display or "后端错误"
+            if mapped_status == "error":
+                update_values["error"] = raw_error
+                update_values["error_display"] = error_display or "后端错误"
 
-                await db.execute(
-                    update(DownloadTask)
-                    .where(DownloadTask.id == task.id)
-                    .values(**update_values)
-                )
+            pending_updates.append((task.id, update_values))
+            broadcast_ids.append(task.id)
 
-            # Broadcast update
-            await broadcast_task_update_to_subscribers(state, task.id)
+        # Fetch all statuses in one system.multicall request
+        tasks = [task for task in tasks if task.gid]
+        try:
+            results = await client.multi_tell_status([task.gid for task in tasks])
+        except Exception as exc:
+            results = [exc] * len(tasks)
+
+        fetched: list[tuple[DownloadTask, dict]] = []
+        for task, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                logger.error(f"[Sync] 获取 GID {task.gid} 状态失败: {result}")
+                pending_updates.append((
+                    task.id,
+                    {
+                        "status": "error",
+                        "error": str(result),
+                        "error_display": "后端错误",
+                    },
+                ))
+            else:
+                fetched.append((task, result))
+
+        # 一次查询预取本轮需要大小检查的任务的待处理订阅者
+        pending_subscribers = await _load_pending_subscribers([
+            task.id for task, status in fetched if _needs_size_check(task, status)
+        ])
+
+        # 状态映射是纯 CPU 计算，任务较多时放到线程中执行，避免阻塞事件循环
+        if len(fetched) >= _MAP_OFFLOAD_THRESHOLD:
+            mapped_rows = await asyncio.to_thread(_map_all, fetched)
+        else:
+            mapped_rows = _map_all(fetched)
 
         # Process all tasks concurrently
-        await asyncio.gather(*[fetch_and_update(task) for task in tasks])
+        await asyncio.gather(*[
+            process_status(task, status, mapped)
+            for (task, status), mapped in zip(fetched, mapped_rows)
+        ])
+
+        # 一个事务批量写入本轮全部更新，提交后再推送
+        if pending_updates:
+            async with get_session() as db:
+                await _bulk_update_tasks(db, pending_updates)
+            _apply_to_active_tasks(state, pending_updates)
+
+        await broadcast_task_updates_to_subscribers(state, broadcast_ids)
 
         await asyncio.sleep(interval)
 
@@ -297,14 +483,12 @@ async def _cancel_task_sync(
     from app.services.storage import cleanup_task_download_dir
 
     gid = task.gid
+    state.active_tasks.pop(task.id, None)
+    status_name = _status_name(aria2_status) if aria2_status else None
 
     # Stop aria2 task
     try:
-        await client.force_remove(gid)
-    except Exception:
-        pass
-    try:
-        await client.remove_download_result(gid)
+        await client.force_remove_and_clear(gid)
     except Exception:
         pass
 
@@ -320,11 +504,7 @@ async def _cancel_task_sync(
             db_task.upload_speed = 0
             db_task.updated_at = utc_now_str()
             if aria2_status:
-                db_task.name = (
-                    aria2_status.get("bittorrent", {}).get("info", {}).get("name")
-                    or aria2_status.get("files", [{}])[0].get("path", "").split("/")[-1]
-                    or db_task.name
-                )
+                db_task.name = status_name or db_task.name
                 db_task.total_length = int(aria2_status.get("totalLength", 0))
             db.add(db_task)
 
@@ -346,12 +526,7 @@ async def _cancel_task_sync(
 
     # Record history for each failed subscription
     from app.services.history import add_task_history
-    task_name = (
-        aria2_status.get("bittorrent", {}).get("info", {}).get("name")
-        or aria2_status.get("files", [{}])[0].get("path", "").split("/")[-1]
-        or task.name
-        or "未知任务"
-    ) if aria2_status else (task.name or "未知任务")
+    task_name = status_name or task.name or "未知任务"
 
     for sub in subscriptions:
         await add_task_history(
@@ -407,6 +582,11 @@ async def _handle_task_stop_or_error_sync(
 
 # WebSocket helpers
 
+def encode_ws_message(message: dict) -> str:
+    """将 WebSocket 消息编码为 JSON 文本，同一消息发往多个连接时只编码一次"""
+    return orjson.dumps(message).decode()
+
+
 async def register_ws(state: AppState, user_id: int, ws) -> None:
     async with state.lock:
         state.ws_connections.setdefault(user_id, set()).add(ws)
@@ -423,12 +603,12 @@ async def broadcast_notification(state: AppState, user_id: int, message: str, le
     async with state.lock:
         sockets = list(state.ws_connections.get(user_id, set()))
     
-    notification = {"type": "notification", "message": message, "level": level}
+    frame = encode_ws_message({"type": "notification", "message": message, "level": level})
     failed_sockets = []
     
     for ws in sockets:
         try:
-            await ws.send_json(notification)
+            await ws.send_text(frame)
         except Exception:
             failed_sockets.append(ws)
     
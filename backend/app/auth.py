@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+import asyncio
+import time
 from uuid import uuid4
 
 from fastapi import Depends, HTTPException, Request, Response, status
@@ -13,7 +14,7 @@ from app.models import Session, User
 
 async def create_session(user_id: int) -> str:
     session_id = uuid4().hex
-    expires_at = (datetime.now(timezone.utc) + timedelta(seconds=settings.session_ttl_seconds)).isoformat()
+    expires_at = int(time.time()) + settings.session_ttl_seconds
     async with get_session() as db:
         session = Session(id=session_id, user_id=user_id, expires_at=expires_at)
         db.add(session)
@@ -46,24 +47,39 @@ async def clear_user_sessions(user_id: int) -> int:
         return count
 
 
+async def _delete_expired_session(session_id: str) -> None:
+    try:
+        await clear_session(session_id)
+    except Exception:
+        # 过期 session 删除失败不影响认证结果，下次访问时会再次尝试
+        pass
+
+
+# 后台删除任务的强引用，避免任务在完成前被回收
+_background_tasks: set[asyncio.Task] = set()
+
+
 async def get_user_by_session(session_id: str | None) -> User | None:
     if not session_id:
         return None
+    # 单次 JOIN 查询同时取 session 过期时间和用户
     async with get_session() as db:
-        result = await db.exec(select(Session).where(Session.id == session_id))
-        session = result.first()
-        if not session:
-            return None
-        expires_at = datetime.fromisoformat(session.expires_at)
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=timezone.utc)
-        if expires_at < datetime.now(timezone.utc):
-            await db.delete(session)
-            await db.commit()
-            return None
-        result = await db.exec(select(User).where(User.id == session.user_id))
-        user = result.first()
-        return user
+        result = await db.exec(
+            select(User, Session.expires_at)
+            .join(Session, Session.user_id == User.id)
+            .where(Session.id == session_id)
+        )
+        row = result.first()
+    if not row:
+        return None
+    user, expires_at = row
+    if expires_at < int(time.time()):
+        # 过期 session 在后台删除，请求直接返回
+        task = asyncio.create_task(_delete_expired_session(session_id))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return None
+    return user
 
 
 async def require_user(request: Request) -> User:
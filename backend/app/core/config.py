@@ -15,6 +15,7 @@ class Settings(BaseSettings):
     aria2_rpc_url: str = "http://localhost:6800/jsonrpc"
     aria2_rpc_secret: str = ""
     aria2_poll_interval: float = 2.0
+    db_optimize_interval: float = 4 * 60 * 60
     download_dir: str = str(BASE_DIR / "downloads")
     secret_key: str = "aria2deck-default-secret-key-change-in-production"
 
@@ -0,0 +1,67 @@
+"""文件系统辅助函数"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 只预留磁盘块，不修改文件的可见大小（aria2 依赖文件大小判断续传）
+FALLOC_FL_KEEP_SIZE = 0x01
+
+# 不支持 fallocate 的错误码，直接跳过预分配
+_UNSUPPORTED_ERRNOS = frozenset({errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL})
+
+# libc 句柄，首次调用时加载；False 表示当前平台不可用
+_libc: ctypes.CDLL | bool | None = None
+
+
+def _get_fallocate():
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fallocate = libc.fallocate
+            fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+            fallocate.restype = ctypes.c_int
+            _libc = libc
+        except (OSError, AttributeError, TypeError):
+            _libc = False
+    return _libc.fallocate if _libc else None
+
+
+def try_fallocate(fd: int, length: int, mode: int = FALLOC_FL_KEEP_SIZE) -> bool:
+    """尝试为文件预分配 length 字节的磁盘空间
+
+    调用 Linux 原生 fallocate（非 glibc posix_fallocate 的写零回退），
+    文件系统或平台不支持时静默跳过。
+
+    Returns:
+        是否预分配成功
+    """
+    if length <= 0:
+        return False
+    fallocate = _get_fallocate()
+    if fallocate is None:
+        return False
+    if fallocate(fd, mode, 0, length) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err not in _UNSUPPORTED_ERRNOS:
+        logger.debug(f"fallocate 失败: {os.strerror(err)}")
+    return False
+
+
+def preallocate_file(path: str, length: int) -> bool:
+    """打开已存在的文件并预分配空间，文件不存在时跳过"""
+    try:
+        fd = os.open(path, os.O_WRONLY)
+    except OSError:
+        return False
+    try:
+        return try_fallocate(fd, length)
+    finally:
+        os.close(fd)
@@ -1,34 +1,69 @@
 """速率限制器"""
 import asyncio
-from collections import defaultdict
+from collections import defaultdict, deque
 from time import time
 
+# 清理过期 key 的最小间隔（秒）
+_GC_INTERVAL = 60.0
+
+
+def _trim(timestamps: deque[float], cutoff: float) -> None:
+    """从队头弹出不晚于 cutoff 的过期时间戳"""
+    while timestamps and timestamps[0] <= cutoff:
+        timestamps.popleft()
+
+
+def _sweep(entries: dict[str, deque[float]], cutoff: float) -> None:
+    """删除最后一条记录也已过期的 key，防止字典无限增长"""
+    expired = [key for key, timestamps in entries.items() if not timestamps or timestamps[-1] <= cutoff]
+    for key in expired:
+        del entries[key]
+
 
 class LoginRateLimiter:
     """基于 IP 的登录速率限制器
 
     默认: 5 分钟内最多 5 次失败尝试
+
+    失败次数按时间分桶计数：窗口切为 _BUCKETS 个桶，每个桶是 {key: 失败次数}，
+    新桶追加到 deque 尾部，最旧的桶由 maxlen 自动淘汰，空闲 key 随之消失，无需扫描清理。
     """
 
+    _BUCKETS = 5
+
     def __init__(self, max_attempts: int = 5, window_seconds: int = 300):
         self.max_attempts = max_attempts
         self.window = window_seconds
-        self._attempts: dict[str, list[float]] = defaultdict(list)
+        self._bucket_seconds = window_seconds / self._BUCKETS
+        # 多保留一个桶，保证当前未满的桶之外仍覆盖完整窗口
+        self._buckets: deque[dict[str, int]] = deque([{}], maxlen=self._BUCKETS + 1)
+        self._bucket_id = int(time() // self._bucket_seconds)
         self._lock = asyncio.Lock()
 
+    def _rotate(self) -> None:
+        """按当前时间推进桶，最多追加 maxlen 个空桶"""
+        bucket_id = int(time() // self._bucket_seconds)
+        steps = bucket_id - self._bucket_id
+        if steps > 0:
+            for _ in range(min(steps, self._BUCKETS + 1)):
+                self._buckets.append({})
+            self._bucket_id = bucket_id
+
     async def is_blocked(self, key: str) -> bool:
         async with self._lock:
-            now = time()
-            self._attempts[key] = [t for t in self._attempts[key] if now - t < self.window]
-            return len(self._attempts[key]) >= self.max_attempts
+            self._rotate()
+            return sum(bucket.get(key, 0) for bucket in self._buckets) >= self.max_attempts
 
     async def record_failure(self, key: str) -> None:
         async with self._lock:
-            self._attempts[key].append(time())
+            self._rotate()
+            current = self._buckets[-1]
+            current[key] = current.get(key, 0) + 1
 
     async def clear(self, key: str) -> None:
         async with self._lock:
-            self._attempts.pop(key, None)
+            for bucket in self._buckets:
+                bucket.pop(key, None)
 
 
 class ApiRateLimiter:
@@ -38,28 +73,40 @@ class ApiRateLimiter:
     """
 
     def __init__(self):
-        self._requests: dict[str, list[float]] = defaultdict(list)
+        self._requests: dict[str, deque[float]] = defaultdict(deque)
         self._lock = asyncio.Lock()
+        self._last_gc = 0.0
+        # 各接口窗口不同，清理时按见过的最大窗口判断过期
+        self._max_window = 0
 
     def _make_key(self, user_id: int, endpoint: str) -> str:
         return f"{user_id}:{endpoint}"
 
     async def is_allowed(self, user_id: int, endpoint: str, limit: int, window_seconds: int = 60) -> bool:
         key = self._make_key(user_id, endpoint)
+        now = time()
         async with self._lock:
-            now = time()
-            self._requests[key] = [t for t in self._requests[key] if now - t < window_seconds]
-            if len(self._requests[key]) >= limit:
+            if window_seconds > self._max_window:
+                self._max_window = window_seconds
+            if now - self._last_gc > _GC_INTERVAL:
+                _sweep(self._requests, now - self._max_window)
+                self._last_gc = now
+            requests = self._requests[key]
+            _trim(requests, now - window_seconds)
+            if len(requests) >= limit:
                 return False
-            self._requests[key].append(now)
+            requests.append(now)
             return True
 
     async def get_remaining(self, user_id: int, endpoint: str, limit: int, window_seconds: int = 60) -> int:
         key = self._make_key(user_id, endpoint)
+        cutoff = time() - window_seconds
         async with self._lock:
-            now = time()
-            self._requests[key] = [t for t in self._requests[key] if now - t < window_seconds]
-            return max(0, limit - len(self._requests[key]))
+            requests = self._requests.get(key)
+            if requests is None:
+                return limit
+            _trim(requests, cutoff)
+            return max(0, limit - len(requests))
 
     def clear_all(self) -> None:
         self._requests.clear()
@@ -1,31 +1,87 @@
+import asyncio
 import base64
 import hashlib
 import hmac
 import os
 import re
-from urllib.parse import urlparse, urlunparse
+
+
+# scrypt 参数：N=2^15, r=8 约占用 32MB 内存，maxmem 需显式放宽（OpenSSL 默认上限 32MB）
+_SCRYPT_N = 2 ** 15
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+_SCRYPT_MAXMEM = 64 * 1024 * 1024
+_SCRYPT_PREFIX = "s1$"
+_SCRYPT_PREFIX_LEN = len(_SCRYPT_PREFIX)
+
+# 盐与摘要长度固定，编码格式为 base64(salt + digest)
+_SALT_SIZE = 16
+_DIGEST_SIZE = 32
+
+# 旧版 PBKDF2-SHA256 参数（无前缀的存量哈希）
+_PBKDF2_ITERATIONS = 120000
+
+
+def _scrypt(pwd_bytes: bytes, salt: bytes) -> bytes:
+    return hashlib.scrypt(
+        pwd_bytes,
+        salt=salt,
+        n=_SCRYPT_N,
+        r=_SCRYPT_R,
+        p=_SCRYPT_P,
+        maxmem=_SCRYPT_MAXMEM,
+        dklen=_DIGEST_SIZE,
+    )
 
 
 def hash_password(password: str, salt: bytes | None = None) -> str:
+    """计算密码哈希（scrypt），格式为 "s1$" + base64(salt + digest)"""
     if salt is None:
-        salt = os.urandom(16)
-    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 120000)
-    return base64.b64encode(salt + digest).decode("utf-8")
+        salt = os.urandom(_SALT_SIZE)
+    pwd_bytes = password.encode("utf-8")
+    digest = _scrypt(pwd_bytes, salt)
+    return _SCRYPT_PREFIX + base64.b64encode(b"".join((salt, digest))).decode("ascii")
 
 
 def verify_password(password: str, encoded: str) -> bool:
-    data = base64.b64decode(encoded.encode("utf-8"))
-    salt = data[:16]
-    stored = data[16:]
-    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 120000)
-    return hmac.compare_digest(stored, digest)
+    """校验密码，兼容无前缀的旧版 PBKDF2 哈希"""
+    pwd_bytes = password.encode("utf-8")
+    if encoded.startswith(_SCRYPT_PREFIX):
+        # memoryview 切片不复制盐和摘要
+        data = memoryview(base64.b64decode(encoded[_SCRYPT_PREFIX_LEN:]))
+        return hmac.compare_digest(data[_SALT_SIZE:], _scrypt(pwd_bytes, data[:_SALT_SIZE]))
+
+    # 旧版哈希走 hashlib.pbkdf2_hmac（OpenSSL 实现，计算期间释放 GIL）
+    data = memoryview(base64.b64decode(encoded))
+    digest = hashlib.pbkdf2_hmac("sha256", pwd_bytes, data[:_SALT_SIZE], _PBKDF2_ITERATIONS)
+    return hmac.compare_digest(data[_SALT_SIZE:], digest)
+
+
+def password_needs_rehash(encoded: str) -> bool:
+    """判断存量哈希是否需要升级为当前算法（旧版 PBKDF2 哈希）"""
+    return not encoded.startswith(_SCRYPT_PREFIX)
+
+
+async def hash_password_async(password: str) -> str:
+    """在线程池中计算密码哈希，避免阻塞事件循环（哈希计算期间释放 GIL）"""
+    return await asyncio.to_thread(hash_password, password)
+
+
+async def verify_password_async(password: str, encoded: str) -> bool:
+    """在线程池中校验密码，避免阻塞事件循环"""
+    return await asyncio.to_thread(verify_password, password, encoded)
 
 
 # ANSI 转义序列正则（匹配 ESC[ 开头的控制序列）
 _ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]|\x1b[^[]')
 
-# 控制字符（除了 \t 和 \n，但包括 \r 以防止覆盖攻击）
-_CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0b-\x0d\x0e-\x1f\x7f]')
+# 控制字符（除了 \t 和 \n，但包括 \r 以防止覆盖攻击）的删除表，供 str.translate 使用
+_CONTROL_CHARS_TABLE = dict.fromkeys([*range(0x00, 0x09), *range(0x0b, 0x20), 0x7f])
+
+
+# URL 中的用户信息：scheme://user[:password]@，只匹配 authority 部分（不跨越 / ? #）；
+# 用户名和密码均可含 @，回溯到 authority 中最后一个 @ 为止，与 urlparse 行为一致
+_URL_CREDENTIALS_RE = re.compile(r'([a-zA-Z][a-zA-Z0-9+.\-]*://)([^/?#\s:]*)(?::([^/?#\s]*))?@')
 
 
 def sanitize_string(s: str | None) -> str | None:
@@ -41,11 +97,19 @@ def sanitize_string(s: str | None) -> str | None:
     """
     if s is None:
         return None
-    # 先移除 ANSI 转义序列
-    s = _ANSI_ESCAPE_RE.sub('', s)
+    # 快路径：可打印字符串不含任何控制字符和 ESC，原样返回
+    if s.isprintable():
+        return s
+    # 先移除 ANSI 转义序列（不含 ESC 时跳过正则）
+    if "\x1b" in s:
+        s = _ANSI_ESCAPE_RE.sub('', s)
     # 再移除其他控制字符
-    s = _CONTROL_CHARS_RE.sub('', s)
-    return s
+    return s.translate(_CONTROL_CHARS_TABLE)
+
+
+def _mask_credentials(match: re.Match) -> str:
+    scheme, user, password = match.groups()
+    return f"{scheme}{'***' if user else ''}{':***' if password else ''}@"
 
 
 def mask_url_credentials(url: str) -> str:
@@ -59,39 +123,7 @@ def mask_url_credentials(url: str) -> str:
     Returns:
         脱敏后的 URL
     """
-    if not url:
-        return url
-
-    try:
-        parsed = urlparse(url)
-
-        # 如果没有用户名密码，直接返回
-        if not parsed.username and not parsed.password:
-            return url
-
-        # 构建脱敏后的 netloc
-        masked_netloc = ""
-        if parsed.username:
-            masked_netloc += "***"
-        if parsed.password:
-            masked_netloc += ":***"
-        if parsed.username or parsed.password:
-            masked_netloc += "@"
-
-        # 添加 host 和 port
-        masked_netloc += parsed.hostname or ""
-        if parsed.port:
-            masked_netloc += f":{parsed.port}"
-
-        # 重新组装 URL
-        return urlunparse((
-            parsed.scheme,
-            masked_netloc,
-            parsed.path,
-            parsed.params,
-            parsed.query,
-            parsed.fragment
-        ))
-    except Exception:
-        # 解析失败时返回原 URL（可能是 magnet 等特殊协议）
+    # 不含 @ 的 URL（含磁力链接等非常规格式）不可能携带凭证，跳过正则
+    if not url or "@" not in url:
         return url
+    return _URL_CREDENTIALS_RE.sub(_mask_credentials, url)
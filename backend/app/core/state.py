@@ -3,11 +3,13 @@ from __future__ import annotations
 import asyncio
 from dataclasses import dataclass, field
 from typing import Dict, Set
+from weakref import WeakValueDictionary
 
 from fastapi import WebSocket, Request
 
 from app.aria2.client import Aria2Client
 from app.core.config import settings
+from app.models import DownloadTask
 
 
 @dataclass
@@ -19,12 +21,20 @@ class AppState:
     last_broadcast: Dict[int, float] = field(default_factory=dict)
     # 任务提交锁，避免并发提交同一任务
     task_submit_locks: Dict[int, asyncio.Lock] = field(default_factory=dict)
-    # 用户空间锁，避免并发冻结/校验导致超额
-    user_space_locks: Dict[int, asyncio.Lock] = field(default_factory=dict)
+    # 用户空间锁，避免并发冻结/校验导致超额；弱引用字典，无协程持有时自动回收
+    user_space_locks: WeakValueDictionary[int, asyncio.Lock] = field(default_factory=WeakValueDictionary)
+    # sync 循环的活跃任务快照 {task_id: DownloadTask}，避免每轮查询数据库
+    active_tasks: Dict[int, DownloadTask] = field(default_factory=dict)
+    # 活跃任务快照的加载时间（monotonic），0 表示需要重新加载
+    active_tasks_loaded_at: float = 0.0
 
 
 async def get_user_space_lock(state: AppState, user_id: int) -> asyncio.Lock:
     """获取用户空间锁，避免并发冻结/校验竞态"""
+    # 快路径：锁已存在时直接返回，不再争用全局 state.lock
+    lock = state.user_space_locks.get(user_id)
+    if lock is not None:
+        return lock
     async with state.lock:
         lock = state.user_space_locks.get(user_id)
         if lock is None:
@@ -33,19 +43,50 @@ async def get_user_space_lock(state: AppState, user_id: int) -> asyncio.Lock:
         return lock
 
 
+def invalidate_active_tasks(state: AppState) -> None:
+    """标记活跃任务快照失效，sync 循环下一轮会从数据库重新加载"""
+    state.active_tasks_loaded_at = 0.0
+
+
+# 当前配置对应的 aria2 客户端，配置变化时替换，旧客户端的连接池随即关闭
+_current_client: Aria2Client | None = None
+_closing_clients: Set[asyncio.Task] = set()
+
+
+def _retire_client(client: Aria2Client) -> None:
+    """在后台关闭被替换的客户端（不在事件循环中时无需关闭：会话只在调用时创建）"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(client.close())
+    _closing_clients.add(task)
+    task.add_done_callback(_closing_clients.discard)
+
+
+async def close_aria2_client() -> None:
+    """关闭当前 aria2 客户端的连接池（关闭应用时调用）"""
+    global _current_client
+    client, _current_client = _current_client, None
+    if client is not None:
+        await client.close()
+
+
 def get_aria2_client(request: Request | None = None) -> Aria2Client:
     """获取 aria2 客户端实例
     
     优先从数据库读取配置，如果数据库中没有配置则使用环境变量配置
     """
-    from app.db import fetch_one
+    from app.routers.config import get_config_value
     
-    # 尝试从数据库读取配置
-    rpc_url_row = fetch_one("SELECT value FROM config WHERE key = ?", ["aria2_rpc_url"])
-    rpc_secret_row = fetch_one("SELECT value FROM config WHERE key = ?", ["aria2_rpc_secret"])
+    # 尝试从数据库读取配置（走配置缓存，修改配置时写穿更新）
+    rpc_url = get_config_value("aria2_rpc_url")
+    rpc_secret = get_config_value("aria2_rpc_secret")
     
-    rpc_url = rpc_url_row["value"] if rpc_url_row else settings.aria2_rpc_url
-    rpc_secret = rpc_secret_row["value"] if rpc_secret_row else settings.aria2_rpc_secret
+    if rpc_url is None:
+        rpc_url = settings.aria2_rpc_url
+    if rpc_secret is None:
+        rpc_secret = settings.aria2_rpc_secret
     
     # 如果提供了 request，从 app.state 获取客户端并检查配置是否变化
     if request and hasattr(request.app.state, "aria2_client"):
@@ -54,5 +95,12 @@ def get_aria2_client(request: Request | None = None) -> Aria2Client:
         if client._rpc_url == rpc_url and client._secret == rpc_secret:
             return client
     
-    # 创建新的客户端实例
-    return Aria2Client(rpc_url, rpc_secret)
+    # 配置未变化时复用当前客户端（及其连接池），否则替换并关闭旧客户端
+    global _current_client
+    client = _current_client
+    if client is not None and client._rpc_url == rpc_url and client._secret == rpc_secret:
+        return client
+    _current_client = Aria2Client(rpc_url, rpc_secret)
+    if client is not None:
+        _retire_client(client)
+    return _current_client
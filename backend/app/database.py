@@ -1,10 +1,11 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 import logging
 
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 
 from app.core.config import settings
@@ -19,6 +20,25 @@ _async_engine: AsyncEngine | None = None
 _async_session_maker: async_sessionmaker[AsyncSession] | None = None
 
 
+# 每个新连接执行的 PRAGMA（连接级设置，journal_mode 为库级持久设置，在 init_db 中设置）
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",  # 256 MiB 内存映射读
+    "PRAGMA cache_size=-65536",  # 64 MiB 页缓存
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA wal_autocheckpoint=1000",
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in _CONNECTION_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
 def _get_engine() -> AsyncEngine:
     """Get or create the async engine (lazy initialization)."""
     global _async_engine
@@ -32,10 +52,13 @@ def _get_engine() -> AsyncEngine:
                 # 启用 WAL 模式以提升并发性能
                 # 启用 busy_timeout 自动重试（30 秒）
                 "timeout": 30.0,
+                # 扩大每条连接的预编译语句缓存（默认 128）
+                "cached_statements": 512,
             },
             # 连接池配置
             pool_pre_ping=True,  # 连接前检测可用性
         )
+        event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
     return _async_engine
 
 
@@ -51,10 +74,28 @@ def _get_session_maker() -> async_sessionmaker[AsyncSession]:
     return _async_session_maker
 
 
+async def optimize_database() -> None:
+    """执行 PRAGMA optimize，让 SQLite 根据近期查询按需更新统计信息（通常为空操作）"""
+    try:
+        async with _get_engine().connect() as conn:
+            await conn.execute(text("PRAGMA optimize"))
+    except Exception as e:
+        logger.debug(f"PRAGMA optimize 失败: {e}")
+
+
+async def optimize_database_periodically(interval: float) -> None:
+    """后台任务：每隔 interval 秒执行一次 PRAGMA optimize，避免长期运行时统计信息过期"""
+    while True:
+        await asyncio.sleep(interval)
+        await optimize_database()
+
+
 async def dispose_engine() -> None:
     """Dispose the engine properly (close all connections)."""
     global _async_engine
     if _async_engine is not None:
+        # 关闭前让 SQLite 根据本次运行的查询更新统计信息
+        await optimize_database()
         await _async_engine.dispose()
 
 
@@ -143,7 +184,7 @@ async def check_wal_integrity() -> bool:
 
 async def init_default_config(session: AsyncSession) -> None:
     """Initialize default configuration values."""
-    from sqlmodel import select
+    from sqlalchemy.dialects.sqlite import insert
     from app.models import Config
 
     default_configs = [
@@ -154,10 +195,11 @@ async def init_default_config(session: AsyncSession) -> None:
         ("pack_extra_args", ""),
     ]
 
-    for key, value in default_configs:
-        result = await session.exec(select(Config).where(Config.key == key))
-        existing = result.first()
-        if not existing:
-            session.add(Config(key=key, value=value))
+    # 单条多行 INSERT OR IGNORE，已存在的配置保持不变
+    await session.execute(
+        insert(Config)
+        .values([{"key": key, "value": value} for key, value in default_configs])
+        .on_conflict_do_nothing(index_elements=["key"])
+    )
 
     await session.commit()
@@ -21,33 +21,141 @@ def _utc_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+# 每条连接缓存的预编译语句数（默认 128）；连接长期复用，热点 SQL 无需重复解析
+_STATEMENT_CACHE_SIZE = 512
+
+
 def _get_connection() -> sqlite3.Connection:
     """Internal: Get a raw SQLite connection for legacy operations."""
-    conn = sqlite3.connect(settings.database_path, check_same_thread=False)
+    conn = sqlite3.connect(
+        settings.database_path,
+        check_same_thread=False,
+        cached_statements=_STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
     return conn
 
 
-_db_lock = threading.Lock()
+# 连接模型：一个写连接 + 每线程一个只读连接（WAL 下读写互不阻塞）。
+# 每条连接记录打开时的 (数据库路径, _generation)，路径切换或连接被统一关闭后重新打开，
+# 查询时只比较内存中的值，不做额外的系统调用。
+# 写连接由 _write_lock 串行化，进程内写者直接排队而不是等待 SQLite 忙重试；
+# 读连接开启 query_only，无需任何应用层锁
+_local = threading.local()
+_write_lock = threading.Lock()
+_writer_conn: sqlite3.Connection | None = None
+_writer_key: tuple[str, int] | None = None
+# 所有打开的连接，关闭时统一释放；_generation 递增使各线程的旧读连接失效
+_open_connections: set[sqlite3.Connection] = set()
+_generation = 0
+
+# 每个新连接执行的 PRAGMA（连接级设置）
+_CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64 MiB 页缓存
+    "PRAGMA mmap_size=268435456",  # 256 MiB 内存映射读
+    "PRAGMA temp_store=MEMORY",
+)
+# journal_mode 是库级持久设置，每个数据库只需切换一次，记录已切换的连接标识
+_wal_databases: set[tuple[str, int]] = set()
+
+
+def _connection_key() -> tuple[str, int]:
+    return (settings.database_path, _generation)
+
+
+def _open_connection(query_only: bool) -> tuple[sqlite3.Connection, tuple[str, int]]:
+    """Internal: Open a tuned connection and return it with its connection key."""
+    conn = _get_connection()
+    # 写事务一开始就拿写锁，避免 deferred 事务升级时的 SQLITE_BUSY
+    conn.isolation_level = "IMMEDIATE"
+    for pragma in _CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    key = _connection_key()
+    # 内存数据库不支持 WAL
+    if settings.database_path != ":memory:" and key not in _wal_databases:
+        conn.execute("PRAGMA journal_mode=WAL")
+        _wal_databases.add(key)
+    if query_only:
+        conn.execute("PRAGMA query_only=1")
+    _open_connections.add(conn)
+    return conn, key
+
+
+def _close_connection(conn: sqlite3.Connection) -> None:
+    _open_connections.discard(conn)
+    conn.close()
+
+
+def _get_shared_connection() -> sqlite3.Connection:
+    """Internal: Get this thread's read-only connection, reopening it if the database path changed."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.key != _connection_key():
+        if conn is not None:
+            _close_connection(conn)
+        conn, _local.key = _open_connection(query_only=True)
+        _local.conn = conn
+    return conn
+
+
+def _get_writer_connection() -> sqlite3.Connection:
+    """Internal: Get the single write connection; caller must hold _write_lock."""
+    global _writer_conn, _writer_key
+    if _writer_conn is None or _writer_key != _connection_key():
+        if _writer_conn is not None:
+            _close_connection(_writer_conn)
+        _writer_conn, _writer_key = _open_connection(query_only=False)
+    return _writer_conn
+
+
+def close_shared_connection() -> None:
+    """Close every reusable legacy connection (called on shutdown)."""
+    global _generation, _writer_conn, _writer_key
+    with _write_lock:
+        # 关闭前让 SQLite 根据本次运行的查询按需更新统计信息
+        if _writer_conn is not None:
+            try:
+                _writer_conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+        _generation += 1
+        for conn in list(_open_connections):
+            _close_connection(conn)
+        _writer_conn = None
+        _writer_key = None
+    _local.__dict__.clear()
 
 
 @contextmanager
 def _db_cursor():
-    """Internal: Context manager for legacy database operations."""
-    with _db_lock:
-        conn = _get_connection()
+    """Internal: Context manager for legacy read operations (no application lock)."""
+    cur = _get_shared_connection().cursor()
+    try:
+        yield cur
+    finally:
+        cur.close()
+
+
+@contextmanager
+def _db_write_cursor():
+    """Internal: Context manager for legacy write operations on the writer connection."""
+    with _write_lock:
+        conn = _get_writer_connection()
         cur = conn.cursor()
         try:
             yield cur
             conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
         finally:
             cur.close()
-            conn.close()
 
 
 def _execute(query: str, params: Iterable | None = None) -> int:
     """Internal: Execute a query and return lastrowid."""
-    with _db_cursor() as cur:
+    with _db_write_cursor() as cur:
         cur.execute(query, params or [])
         return cur.lastrowid
 
@@ -60,6 +168,13 @@ def _fetch_one(query: str, params: Iterable | None = None) -> dict | None:
         return dict(row) if row else None
 
 
+def _fetch_one_row(query: str, params: Iterable | None = None) -> sqlite3.Row | None:
+    """Internal: Fetch a single row as sqlite3.Row without copying it into a dict."""
+    with _db_cursor() as cur:
+        cur.execute(query, params or [])
+        return cur.fetchone()
+
+
 def _fetch_all(query: str, params: Iterable | None = None) -> list[dict]:
     """Internal: Fetch all rows as list of dicts."""
     with _db_cursor() as cur:
@@ -68,14 +183,122 @@ def _fetch_all(query: str, params: Iterable | None = None) -> list[dict]:
         return [dict(row) for row in rows]
 
 
+def _fetch_all_rows(query: str, params: Iterable | None = None) -> list[sqlite3.Row]:
+    """Internal: Fetch all rows as sqlite3.Row without copying them into dicts.
+
+    Rows support both index and key access; use this for read-only iteration.
+    """
+    with _db_cursor() as cur:
+        cur.execute(query, params or [])
+        return cur.fetchall()
+
+
 # Public aliases for backward compatibility
 # These are kept for code that still uses synchronous database access
 execute = _execute
 fetch_one = _fetch_one
 fetch_all = _fetch_all
+fetch_all_rows = _fetch_all_rows
+fetch_one_row = _fetch_one_row
 utc_now = _utc_now
 
 
+# 当前 schema 版本，记录在 PRAGMA user_version 中；新增迁移时递增
+SCHEMA_VERSION = 3
+
+# 建表与默认配置，在一个脚本中执行并开启写事务（executescript 不会再逐条往返 Python）
+_SCHEMA_SCRIPT = """
+BEGIN IMMEDIATE;
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    quota INTEGER DEFAULT 107374182400
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id INTEGER NOT NULL,
+    gid TEXT,
+    uri TEXT NOT NULL,
+    status TEXT NOT NULL,
+    name TEXT,
+    total_length INTEGER DEFAULT 0,
+    completed_length INTEGER DEFAULT 0,
+    download_speed INTEGER DEFAULT 0,
+    upload_speed INTEGER DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    artifact_path TEXT,
+    artifact_token TEXT,
+    peak_download_speed INTEGER DEFAULT 0,
+    peak_connections INTEGER DEFAULT 0,
+    FOREIGN KEY(owner_id) REFERENCES users(id)
+);
+
+-- 系统配置表
+CREATE TABLE IF NOT EXISTS config (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+-- 初始化默认配置
+INSERT OR IGNORE INTO config (key, value) VALUES
+    ('max_task_size', '10737418240'),
+    ('min_free_disk', '1073741824'),
+    ('pack_format', 'zip'),
+    ('pack_compression_level', '5'),
+    ('pack_extra_args', '');
+
+-- 打包任务表
+CREATE TABLE IF NOT EXISTS pack_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id INTEGER NOT NULL,
+    folder_path TEXT NOT NULL,
+    folder_size INTEGER NOT NULL,
+    reserved_space INTEGER NOT NULL,
+    output_path TEXT,
+    output_name TEXT,
+    output_size INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    progress INTEGER DEFAULT 0,
+    error_message TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    FOREIGN KEY(owner_id) REFERENCES users(id)
+);
+"""
+
+# 热点查询索引：按用户+状态筛选任务、按 GID 查任务、按用户/过期时间清理会话、
+# 每个 JSON-RPC 请求按 rpc_secret 认证用户。
+# 须在 sessions 重建之后创建；executescript 会先提交未完成的事务，因此逐条执行
+_INDEX_STATEMENTS = (
+    "CREATE INDEX IF NOT EXISTS idx_tasks_owner_status ON tasks(owner_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_gid ON tasks(gid) WHERE gid IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_users_rpc_secret ON users(rpc_secret) WHERE rpc_secret IS NOT NULL",
+    "ANALYZE",
+)
+
+
+def _table_columns(cur: sqlite3.Cursor, table: str) -> dict[str, str]:
+    """Internal: Return {column name: declared type} for a table."""
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1]: row[2].upper() for row in cur.fetchall()}
+
+
 def init_db() -> None:
     """Initialize database schema and perform migrations for existing databases.
 
@@ -84,160 +307,88 @@ def init_db() -> None:
     - Adding new columns to existing tables (schema migration)
     - Initializing default config values
 
+    The schema version is stored in ``PRAGMA user_version``; databases already
+    at SCHEMA_VERSION skip all work. Migrations run in a single transaction.
+
     Note: For new tables and columns, prefer using Alembic migrations.
     This function is kept for backward compatibility with existing deployments.
     """
-    conn = _get_connection()
+    conn = sqlite3.connect(settings.database_path, isolation_level=None)
     cur = conn.cursor()
 
     try:
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE,
-                password_hash TEXT NOT NULL,
-                is_admin INTEGER NOT NULL DEFAULT 0,
-                created_at TEXT NOT NULL,
-                quota INTEGER DEFAULT 107374182400
-            )
-            """
-        )
-        conn.commit()
+        cur.execute("PRAGMA user_version")
+        if cur.fetchone()[0] >= SCHEMA_VERSION:
+            return
 
-        # 为已存在的表添加 quota 字段（如果不存在）
-        cur.execute("PRAGMA table_info(users)")
-        columns = [row[1] for row in cur.fetchall()]
+        cur.executescript(_SCHEMA_SCRIPT)
+        # 已持有写锁，再检查一次，避免并发启动时重复迁移
+        cur.execute("PRAGMA user_version")
+        if cur.fetchone()[0] >= SCHEMA_VERSION:
+            cur.execute("ROLLBACK")
+            return
 
-        if "quota" not in columns:
+        # 为已存在的 users 表补齐字段（quota、RPC 访问、初始密码标记）
+        user_columns = _table_columns(cur, "users")
+
+        if "quota" not in user_columns:
             cur.execute("ALTER TABLE users ADD COLUMN quota INTEGER DEFAULT 107374182400")
             cur.execute("UPDATE users SET quota = 107374182400 WHERE quota IS NULL")
-            conn.commit()
 
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS sessions (
-                id TEXT PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                expires_at TEXT NOT NULL,
-                FOREIGN KEY(user_id) REFERENCES users(id)
+        if "rpc_secret" not in user_columns:
+            cur.execute("ALTER TABLE users ADD COLUMN rpc_secret VARCHAR(64) NULL")
+
+        if "rpc_secret_created_at" not in user_columns:
+            cur.execute("ALTER TABLE users ADD COLUMN rpc_secret_created_at TEXT NULL")
+
+        if "is_initial_password" not in user_columns:
+            cur.execute("ALTER TABLE users ADD COLUMN is_initial_password INTEGER DEFAULT 0")
+
+        # 旧版 sessions.expires_at 为 ISO 字符串，重建为 Unix 时间戳（秒）
+        if _table_columns(cur, "sessions").get("expires_at") == "TEXT":
+            cur.execute(
+                """
+                CREATE TABLE sessions_new (
+                    id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    expires_at INTEGER NOT NULL,
+                    FOREIGN KEY(user_id) REFERENCES users(id)
+                )
+                """
             )
-            """
-        )
-        conn.commit()
-
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner_id INTEGER NOT NULL,
-                gid TEXT,
-                uri TEXT NOT NULL,
-                status TEXT NOT NULL,
-                name TEXT,
-                total_length INTEGER DEFAULT 0,
-                completed_length INTEGER DEFAULT 0,
-                download_speed INTEGER DEFAULT 0,
-                upload_speed INTEGER DEFAULT 0,
-                error TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                artifact_path TEXT,
-                artifact_token TEXT,
-                peak_download_speed INTEGER DEFAULT 0,
-                peak_connections INTEGER DEFAULT 0,
-                FOREIGN KEY(owner_id) REFERENCES users(id)
+            cur.execute(
+                """
+                INSERT INTO sessions_new (id, user_id, expires_at)
+                SELECT id, user_id, CAST(strftime('%s', expires_at) AS INTEGER)
+                FROM sessions
+                WHERE strftime('%s', expires_at) IS NOT NULL
+                """
             )
-            """
-        )
-        conn.commit()
+            cur.execute("DROP TABLE sessions")
+            cur.execute("ALTER TABLE sessions_new RENAME TO sessions")
 
         # 为已存在的 tasks 表添加峰值字段（如果不存在）
-        cur.execute("PRAGMA table_info(tasks)")
-        task_columns = [row[1] for row in cur.fetchall()]
+        task_columns = _table_columns(cur, "tasks")
 
         if "peak_download_speed" not in task_columns:
             cur.execute("ALTER TABLE tasks ADD COLUMN peak_download_speed INTEGER DEFAULT 0")
-            conn.commit()
 
         if "peak_connections" not in task_columns:
             cur.execute("ALTER TABLE tasks ADD COLUMN peak_connections INTEGER DEFAULT 0")
-            conn.commit()
-
-        # 系统配置表
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS config (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-            """
-        )
-        conn.commit()
-
-        # 初始化默认配置
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO config (key, value) VALUES
-            ('max_task_size', '10737418240'),
-            ('min_free_disk', '1073741824'),
-            ('pack_format', 'zip'),
-            ('pack_compression_level', '5'),
-            ('pack_extra_args', '')
-            """
-        )
-        conn.commit()
-
-        # 打包任务表
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS pack_tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner_id INTEGER NOT NULL,
-                folder_path TEXT NOT NULL,
-                folder_size INTEGER NOT NULL,
-                reserved_space INTEGER NOT NULL,
-                output_path TEXT,
-                output_name TEXT,
-                output_size INTEGER,
-                status TEXT NOT NULL DEFAULT 'pending',
-                progress INTEGER DEFAULT 0,
-                error_message TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY(owner_id) REFERENCES users(id)
-            )
-            """
-        )
-        conn.commit()
 
         # 添加 output_name 列（兼容旧数据库）
-        try:
+        if "output_name" not in _table_columns(cur, "pack_tasks"):
             cur.execute("ALTER TABLE pack_tasks ADD COLUMN output_name TEXT")
-            conn.commit()
-        except Exception:
-            pass  # 列已存在
-
-        # 为 users 表添加 RPC 访问字段（兼容旧数据库）
-        cur.execute("PRAGMA table_info(users)")
-        user_columns = [row[1] for row in cur.fetchall()]
-
-        if "rpc_secret" not in user_columns:
-            cur.execute("ALTER TABLE users ADD COLUMN rpc_secret VARCHAR(64) NULL")
-            conn.commit()
 
-        if "rpc_secret_created_at" not in user_columns:
-            cur.execute("ALTER TABLE users ADD COLUMN rpc_secret_created_at TEXT NULL")
-            conn.commit()
-
-        # 为 users 表添加 is_initial_password 字段
-        cur.execute("PRAGMA table_info(users)")
-        user_columns_updated = [row[1] for row in cur.fetchall()]
-
-        if "is_initial_password" not in user_columns_updated:
-            cur.execute("ALTER TABLE users ADD COLUMN is_initial_password INTEGER DEFAULT 0")
-            conn.commit()
+        for statement in _INDEX_STATEMENTS:
+            cur.execute(statement)
 
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        cur.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
     finally:
         cur.close()
         conn.close()
@@ -5,7 +5,7 @@ from contextlib import asynccontextmanager
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 
 
 def setup_logging():
@@ -51,21 +51,23 @@ def setup_logging():
 # 初始化日志
 setup_logging()
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.aria2.client import Aria2Client
 from app.aria2.listener import listen_aria2_events
 from app.aria2.sync import sync_tasks
 from app.core.config import settings
-from app.core.state import AppState
-from app.db import ensure_default_admin, init_db
+from app.core.state import AppState, close_aria2_client
+from app.db import close_shared_connection, ensure_default_admin, init_db
 from app.database import (
     init_db as init_sqlmodel_db,
     get_session,
     init_default_config,
     check_database_integrity,
     check_wal_integrity,
+    dispose_engine,
+    optimize_database_periodically,
 )
 from app.routers import aria2_rpc, auth, config, files, history, stats, tasks, users, ws
 
@@ -98,6 +100,9 @@ async def lifespan(app: FastAPI):
     async with get_session() as session:
         await init_default_config(session)
 
+    # 预热配置缓存，请求处理中的同步配置读取不再首次访问数据库
+    await config.prime_config_cache()
+
     # Ensure default admin exists
     ensure_default_admin()
 
@@ -107,10 +112,14 @@ async def lifespan(app: FastAPI):
     listener_task = asyncio.create_task(
         listen_aria2_events(app.state.app_state)
     )
+    optimize_task = asyncio.create_task(
+        optimize_database_periodically(settings.db_optimize_interval)
+    )
     yield
     # Shutdown
     sync_task.cancel()
     listener_task.cancel()
+    optimize_task.cancel()
     try:
         await sync_task
     except asyncio.CancelledError:
@@ -119,10 +128,31 @@ async def lifespan(app: FastAPI):
         await listener_task
     except asyncio.CancelledError:
         pass
+    try:
+        await optimize_task
+    except asyncio.CancelledError:
+        pass
+    await close_aria2_client()
+    await app.state.aria2_client.close()
+    close_shared_connection()
+    await dispose_engine()
+
+
+def _html_endpoint(target: Path):
+    """生成返回固定 HTML 文件的路由处理函数（无参数，不接受任何请求输入）"""
+    async def serve_html() -> FileResponse:
+        return FileResponse(target)
+
+    return serve_html
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.app_name, debug=settings.debug, lifespan=lifespan)
+    app = FastAPI(
+        title=settings.app_name,
+        debug=settings.debug,
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
     app.state.app_state = AppState()
     app.state.aria2_client = Aria2Client(settings.aria2_rpc_url, settings.aria2_rpc_secret)
 
@@ -145,12 +175,10 @@ def create_app() -> FastAPI:
     app.include_router(aria2_rpc.router)
 
     # 静态导出时，Next.js 生成的是 /tasks.html 而不是 /tasks/index.html
-    # 这里通过中间件统一把无后缀路径映射到对应 HTML，避免直接刷新 404
+    # 这里在启动时为存在的 HTML 注册路由，把无后缀路径映射到对应文件，避免直接刷新 404；
+    # 不再使用 HTTP 中间件，其他请求无需经过额外的分发
     static_dir = Path(__file__).parent.parent / "static"
     if static_dir.exists():
-        def html_path(name: str) -> Path:
-            return static_dir / name
-
         alias_map = {
             "/login": "login.html",
             "/tasks": "tasks.html",
@@ -162,14 +190,15 @@ def create_app() -> FastAPI:
             "/profile": "profile.html",
         }
 
-        @app.middleware("http")
-        async def static_alias_middleware(request: Request, call_next):
-            path = request.url.path.rstrip("/") or "/"
-            if path in alias_map:
-                target = html_path(alias_map[path])
-                if target.exists():
-                    return FileResponse(target)
-            return await call_next(request)
+        for route, filename in alias_map.items():
+            target = static_dir / filename
+            if not target.exists():
+                continue
+
+            for path in (route, f"{route}/"):
+                app.add_api_route(
+                    path, _html_endpoint(target), methods=["GET", "HEAD"], include_in_schema=False
+                )
 
     # 挂载静态文件用于服务前端
     if static_dir.exists():
@@ -42,7 +42,7 @@ class Session(SQLModel, table=True):
 
     id: str = Field(primary_key=True)
     user_id: int = Field(foreign_key="users.id")
-    expires_at: str
+    expires_at: int  # Unix 时间戳（秒）
 
     user: Optional[User] = Relationship(back_populates="sessions")
 
@@ -7,19 +7,41 @@
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import secrets
-from collections import defaultdict
+from collections import OrderedDict
 from time import time
 from typing import Any
 
+import orjson
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 
+from app.core.rate_limit import _GC_INTERVAL
 from app.db import fetch_one
-from app.services.aria2_rpc_handler import Aria2RpcHandler, RpcError, RpcErrorCode
+from app.services.aria2_rpc_handler import Aria2RpcHandler, RpcErrorCode
 
 router = APIRouter(tags=["aria2-rpc"])
 
+# 批量请求中同时转发给 aria2 的子请求上限
+_BATCH_CONCURRENCY = 16
+# 只读方法：批量请求全部由这些方法组成时才并发执行，否则按客户端顺序逐个执行
+_READ_ONLY_METHODS = frozenset({
+    "aria2.tellStatus",
+    "aria2.tellActive",
+    "aria2.tellWaiting",
+    "aria2.tellStopped",
+    "aria2.getFiles",
+    "aria2.getUris",
+    "aria2.getGlobalStat",
+    "aria2.getVersion",
+    "aria2.getOption",
+    "aria2.getGlobalOption",
+    "aria2.getSessionInfo",
+    "system.listMethods",
+})
+
 
 # ============================================================================
 # 限流器
@@ -29,22 +51,39 @@ class RpcRateLimiter:
     """基于 IP 的 RPC 速率限制器
 
     默认: 1 分钟内最多 100 次请求
+
+    采用令牌桶：容量为 max_requests，每秒补充 max_requests / window_seconds 个令牌，
+    补充在取令牌时惰性计算，检查与扣减合并为一次 try_acquire。
+    每个 IP 只保存 (令牌数, 上次补充时间)。接口在事件循环中同步调用，无需加锁。
     """
 
     def __init__(self, max_requests: int = 100, window_seconds: int = 60):
         self.max_requests = max_requests
         self.window = window_seconds
-        self._requests: dict[str, list[float]] = defaultdict(list)
+        self._rate = max_requests / window_seconds
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._last_gc = 0.0
 
-    def is_blocked(self, key: str) -> bool:
-        """检查是否被限制"""
+    def try_acquire(self, key: str) -> bool:
+        """尝试为 key 取一个令牌，成功返回 True，令牌不足（被限制）返回 False"""
         now = time()
-        self._requests[key] = [t for t in self._requests[key] if now - t < self.window]
-        return len(self._requests[key]) >= self.max_requests
-
-    def record_request(self, key: str) -> None:
-        """记录请求"""
-        self._requests[key].append(time())
+        if now - self._last_gc > _GC_INTERVAL:
+            # 空闲超过一个窗口的桶已补满，与新建的桶等价，直接删除
+            stale = [k for k, (_, last) in self._buckets.items() if now - last >= self.window]
+            for k in stale:
+                del self._buckets[k]
+            self._last_gc = now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(self.max_requests)
+        else:
+            tokens, last = bucket
+            tokens = min(self.max_requests, tokens + (now - last) * self._rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
 
 
 rpc_limiter = RpcRateLimiter()
@@ -54,16 +93,37 @@ rpc_limiter = RpcRateLimiter()
 # 用户认证
 # ============================================================================
 
-def get_user_by_rpc_secret(secret: str) -> dict | None:
-    """通过 RPC Secret 获取用户信息（常量时间验证）
+# RPC Secret 认证缓存 {blake2b(secret): (查询时间, 用户信息)}，仅缓存有效 Secret；
+# 客户端通常每秒轮询一次，缓存命中时跳过数据库查询。
+# 超过 _RPC_USER_CACHE_REFRESH 仍返回缓存并在后台刷新，超过 _RPC_USER_CACHE_TTL 同步查询
+_RPC_USER_CACHE_REFRESH = 25.0
+_RPC_USER_CACHE_TTL = 30.0
+_rpc_user_cache: dict[bytes, tuple[float, dict]] = {}
+_rpc_user_refreshing: set[bytes] = set()
+# 每次失效加一，后台刷新写回前比对，避免把失效前读到的旧数据写回缓存
+_rpc_user_cache_generation = 0
 
-    Args:
-        secret: RPC Secret
+# 处理器复用 {(用户ID, id(aria2 客户端), id(AppState)): 处理器}，按 LRU 淘汰
+_RPC_HANDLER_CACHE_SIZE = 1024
+_rpc_handlers: OrderedDict[tuple[int, int, int], Aria2RpcHandler] = OrderedDict()
 
-    Returns:
-        用户信息字典，包含 id, username 等，无效 Secret 返回 None
-    """
-    user = fetch_one(
+
+def invalidate_rpc_user_cache(user_id: int) -> None:
+    """清除指定用户的 RPC 认证缓存（开启/关闭/刷新 Secret、删除用户时调用）"""
+    global _rpc_user_cache_generation
+    _rpc_user_cache_generation += 1
+    for key, (_, user) in list(_rpc_user_cache.items()):
+        if user["id"] == user_id:
+            _rpc_user_cache.pop(key, None)
+
+
+def _rpc_secret_key(secret: str) -> bytes:
+    """Secret 的缓存键，不在内存中保留明文 Secret"""
+    return hashlib.blake2b(secret.encode(), digest_size=16).digest()
+
+
+def _query_user_by_rpc_secret(secret: str) -> dict | None:
+    return fetch_one(
         """
         SELECT id, username, is_admin, quota
         FROM users
@@ -72,14 +132,99 @@ def get_user_by_rpc_secret(secret: str) -> dict | None:
         [secret]
     )
 
+
+def _refresh_rpc_user(
+    cache_key: bytes, secret: str, generation: int, loop: asyncio.AbstractEventLoop
+) -> None:
+    """后台刷新一个认证缓存项（在线程池中执行）
+
+    线程中只查询数据库，结果交回事件循环写入缓存，_rpc_user_cache 只在事件循环中修改。
+    """
+    try:
+        result = (_query_user_by_rpc_secret(secret),)
+    except Exception:
+        result = None
+    try:
+        loop.call_soon_threadsafe(_apply_refreshed_rpc_user, cache_key, generation, result)
+    except RuntimeError:
+        # 事件循环已关闭，刷新结果无处写回
+        _rpc_user_refreshing.discard(cache_key)
+
+
+def _apply_refreshed_rpc_user(
+    cache_key: bytes, generation: int, result: tuple[dict | None] | None
+) -> None:
+    """在事件循环中写回后台刷新结果；查询失败或期间缓存已失效时不写回"""
+    _rpc_user_refreshing.discard(cache_key)
+    if result is None or generation != _rpc_user_cache_generation:
+        return
+    user = result[0]
+    if user:
+        _rpc_user_cache[cache_key] = (time(), user)
+    else:
+        _rpc_user_cache.pop(cache_key, None)
+
+
+def _schedule_rpc_user_refresh(cache_key: bytes, secret: str) -> bool:
+    """调度后台刷新，不在事件循环中时返回 False"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    if cache_key not in _rpc_user_refreshing:
+        _rpc_user_refreshing.add(cache_key)
+        loop.run_in_executor(
+            None, _refresh_rpc_user, cache_key, secret, _rpc_user_cache_generation, loop
+        )
+    return True
+
+
+def get_user_by_rpc_secret(secret: str) -> dict | None:
+    """通过 RPC Secret 获取用户信息（常量时间验证）
+
+    Args:
+        secret: RPC Secret
+
+    Returns:
+        用户信息字典，包含 id, username 等，无效 Secret 返回 None
+    """
+    cache_key = _rpc_secret_key(secret)
+    now = time()
+    cached = _rpc_user_cache.get(cache_key)
+    if cached is not None:
+        age = now - cached[0]
+        if age < _RPC_USER_CACHE_REFRESH:
+            return dict(cached[1])
+        if age < _RPC_USER_CACHE_TTL and _schedule_rpc_user_refresh(cache_key, secret):
+            return dict(cached[1])
+
+    user = _query_user_by_rpc_secret(secret)
+
     if not user:
         # 执行虚拟比较以保持时间一致，防止时序攻击
         secrets.compare_digest(secret, "dummy_secret_placeholder_value")
+        _rpc_user_cache.pop(cache_key, None)
         return None
 
+    _rpc_user_cache[cache_key] = (now, user)
     return dict(user)
 
 
+def get_rpc_handler(user_id: int, aria2_client: Any, app_state: Any) -> Aria2RpcHandler:
+    """获取用户的 RPC 处理器，相同用户、aria2 客户端和 AppState 复用同一实例"""
+    key = (user_id, id(aria2_client), id(app_state))
+    handler = _rpc_handlers.get(key)
+    # 同时比对对象本身，防止对象回收后 id 被复用
+    if handler is not None and handler.client is aria2_client and handler.app_state is app_state:
+        _rpc_handlers.move_to_end(key)
+        return handler
+    handler = Aria2RpcHandler(user_id, aria2_client, app_state)
+    _rpc_handlers[key] = handler
+    if len(_rpc_handlers) > _RPC_HANDLER_CACHE_SIZE:
+        _rpc_handlers.popitem(last=False)
+    return handler
+
+
 def extract_secret_from_params(params: list) -> tuple[str | None, list]:
     """从 params 提取 secret，返回 (secret, remaining_params)
 
@@ -95,13 +240,53 @@ def extract_secret_from_params(params: list) -> tuple[str | None, list]:
         return None, params
 
     first_param = params[0]
-    if isinstance(first_param, str) and first_param.startswith("token:"):
+    if type(first_param) is str and first_param.startswith("token:"):
         secret = first_param[6:]  # 移除 "token:" 前缀
         return secret, params[1:]
 
     return None, params
 
 
+# 预扫描 token 时最多向后查找的字节数（RPC Secret 远小于此长度）
+_TOKEN_SCAN_LIMIT = 256
+# 检查 token 前是否为 "params": [ 时向前查看的字节数
+_PARAMS_HEAD_SCAN = 32
+
+
+def _is_params_head(prefix: bytes) -> bool:
+    """prefix 是否以 "params": [ 结尾（允许空白），即其后紧跟的值是 params[0]"""
+    prefix = prefix.rstrip()
+    if not prefix.endswith(b"["):
+        return False
+    prefix = prefix[:-1].rstrip()
+    if not prefix.endswith(b":"):
+        return False
+    return prefix[:-1].rstrip().endswith(b'"params"')
+
+
+def extract_token_fast(raw: bytes) -> str | None:
+    """在解析 JSON 前直接从原始字节中提取 params[0] 中 token:xxx 的 secret
+
+    只接受紧跟在 "params": [ 之后的第一个 "token: 字符串；id、method 等其他字段
+    中以 token: 开头的字符串不算，返回 None 交给完整解析路径处理。
+    secret 含转义字符、超出扫描长度或为空时同样返回 None。
+    """
+    start = raw.find(b'"token:')
+    if start < 0 or not _is_params_head(raw[max(0, start - _PARAMS_HEAD_SCAN):start]):
+        return None
+    start += 7
+    end = raw.find(b'"', start, start + _TOKEN_SCAN_LIMIT)
+    if end <= start:
+        return None
+    secret = raw[start:end]
+    if b"\\" in secret:
+        return None
+    try:
+        return secret.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
 # ============================================================================
 # JSON-RPC 辅助函数
 # ============================================================================
@@ -127,6 +312,32 @@ def build_jsonrpc_error(code: int, message: str, request_id: str | int | None, d
     }
 
 
+# 请求体由 orjson 解析，只会产生内置类型，以下类型判断均用 type(x) is T 代替 isinstance
+
+# 批量请求中非对象元素的固定错误响应
+_INVALID_BATCH_ITEM = build_jsonrpc_error(RpcErrorCode.INVALID_REQUEST, "Invalid request in batch", None)
+
+# 内容固定的错误响应在导入时预先序列化，返回时无需再构建字典和编码
+_ERR_RATE_LIMIT = orjson.dumps(
+    build_jsonrpc_error(-32000, "Rate limit exceeded, please try again later", None)  # Server error
+)
+_ERR_PARSE = orjson.dumps(build_jsonrpc_error(RpcErrorCode.PARSE_ERROR, "Parse error: Invalid JSON", None))
+_ERR_EMPTY_BATCH = orjson.dumps(build_jsonrpc_error(RpcErrorCode.INVALID_REQUEST, "Empty batch request", None))
+_ERR_BAD_REQUEST_TYPE = orjson.dumps(
+    build_jsonrpc_error(RpcErrorCode.INVALID_REQUEST, "Request must be an object or array", None)
+)
+_ERR_PARAMS_NOT_ARRAY = orjson.dumps(
+    build_jsonrpc_error(RpcErrorCode.INVALID_PARAMS, "Params must be an array", None)
+)
+_ERR_MISSING_TOKEN = orjson.dumps(build_jsonrpc_error(1, "Missing token parameter", None))  # Unauthorized
+_ERR_INVALID_TOKEN = orjson.dumps(build_jsonrpc_error(1, "Invalid token", None))  # Unauthorized
+
+
+def _static_response(body: bytes) -> Response:
+    """返回预先序列化的 JSON-RPC 响应（HTTP 200）"""
+    return Response(content=body, status_code=200, media_type="application/json")
+
+
 # ============================================================================
 # 请求处理
 # ============================================================================
@@ -157,7 +368,7 @@ async def process_single_request(
         )
 
     method = request_body.get("method")
-    if not method or not isinstance(method, str):
+    if not method or type(method) is not str:
         return build_jsonrpc_error(
             RpcErrorCode.INVALID_REQUEST,
             "Method is required",
@@ -169,7 +380,7 @@ async def process_single_request(
         params = remaining_params_override
     else:
         params = request_body.get("params", [])
-        if not isinstance(params, list):
+        if type(params) is not list:
             return build_jsonrpc_error(
                 RpcErrorCode.INVALID_PARAMS,
                 "Params must be an array",
@@ -179,16 +390,24 @@ async def process_single_request(
         _, params = extract_secret_from_params(params)
 
     try:
-        result = await handler.handle(method, params)
-        return build_jsonrpc_response(result, request_id)
-    except RpcError as exc:
-        return build_jsonrpc_error(exc.code, exc.message, request_id, exc.data)
+        result = await handler.dispatch(method, params)
     except Exception:
         return build_jsonrpc_error(
             RpcErrorCode.INTERNAL_ERROR,
             "Internal server error",
             request_id
         )
+    if result.ok:
+        return build_jsonrpc_response(result.value, request_id)
+    return build_jsonrpc_error(result.code, result.message, request_id, result.data)
+
+
+def _is_read_only_item(item: Any) -> bool:
+    """批量子请求是否只读；非对象子请求只返回错误，不影响执行顺序"""
+    if type(item) is not dict:
+        return True
+    method = item.get("method")
+    return type(method) is str and method in _READ_ONLY_METHODS
 
 
 # ============================================================================
@@ -196,7 +415,7 @@ async def process_single_request(
 # ============================================================================
 
 @router.post("/aria2/jsonrpc")
-async def jsonrpc_handler(request: Request) -> JSONResponse:
+async def jsonrpc_handler(request: Request) -> Response:
     """aria2 JSON-RPC 兼容接口（使用 token:xxx 参数认证）
 
     接收标准的 aria2 JSON-RPC 请求，支持单个请求和批量请求。
@@ -222,115 +441,86 @@ async def jsonrpc_handler(request: Request) -> JSONResponse:
     """
     # 0. 限流检查
     client_ip = request.client.host if request.client else "unknown"
-    if rpc_limiter.is_blocked(client_ip):
-        return JSONResponse(
-            content=build_jsonrpc_error(
-                -32000,  # Server error
-                "Rate limit exceeded, please try again later",
-                None
-            ),
-            status_code=200
-        )
-    rpc_limiter.record_request(client_ip)
+    if not rpc_limiter.try_acquire(client_ip):
+        return _static_response(_ERR_RATE_LIMIT)
+
+    raw = await request.body()
+
+    # 1. 解析前先从原始字节中预取 token，无效 token 直接拒绝，不做完整 JSON 解析
+    fast_secret = extract_token_fast(raw)
+    fast_user = None
+    if fast_secret is not None:
+        fast_user = get_user_by_rpc_secret(fast_secret)
+        if fast_user is None:
+            return _static_response(_ERR_INVALID_TOKEN)
 
-    # 1. 解析请求体
+    # 2. 解析请求体（orjson 解析，与响应序列化保持一致）
     try:
-        body = await request.json()
-    except Exception:
-        return JSONResponse(
-            content=build_jsonrpc_error(
-                RpcErrorCode.PARSE_ERROR,
-                "Parse error: Invalid JSON",
-                None
-            ),
-            status_code=200
-        )
+        body = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return _static_response(_ERR_PARSE)
 
-    # 2. 提取 token 并验证用户
+    # 3. 提取 token 并验证用户
     # 对于单个请求，从 params[0] 提取
     # 对于批量请求，从第一个请求的 params[0] 提取
-    if isinstance(body, list):
+    if type(body) is list:
         if not body:
-            return JSONResponse(
-                content=build_jsonrpc_error(
-                    RpcErrorCode.INVALID_REQUEST,
-                    "Empty batch request",
-                    None
-                ),
-                status_code=200
-            )
-        first_request = body[0] if isinstance(body[0], dict) else {}
+            return _static_response(_ERR_EMPTY_BATCH)
+        first_request = body[0] if type(body[0]) is dict else {}
         params = first_request.get("params", [])
-    elif isinstance(body, dict):
+    elif type(body) is dict:
         params = body.get("params", [])
     else:
-        return JSONResponse(
-            content=build_jsonrpc_error(
-                RpcErrorCode.INVALID_REQUEST,
-                "Request must be an object or array",
-                None
-            ),
-            status_code=200
-        )
+        return _static_response(_ERR_BAD_REQUEST_TYPE)
 
-    if not isinstance(params, list):
-        return JSONResponse(
-            content=build_jsonrpc_error(
-                RpcErrorCode.INVALID_PARAMS,
-                "Params must be an array",
-                None
-            ),
-            status_code=200
-        )
+    if type(params) is not list:
+        return _static_response(_ERR_PARAMS_NOT_ARRAY)
 
     secret, remaining_params = extract_secret_from_params(params)
 
     if not secret:
-        return JSONResponse(
-            content=build_jsonrpc_error(
-                1,  # Unauthorized
-                "Missing token parameter",
-                None
-            ),
-            status_code=200
-        )
+        return _static_response(_ERR_MISSING_TOKEN)
 
-    user = get_user_by_rpc_secret(secret)
+    # 预取的 token 即 params[0] 时复用其认证结果，不再重复计算 Secret 哈希和查缓存
+    user = fast_user if secret == fast_secret else get_user_by_rpc_secret(secret)
     if not user:
-        return JSONResponse(
-            content=build_jsonrpc_error(
-                1,  # Unauthorized
-                "Invalid token",
-                None
-            ),
-            status_code=200
-        )
+        return _static_response(_ERR_INVALID_TOKEN)
 
-    # 3. 创建处理器
+    # 4. 获取处理器
     aria2_client = request.app.state.aria2_client
     app_state = request.app.state.app_state
-    handler = Aria2RpcHandler(user["id"], aria2_client, app_state)
-
-    # 4. 处理请求（支持单个和批量）
-    if isinstance(body, list):
-        # 批量请求
-        responses = []
-        for idx, item in enumerate(body):
-            if isinstance(item, dict):
+    handler = get_rpc_handler(user["id"], aria2_client, app_state)
+
+    # 5. 处理请求（支持单个和批量）
+    if type(body) is list:
+        if not all(_is_read_only_item(item) for item in body):
+            # 含写操作的批量请求按客户端顺序逐个执行（如 addUri 后查询返回的 gid）
+            responses = []
+            for idx, item in enumerate(body):
+                if type(item) is not dict:
+                    responses.append(_INVALID_BATCH_ITEM.copy())
+                elif idx == 0:
+                    # 第一个请求使用已提取的 remaining_params
+                    responses.append(await process_single_request(item, handler, remaining_params))
+                else:
+                    responses.append(await process_single_request(item, handler))
+            return ORJSONResponse(content=responses, status_code=200)
+
+        # 只读批量请求：各子请求相互独立，并发执行（gather 保持响应顺序），信号量限制对 aria2 的并发数
+        semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+        async def run_item(idx: int, item: Any) -> dict:
+            if type(item) is not dict:
+                return _INVALID_BATCH_ITEM.copy()
+            async with semaphore:
                 # 第一个请求使用已提取的 remaining_params
                 if idx == 0:
-                    response = await process_single_request(item, handler, remaining_params)
-                else:
-                    response = await process_single_request(item, handler)
-                responses.append(response)
-            else:
-                responses.append(build_jsonrpc_error(
-                    RpcErrorCode.INVALID_REQUEST,
-                    "Invalid request in batch",
-                    None
-                ))
-        return JSONResponse(content=responses, status_code=200)
+                    return await process_single_request(item, handler, remaining_params)
+                return await process_single_request(item, handler)
+
+        responses = await asyncio.gather(*(run_item(idx, item) for idx, item in enumerate(body)))
+        return ORJSONResponse(content=responses, status_code=200)
     else:
         # 单个请求
         response = await process_single_request(body, handler, remaining_params)
-        return JSONResponse(content=response, status_code=200)
+        return ORJSONResponse(content=response, status_code=200)
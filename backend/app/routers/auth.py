@@ -1,18 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import update
+from sqlmodel import delete, select
 
 from app.auth import clear_session, create_session, require_user, set_session_cookie
 from app.core.config import settings
 from app.core.rate_limit import api_limiter, login_limiter
-from app.core.security import hash_password, verify_password
+from app.core.security import hash_password_async, password_needs_rehash, verify_password_async
 from app.database import get_session
-from app.db import fetch_one
-from app.models import User
+from app.models import Session, User
 from app.schemas import ChangePasswordRequest, LoginRequest, UserOut
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+# 返回值已是 UserOut 的结构，不声明 response_model 以跳过逐次响应校验，仅在文档中保留模型
+_USER_OUT_RESPONSES = {200: {"model": UserOut}}
 
-@router.post("/login", response_model=UserOut)
+
+# 登录只读取校验密码和构建响应所需的列，不加载 rpc_secret 等其他字段
+_LOGIN_QUERY = select(
+    User.id,
+    User.username,
+    User.password_hash,
+    User.is_admin,
+    User.quota,
+    User.is_initial_password,
+)
+
+
+def _user_out(user) -> dict:
+    """构建与 UserOut 字段一致的响应（含默认值字段）"""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "is_admin": bool(user.is_admin),
+        "quota": user.quota,
+        "password_warning": None,
+        "is_default_password": False,
+        "is_initial_password": bool(user.is_initial_password),
+    }
+
+
+@router.post("/login", responses=_USER_OUT_RESPONSES)
 async def login(payload: LoginRequest, request: Request, response: Response) -> dict:
     # 获取客户端 IP
     client_ip = request.client.host if request.client else "unknown"
@@ -24,9 +52,11 @@ async def login(payload: LoginRequest, request: Request, response: Response) ->
             detail="登录尝试次数过多，请稍后再试"
         )
 
-    user = fetch_one("SELECT * FROM users WHERE username = ?", [payload.username])
+    async with get_session() as db:
+        result = await db.exec(_LOGIN_QUERY.where(User.username == payload.username))
+        user = result.first()
 
-    if not user or not verify_password(payload.password, user["password_hash"]):
+    if not user or not await verify_password_async(payload.password, user.password_hash):
         # 记录失败尝试
         await login_limiter.record_failure(client_ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户名或密码错误")
@@ -34,21 +64,25 @@ async def login(payload: LoginRequest, request: Request, response: Response) ->
     # 登录成功，清除失败记录
     await login_limiter.clear(client_ip)
 
+    # 旧版 PBKDF2 哈希在登录成功后升级为 scrypt
+    if password_needs_rehash(user.password_hash):
+        new_password_hash = await hash_password_async(payload.password)
+        async with get_session() as db:
+            await db.execute(
+                update(User)
+                .where(User.id == user.id, User.password_hash == user.password_hash)
+                .values(password_hash=new_password_hash)
+            )
+
     # 会话固定防护：清除请求中可能存在的旧 session
     old_session_id = request.cookies.get(settings.session_cookie_name)
     if old_session_id:
         await clear_session(old_session_id)
 
-    session_id = await create_session(user["id"])
+    session_id = await create_session(user.id)
     set_session_cookie(response, session_id)
 
-    return {
-        "id": user["id"],
-        "username": user["username"],
-        "is_admin": bool(user["is_admin"]),
-        "quota": user["quota"],
-        "is_initial_password": bool(user["is_initial_password"])
-    }
+    return _user_out(user)
 
 
 @router.post("/logout")
@@ -60,15 +94,9 @@ async def logout(request: Request, response: Response, user: User = Depends(requ
     return {"ok": True}
 
 
-@router.get("/me", response_model=UserOut)
+@router.get("/me", responses=_USER_OUT_RESPONSES)
 async def me(user: User = Depends(require_user)) -> dict:
-    return {
-        "id": user.id,
-        "username": user.username,
-        "is_admin": bool(user.is_admin),
-        "quota": user.quota,
-        "is_initial_password": bool(user.is_initial_password)
-    }
+    return _user_out(user)
 
 
 @router.post("/change-password")
@@ -86,7 +114,7 @@ async def change_password(
 
     if not user.is_initial_password:
         # 验证旧密码
-        if not verify_password(payload.old_password, user.password_hash):
+        if not await verify_password_async(payload.old_password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="旧密码错误"
@@ -100,15 +128,13 @@ async def change_password(
             )
 
     # 更新密码
+    new_password_hash = await hash_password_async(payload.new_password)
     async with get_session() as db:
-        user.password_hash = hash_password(payload.new_password)
+        user.password_hash = new_password_hash
         user.is_initial_password = False  # 清除初始密码标记
         db.add(user)
-        await db.commit()
 
-        # 使该用户的所有 session 失效
-        from sqlmodel import delete
-        from app.models import Session
+        # 同一事务内使该用户的所有 session 失效，一次提交
         await db.exec(delete(Session).where(Session.user_id == user.id))
         await db.commit()
 
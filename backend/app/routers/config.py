@@ -4,21 +4,53 @@ from __future__ import annotations
 import asyncio
 import secrets
 import string
+from collections import OrderedDict
 from datetime import datetime, timezone
 from time import time
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import BaseModel
 from sqlmodel import select
 
 from app.auth import require_admin, require_user
+from app.core.config import settings
 from app.core.rate_limit import api_limiter
 from app.database import get_session
+from app.db import execute, fetch_all, fetch_one_row
 from app.models import Config, User
 
-_config_cache: dict[str, tuple[str | None, float]] = {}
+class _ConfigCache(OrderedDict):
+    """按写入顺序淘汰的有界配置缓存：写入时移到队尾，超过 maxsize 淘汰最久未写入的项（O(1)）
+
+    version 在任一配置值发生变化时递增，用作配置接口的 ETag。
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self.version = 0
+
+    def __setitem__(self, key, value) -> None:
+        old = self.get(key)
+        if old is None or old[0] != value[0]:
+            self.version += 1
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+# 配置缓存 {(数据库路径, 配置键): (值, 读取时间)}，条目在读取或刷新时写入
+_CACHE_MAXSIZE = 256
+_config_cache: _ConfigCache = _ConfigCache(_CACHE_MAXSIZE)
+# ETag 中的进程标识，重启后旧 ETag 不会误命中
+_ETAG_PREFIX = secrets.token_hex(4)
 _config_cache_lock = asyncio.Lock()  # 保护异步缓存访问
-_CACHE_TTL = 60.0  # 缓存有效期（秒）
+_CACHE_TTL = 55.0  # 缓存新鲜期（秒）
+# 过期但仍在此期限内的缓存照常返回，同时在后台刷新（stale-while-revalidate）
+_CACHE_STALE_TTL = 300.0
+_refreshing: set[tuple[str, str]] = set()  # 正在后台刷新的缓存键，每个键同时只刷新一次
 
 
 router = APIRouter(prefix="/api/config", tags=["config"])
@@ -52,47 +84,122 @@ class Aria2TestRequest(BaseModel):
     aria2_rpc_secret: str | None = None
 
 
+def _cache_key(key: str) -> tuple[str, str]:
+    # 按数据库路径区分缓存，切换数据库后不会读到旧库的配置
+    return (settings.database_path, key)
+
+
+def _refresh_config_value(cache_key: tuple[str, str], loop: asyncio.AbstractEventLoop) -> None:
+    """后台刷新单个缓存键（在线程池中执行）
+
+    线程中只读取数据库，结果交回事件循环写入缓存，_config_cache 只在事件循环中修改。
+    """
+    try:
+        row = fetch_one_row("SELECT value FROM config WHERE key = ?", [cache_key[1]])
+        result = (row["value"] if row else None, time())
+    except Exception:
+        result = None
+    try:
+        loop.call_soon_threadsafe(_apply_refreshed_value, cache_key, result)
+    except RuntimeError:
+        # 事件循环已关闭，刷新结果无处写回
+        _refreshing.discard(cache_key)
+
+
+def _apply_refreshed_value(cache_key: tuple[str, str], result: tuple[str | None, float] | None) -> None:
+    """在事件循环中写回后台刷新结果；读取失败时保留旧缓存"""
+    _refreshing.discard(cache_key)
+    # 刷新期间切换了数据库时放弃写回，避免把新库的值记到旧库的键下
+    if result is not None and settings.database_path == cache_key[0]:
+        _config_cache[cache_key] = result
+
+
+def _serve_stale(cache_key: tuple[str, str], cached: tuple[str | None, float], now: float) -> bool:
+    """判断缓存是否可直接返回；已过新鲜期但未超过陈旧期时顺带调度后台刷新
+
+    不在事件循环中（无法后台刷新）时，过期缓存不可用，由调用方同步读取。
+    """
+    age = now - cached[1]
+    if age < _CACHE_TTL:
+        return True
+    if age >= _CACHE_STALE_TTL:
+        return False
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    if cache_key not in _refreshing:
+        _refreshing.add(cache_key)
+        loop.run_in_executor(None, _refresh_config_value, cache_key, loop)
+    return True
+
+
 def get_config_value(key: str) -> str | None:
     """获取单个配置值（带缓存）- 同步版本用于非异步上下文"""
     now = time()
-    if key in _config_cache:
-        value, ts = _config_cache[key]
-        if now - ts < _CACHE_TTL:
-            return value
-
-    # 使用同步方式读取（用于向后兼容）
-    import sqlite3
-    from app.core.config import settings
+    cache_key = _cache_key(key)
+    cached = _config_cache.get(cache_key)
+    if cached is not None and _serve_stale(cache_key, cached, now):
+        return cached[0]
+
+    # 使用同步方式读取（复用旧版数据库模块的持久连接）
     try:
-        conn = sqlite3.connect(settings.database_path)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT value FROM config WHERE key = ?", [key])
-        row = cur.fetchone()
-        value = row["value"] if row else None
-        cur.close()
-        conn.close()
-        _config_cache[key] = (value, now)
-        return value
+        row = fetch_one_row("SELECT value FROM config WHERE key = ?", [key])
     except Exception:
         return None
+    value = row["value"] if row else None
+    _config_cache[cache_key] = (value, now)
+    return value
+
+
+async def prime_config_cache(keys: list[str] | tuple[str, ...] | None = None) -> dict[str, str | None]:
+    """批量获取配置值并预热缓存，未命中的键合并为一次异步 IN 查询
+
+    之后同步的 get_* 读取这些键时直接命中缓存，不会在事件循环中访问数据库。
+    keys 为空时预热全部已知配置键（启动时调用）。
+    """
+    if keys is None:
+        keys = _CONFIG_KEYS
+    now = time()
+    values: dict[str, str | None] = {}
+    missing: list[str] = []
+    async with _config_cache_lock:
+        for key in keys:
+            cache_key = _cache_key(key)
+            cached = _config_cache.get(cache_key)
+            if cached is not None and _serve_stale(cache_key, cached, now):
+                values[key] = cached[0]
+            else:
+                missing.append(key)
+    if not missing:
+        return values
+
+    async with get_session() as db:
+        result = await db.exec(select(Config).where(Config.key.in_(missing)))
+        found = {config.key: config.value for config in result.all()}
+    async with _config_cache_lock:
+        for key in missing:
+            value = found.get(key)
+            _config_cache[_cache_key(key)] = (value, now)
+            values[key] = value
+    return values
 
 
 async def get_config_value_async(key: str) -> str | None:
     """获取单个配置值（带缓存）- 异步版本"""
     now = time()
+    cache_key = _cache_key(key)
     async with _config_cache_lock:
-        if key in _config_cache:
-            value, ts = _config_cache[key]
-            if now - ts < _CACHE_TTL:
-                return value
+        cached = _config_cache.get(cache_key)
+        if cached is not None and _serve_stale(cache_key, cached, now):
+            return cached[0]
 
     async with get_session() as db:
         result = await db.exec(select(Config).where(Config.key == key))
         config = result.first()
         value = config.value if config else None
         async with _config_cache_lock:
-            _config_cache[key] = (value, now)
+            _config_cache[cache_key] = (value, now)
         return value
 
 
@@ -107,7 +214,65 @@ async def set_config_value_async(key: str, value: str) -> None:
         else:
             db.add(Config(key=key, value=value))
     async with _config_cache_lock:
-        _config_cache[key] = (value, time())
+        _config_cache[_cache_key(key)] = (value, time())
+
+
+def _is_fresh_value(cached: tuple[str | None, float] | None, value: str, now: float) -> bool:
+    """缓存值与 value 相同且仍在新鲜期内"""
+    return cached is not None and cached[0] == value and now - cached[1] < _CACHE_TTL
+
+
+async def set_config_values_async(updates: dict[str, str]) -> None:
+    """批量设置配置值：一次查询已有键，在同一事务中更新和插入，只提交一次
+
+    与新鲜缓存值相同的键视为未修改，不写入数据库。
+    """
+    now = time()
+    async with _config_cache_lock:
+        updates = {
+            key: value for key, value in updates.items()
+            if not _is_fresh_value(_config_cache.get(_cache_key(key)), value, now)
+        }
+    if not updates:
+        return
+    async with get_session() as db:
+        result = await db.exec(select(Config).where(Config.key.in_(list(updates))))
+        existing = {config.key: config for config in result.all()}
+        for key, value in updates.items():
+            config = existing.get(key)
+            if config:
+                config.value = value
+            else:
+                db.add(Config(key=key, value=value))
+    now = time()
+    async with _config_cache_lock:
+        for key, value in updates.items():
+            _config_cache[_cache_key(key)] = (value, now)
+
+
+# 数值型配置 {键: (类型, 默认值, 下限, 上限)}，下限为 None 表示读取时不限制范围
+_TYPED_CONFIG: dict[str, tuple[type, int | float, int | float | None, int | float | None]] = {
+    "pack_compression_level": (int, 5, 1, 9),
+    "ws_reconnect_max_delay": (float, 60.0, None, None),
+    "ws_reconnect_jitter": (float, 0.2, 0.0, 1.0),
+    "ws_reconnect_factor": (float, 2.0, 1.1, 10.0),  # 限制范围 1.1-10
+    "download_token_expiry": (int, 7200, 60, 86400 * 7),  # 限制范围 1分钟-7天
+}
+
+
+def _get_typed(key: str) -> int | float:
+    """读取数值型配置：未设置或无法解析时返回默认值，否则限制在 [下限, 上限] 内"""
+    cast, default, low, high = _TYPED_CONFIG[key]
+    val = get_config_value(key)
+    if not val:
+        return default
+    try:
+        value = cast(val)
+    except ValueError:
+        return default
+    if low is None:
+        return value
+    return max(low, min(high, value))
 
 
 def get_max_task_size() -> int:
@@ -124,12 +289,11 @@ def get_min_free_disk() -> int:
 
 def get_hidden_file_extensions() -> list[str]:
     """获取隐藏的文件后缀名列表"""
-    import json
     val = get_config_value("hidden_file_extensions")
     if val:
         try:
-            return json.loads(val)
-        except Exception:
+            return orjson.loads(val)
+        except orjson.JSONDecodeError:
             return []
     return []
 
@@ -142,12 +306,7 @@ def get_pack_format() -> str:
 
 def get_pack_compression_level() -> int:
     """获取压缩等级 (1-9)，默认 5"""
-    val = get_config_value("pack_compression_level")
-    try:
-        level = int(val) if val else 5
-        return max(1, min(9, level))
-    except ValueError:
-        return 5
+    return _get_typed("pack_compression_level")
 
 
 def get_pack_extra_args() -> str:
@@ -158,56 +317,46 @@ def get_pack_extra_args() -> str:
 
 def get_ws_reconnect_max_delay() -> float:
     """获取 WebSocket 最大重连延迟（秒），默认 60"""
-    val = get_config_value("ws_reconnect_max_delay")
-    try:
-        return float(val) if val else 60.0
-    except ValueError:
-        return 60.0
+    return _get_typed("ws_reconnect_max_delay")
 
 
 def get_ws_reconnect_jitter() -> float:
     """获取 WebSocket 重连抖动系数 (0-1)，默认 0.2"""
-    val = get_config_value("ws_reconnect_jitter")
-    try:
-        jitter = float(val) if val else 0.2
-        return max(0.0, min(1.0, jitter))
-    except ValueError:
-        return 0.2
+    return _get_typed("ws_reconnect_jitter")
 
 
 def get_ws_reconnect_factor() -> float:
     """获取 WebSocket 重连指数因子，默认 2.0"""
-    val = get_config_value("ws_reconnect_factor")
-    try:
-        factor = float(val) if val else 2.0
-        return max(1.1, min(10.0, factor))  # 限制范围 1.1-10
-    except ValueError:
-        return 2.0
+    return _get_typed("ws_reconnect_factor")
 
 
 def get_download_token_expiry() -> int:
     """获取下载链接 Token 有效期（秒），默认 7200（2小时）"""
-    val = get_config_value("download_token_expiry")
-    try:
-        expiry = int(val) if val else 7200
-        return max(60, min(86400 * 7, expiry))  # 限制范围 1分钟-7天
-    except ValueError:
-        return 7200
-
-
-@router.get("")
-async def get_config(admin: User = Depends(require_admin)) -> dict:
-    """获取系统配置（管理员）
-
-    返回:
-    - max_task_size: 单任务最大允许大小（字节）
-    - min_free_disk: 磁盘最小剩余空间阈值（字节）
-    - aria2_rpc_url: aria2 RPC URL
-    - aria2_rpc_secret: aria2 RPC Secret（脱敏显示）
-    - hidden_file_extensions: 隐藏的文件后缀名列表
-    """
-    aria2_rpc_url = await get_config_value_async("aria2_rpc_url") or "http://localhost:6800/jsonrpc"
-    aria2_rpc_secret = await get_config_value_async("aria2_rpc_secret") or ""
+    return _get_typed("download_token_expiry")
+
+
+# 管理员配置接口返回的全部配置键，构建响应前一次性批量读取
+_CONFIG_KEYS = (
+    "max_task_size",
+    "min_free_disk",
+    "aria2_rpc_url",
+    "aria2_rpc_secret",
+    "hidden_file_extensions",
+    "pack_format",
+    "pack_compression_level",
+    "pack_extra_args",
+    "ws_reconnect_max_delay",
+    "ws_reconnect_jitter",
+    "ws_reconnect_factor",
+    "download_token_expiry",
+)
+
+
+async def _build_config_response() -> dict:
+    """构建配置接口响应（secret 脱敏），各 get_* 读取时均命中批量预热的缓存"""
+    values = await prime_config_cache(_CONFIG_KEYS)
+    aria2_rpc_url = values["aria2_rpc_url"] or "http://localhost:6800/jsonrpc"
+    aria2_rpc_secret = values["aria2_rpc_secret"] or ""
 
     # 脱敏处理 secret
     masked_secret = ""
@@ -230,6 +379,30 @@ async def get_config(admin: User = Depends(require_admin)) -> dict:
     }
 
 
+@router.get("", response_model=None)
+async def get_config(
+    request: Request,
+    response: Response,
+    admin: User = Depends(require_admin)
+) -> dict | Response:
+    """获取系统配置（管理员）
+
+    返回:
+    - max_task_size: 单任务最大允许大小（字节）
+    - min_free_disk: 磁盘最小剩余空间阈值（字节）
+    - aria2_rpc_url: aria2 RPC URL
+    - aria2_rpc_secret: aria2 RPC Secret（脱敏显示）
+    - hidden_file_extensions: 隐藏的文件后缀名列表
+    """
+    # 预热缓存（命中时不访问数据库，过期项照常后台刷新），配置未变化时返回 304
+    await prime_config_cache(_CONFIG_KEYS)
+    etag = f'W/"{_ETAG_PREFIX}-{_config_cache.version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return await _build_config_response()
+
+
 @router.put("")
 async def update_config(payload: ConfigUpdate, admin: User = Depends(require_admin)) -> dict:
     """更新系统配置（管理员）
@@ -241,18 +414,17 @@ async def update_config(payload: ConfigUpdate, admin: User = Depends(require_adm
     - aria2_rpc_secret: aria2 RPC Secret
     - hidden_file_extensions: 隐藏的文件后缀名列表
     """
-    import json
-
+    updates: dict[str, str] = {}
     if payload.max_task_size is not None:
-        await set_config_value_async("max_task_size", str(payload.max_task_size))
+        updates["max_task_size"] = str(payload.max_task_size)
     if payload.min_free_disk is not None:
-        await set_config_value_async("min_free_disk", str(payload.min_free_disk))
+        updates["min_free_disk"] = str(payload.min_free_disk)
     if payload.aria2_rpc_url is not None:
-        await set_config_value_async("aria2_rpc_url", payload.aria2_rpc_url)
+        updates["aria2_rpc_url"] = payload.aria2_rpc_url
     if payload.aria2_rpc_secret is not None:
         # 如果是掩码，不更新
         if not payload.aria2_rpc_secret.startswith("*"):
-            await set_config_value_async("aria2_rpc_secret", payload.aria2_rpc_secret)
+            updates["aria2_rpc_secret"] = payload.aria2_rpc_secret
     if payload.hidden_file_extensions is not None:
         # 规范化后缀名：统一小写，确保以点开头
         normalized = []
@@ -262,50 +434,33 @@ async def update_config(payload: ConfigUpdate, admin: User = Depends(require_adm
                 ext = "." + ext
             if ext and ext not in normalized:
                 normalized.append(ext)
-        await set_config_value_async("hidden_file_extensions", json.dumps(normalized))
+        updates["hidden_file_extensions"] = orjson.dumps(normalized).decode()
     if payload.pack_format is not None:
         if payload.pack_format in ("zip", "7z"):
-            await set_config_value_async("pack_format", payload.pack_format)
+            updates["pack_format"] = payload.pack_format
     if payload.pack_compression_level is not None:
         level = max(1, min(9, payload.pack_compression_level))
-        await set_config_value_async("pack_compression_level", str(level))
+        updates["pack_compression_level"] = str(level)
     if payload.pack_extra_args is not None:
-        await set_config_value_async("pack_extra_args", payload.pack_extra_args)
+        updates["pack_extra_args"] = payload.pack_extra_args
     # WebSocket 重连参数
     if payload.ws_reconnect_max_delay is not None:
         delay = max(1.0, min(300.0, payload.ws_reconnect_max_delay))  # 1-300秒
-        await set_config_value_async("ws_reconnect_max_delay", str(delay))
+        updates["ws_reconnect_max_delay"] = str(delay)
     if payload.ws_reconnect_jitter is not None:
         jitter = max(0.0, min(1.0, payload.ws_reconnect_jitter))  # 0-1
-        await set_config_value_async("ws_reconnect_jitter", str(jitter))
+        updates["ws_reconnect_jitter"] = str(jitter)
     if payload.ws_reconnect_factor is not None:
         factor = max(1.1, min(10.0, payload.ws_reconnect_factor))  # 1.1-10
-        await set_config_value_async("ws_reconnect_factor", str(factor))
+        updates["ws_reconnect_factor"] = str(factor)
     if payload.download_token_expiry is not None:
         expiry = max(60, min(86400 * 7, payload.download_token_expiry))  # 1分钟-7天
-        await set_config_value_async("download_token_expiry", str(expiry))
+        updates["download_token_expiry"] = str(expiry)
 
-    # 返回更新后的配置（secret 脱敏）
-    aria2_rpc_url = await get_config_value_async("aria2_rpc_url") or "http://localhost:6800/jsonrpc"
-    aria2_rpc_secret = await get_config_value_async("aria2_rpc_secret") or ""
-    masked_secret = ""
-    if aria2_rpc_secret:
-        masked_secret = "*" * min(len(aria2_rpc_secret), 8)
+    await set_config_values_async(updates)
 
-    return {
-        "max_task_size": get_max_task_size(),
-        "min_free_disk": get_min_free_disk(),
-        "aria2_rpc_url": aria2_rpc_url,
-        "aria2_rpc_secret": masked_secret,
-        "hidden_file_extensions": get_hidden_file_extensions(),
-        "pack_format": get_pack_format(),
-        "pack_compression_level": get_pack_compression_level(),
-        "pack_extra_args": get_pack_extra_args(),
-        "ws_reconnect_max_delay": get_ws_reconnect_max_delay(),
-        "ws_reconnect_jitter": get_ws_reconnect_jitter(),
-        "ws_reconnect_factor": get_ws_reconnect_factor(),
-        "download_token_expiry": get_download_token_expiry(),
-    }
+    # 返回更新后的配置（secret 脱敏）
+    return await _build_config_response()
 
 
 @router.get("/aria2/version")
@@ -337,6 +492,8 @@ async def get_aria2_version(admin: User = Depends(require_admin)) -> dict:
             "connected": False,
             "error": "无法连接到 aria2 服务",
         }
+    finally:
+        await client.close()
 
 
 @router.post("/aria2/test")
@@ -393,6 +550,8 @@ async def test_aria2_connection(
             "connected": False,
             "error": "无法连接到 aria2 服务",
         }
+    finally:
+        await client.close()
 
 
 # ============================================================
@@ -404,11 +563,25 @@ class TokenCreateRequest(BaseModel):
     name: str | None = None  # Token 名称（可选）
 
 
+_TOKEN_CHARS = string.ascii_letters + string.digits
+_TOKEN_LENGTH = 24
+# 拒绝采样上限：只接受小于 62 * 4 = 248 的字节，取模后各字符概率相同
+_TOKEN_BYTE_LIMIT = 256 - 256 % len(_TOKEN_CHARS)
+
+
 def generate_api_token() -> str:
-    """生成 API Token，格式: aria2_{24位随机字符}"""
-    chars = string.ascii_letters + string.digits
-    random_part = ''.join(secrets.choice(chars) for _ in range(24))
-    return f"aria2_{random_part}"
+    """生成 API Token，格式: aria2_{24位随机字符}
+
+    一次读取一批随机字节再映射为字符，而不是每个字符单独读取系统随机源。
+    """
+    chars: list[str] = []
+    while len(chars) < _TOKEN_LENGTH:
+        chars.extend(
+            _TOKEN_CHARS[b % len(_TOKEN_CHARS)]
+            for b in secrets.token_bytes(32)
+            if b < _TOKEN_BYTE_LIMIT
+        )
+    return "aria2_" + "".join(chars[:_TOKEN_LENGTH])
 
 
 @router.get("/tokens")
@@ -422,21 +595,11 @@ async def list_tokens(user: User = Depends(require_user)) -> list[dict]:
     - created_at: 创建时间
     - last_used_at: 最后使用时间
     """
-    # api_tokens 表暂未迁移，使用原生 SQL
-    import sqlite3
-    from app.core.config import settings
-
-    conn = sqlite3.connect(settings.database_path)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute(
+    # api_tokens 表暂未迁移，使用旧版数据库模块的持久连接
+    return fetch_all(
         "SELECT id, name, token, created_at, last_used_at FROM api_tokens WHERE user_id = ? ORDER BY created_at DESC",
         [user.id]
     )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return [dict(row) for row in rows]
 
 
 @router.post("/tokens")
@@ -455,32 +618,15 @@ async def create_token(
     - token: Token 值
     - created_at: 创建时间
     """
-    import sqlite3
-    from app.core.config import settings
-
     token = generate_api_token()
     name = payload.name if payload else None
     created_at = utc_now()
 
-    conn = sqlite3.connect(settings.database_path)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute(
+    token_id = execute(
         "INSERT INTO api_tokens (user_id, token, name, created_at) VALUES (?, ?, ?, ?)",
         [user.id, token, name, created_at]
     )
-    conn.commit()
-
-    # 获取刚插入的记录
-    cur.execute(
-        "SELECT id, name, token, created_at FROM api_tokens WHERE token = ?",
-        [token]
-    )
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
-
-    return dict(row)
+    return {"id": token_id, "name": name, "token": token, "created_at": created_at}
 
 
 @router.delete("/tokens/{token_id}")
@@ -493,39 +639,21 @@ async def delete_token(token_id: int, user: User = Depends(require_user)) -> dic
     返回:
     - ok: 是否删除成功
     """
-    import sqlite3
-    from app.core.config import settings
-
-    conn = sqlite3.connect(settings.database_path)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
     # 检查 Token 是否存在且属于当前用户
-    cur.execute(
-        "SELECT id, user_id FROM api_tokens WHERE id = ?",
-        [token_id]
-    )
-    row = cur.fetchone()
+    row = fetch_one_row("SELECT user_id FROM api_tokens WHERE id = ?", [token_id])
 
     if not row:
-        cur.close()
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Token 不存在"
         )
 
     if row["user_id"] != user.id:
-        cur.close()
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="无权删除此 Token"
         )
 
-    cur.execute("DELETE FROM api_tokens WHERE id = ?", [token_id])
-    conn.commit()
-    cur.close()
-    conn.close()
+    execute("DELETE FROM api_tokens WHERE id = ?", [token_id])
 
     return {"ok": True}
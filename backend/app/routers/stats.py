@@ -11,6 +11,7 @@ from app.auth import require_admin, require_user
 from app.core.config import settings
 from app.database import get_session
 from app.models import DownloadTask, User, UserTaskSubscription
+from app.services.storage import get_user_dir_usage
 
 
 router = APIRouter(prefix="/api/stats", tags=["stats"])
@@ -29,15 +30,7 @@ async def get_stats(user: User = Depends(require_user)) -> dict:
     - active_task_count: 用户活跃任务数
     """
     # 计算用户已使用的空间
-    user_dir = Path(settings.download_dir) / str(user.id)
-    used_space = 0
-    if user_dir.exists():
-        for file_path in user_dir.rglob("*"):
-            if file_path.is_file():
-                try:
-                    used_space += file_path.stat().st_size
-                except Exception:
-                    pass
+    used_space = get_user_dir_usage(user.id)
 
     # 用户配额
     user_quota = user.quota if user.quota else 100 * 1024 * 1024 * 1024  # 默认 100GB
@@ -8,6 +8,7 @@ from __future__ import annotations
 import asyncio
 import ipaddress
 import logging
+import re
 import shutil
 import socket
 from pathlib import Path
@@ -24,7 +25,7 @@ from app.auth import require_user
 from app.core.config import settings
 from app.core.rate_limit import api_limiter
 from app.core.security import mask_url_credentials
-from app.core.state import AppState, get_aria2_client, get_user_space_lock
+from app.core.state import AppState, get_aria2_client, get_user_space_lock, invalidate_active_tasks
 from app.database import get_session
 from app.models import (
     DownloadTask,
@@ -54,6 +55,9 @@ router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 # Minimum space required for magnet links (1MB)
 MAGNET_MIN_SPACE = 1 * 1024 * 1024
 
+# 磁力链接中的 info_hash（hex 40 位或 base32 32 位）
+_MAGNET_XT_RE = re.compile(r'xt=urn:btih:([a-fA-F0-9]{40}|[a-zA-Z2-7]{32})')
+
 
 # ========== SSRF 防护 ==========
 
@@ -177,8 +181,7 @@ def _get_display_name(task: DownloadTask) -> str:
         return task.name
     # 如果是磁力链接，提取 info_hash 并返回完整格式
     if task.uri and task.uri.startswith("magnet:"):
-        import re
-        match = re.search(r'xt=urn:btih:([a-fA-F0-9]{40}|[a-zA-Z2-7]{32})', task.uri)
+        match = _MAGNET_XT_RE.search(task.uri)
         if match:
             return f"magnet:?xt=urn:btih:{match.group(1)}"
     # 其他情况返回 name 或默认值
@@ -646,6 +649,7 @@ async def create_task(
                             db.add(db_task)
 
             # Broadcast update to all subscribers
+            invalidate_active_tasks(state)
             await _broadcast_task_update(state, task.id)
 
         asyncio.create_task(_do_add())
@@ -853,6 +857,7 @@ async def create_torrent_task(
                             db_task.updated_at = utc_now_str()
                             db.add(db_task)
 
+            invalidate_active_tasks(state)
             await _broadcast_task_update(state, task.id)
 
         asyncio.create_task(_do_add())
@@ -1011,11 +1016,7 @@ async def cancel_task(
             if db_task and db_task.gid and db_task.status in ("queued", "active", "error"):
                 client = _get_client(request)
                 try:
-                    await client.force_remove(db_task.gid)
-                except Exception:
-                    pass
-                try:
-                    await client.remove_download_result(db_task.gid)
+                    await client.force_remove_and_clear(db_task.gid)
                 except Exception:
                     pass
 
@@ -1030,6 +1031,7 @@ async def cancel_task(
                         db_task.error_display = "已取消"
                         db_task.updated_at = utc_now_str()
                         db.add(db_task)
+                invalidate_active_tasks(state)
 
                 # Clean up download directory
                 from app.services.storage import cleanup_task_download_dir
@@ -1064,7 +1066,7 @@ async def _broadcast_task_update(state: AppState, task_id: int) -> None:
 
     Handles connection failures gracefully.
     """
-    from app.aria2.sync import unregister_ws
+    from app.aria2.sync import encode_ws_message, unregister_ws
 
     async with get_session() as db:
         # Get task
@@ -1085,15 +1087,18 @@ async def _broadcast_task_update(state: AppState, task_id: int) -> None:
 
     # Broadcast to each subscriber
     for sub in subscriptions:
-        payload = _subscription_to_dict(sub, task)
-
         async with state.lock:
             sockets = list(state.ws_connections.get(sub.owner_id, set()))
+        if not sockets:
+            continue
+
+        # Encode once per subscriber, reuse the frame for all of its sockets
+        frame = encode_ws_message({"type": "task_update", "task": _subscription_to_dict(sub, task)})
 
         failed_sockets = []
         for ws in sockets:
             try:
-                await ws.send_json({"type": "task_update", "task": payload})
+                await ws.send_text(frame)
             except Exception as e:
                 logger.debug(f"WebSocket send failed for user {sub.owner_id}: {e}")
                 failed_sockets.append(ws)
@@ -1109,3 +1114,62 @@ async def _broadcast_task_update(state: AppState, task_id: int) -> None:
 async def broadcast_task_update_to_subscribers(state: AppState, task_id: int) -> None:
     """Public function to broadcast task updates (used by listener/sync)"""
     await _broadcast_task_update(state, task_id)
+
+
+async def broadcast_task_updates_to_subscribers(state: AppState, task_ids: list[int]) -> None:
+    """Broadcast a batch of task updates (used by sync)
+
+    Loads all tasks and subscriptions with one query each and sends a single
+    ``task_updates`` frame per socket instead of one frame per task.
+    """
+    from app.aria2.sync import encode_ws_message, unregister_ws
+
+    if not task_ids:
+        return
+
+    async with get_session() as db:
+        result = await db.exec(
+            select(DownloadTask).where(DownloadTask.id.in_(task_ids))
+        )
+        tasks = {task.id: task for task in result.all()}
+        if not tasks:
+            return
+
+        result = await db.exec(
+            select(UserTaskSubscription).where(
+                UserTaskSubscription.task_id.in_(list(tasks)),
+            )
+        )
+        subscriptions = result.all()
+
+    # Group payloads by subscriber
+    payloads_by_owner: dict[int, list[dict]] = {}
+    for sub in subscriptions:
+        payloads_by_owner.setdefault(sub.owner_id, []).append(
+            _subscription_to_dict(sub, tasks[sub.task_id])
+        )
+
+    async with state.lock:
+        sockets_by_owner = {
+            owner_id: list(state.ws_connections.get(owner_id, set()))
+            for owner_id in payloads_by_owner
+        }
+
+    for owner_id, payloads in payloads_by_owner.items():
+        sockets = sockets_by_owner[owner_id]
+        if not sockets:
+            continue
+        frame = encode_ws_message({"type": "task_updates", "tasks": payloads})
+        failed_sockets = []
+        for ws in sockets:
+            try:
+                await ws.send_text(frame)
+            except Exception as e:
+                logger.debug(f"WebSocket send failed for user {owner_id}: {e}")
+                failed_sockets.append(ws)
+
+        for ws in failed_sockets:
+            try:
+                await unregister_ws(state, owner_id, ws)
+            except Exception:
+                pass
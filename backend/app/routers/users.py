@@ -1,8 +1,8 @@
 """用户管理接口模块"""
+import asyncio
 import secrets
 import shutil
 from datetime import datetime, timezone
-from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy import text
@@ -10,11 +10,11 @@ from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
 from app.auth import clear_user_sessions, require_admin, require_user
-from app.core.config import settings
 from app.core.rate_limit import login_limiter
-from app.core.security import hash_password
+from app.core.security import hash_password_async
 from app.database import get_session
 from app.models import User, Session as SessionModel, Task, PackTask, UserFile
+from app.routers.aria2_rpc import invalidate_rpc_user_cache
 from app.schemas import RpcAccessStatus, RpcAccessToggle, UserCreate, UserOut, UserUpdate
 
 
@@ -65,7 +65,7 @@ async def create_user(payload: UserCreate, request: Request) -> dict:
 
             user = User(
                 username=payload.username,
-                password_hash=hash_password(payload.password),
+                password_hash=await hash_password_async(payload.password),
                 is_admin=payload.is_admin,
                 is_initial_password=True,  # 新用户需要自行修改密码
                 quota=quota,
@@ -90,6 +90,7 @@ async def create_user(payload: UserCreate, request: Request) -> dict:
             }
 
     # 首次创建用户：仅允许第一个请求插入
+    password_hash = await hash_password_async(payload.password)
     async with get_session() as db:
         quota = payload.quota if payload.quota is not None else 107374182400
         now = utc_now()
@@ -108,7 +109,7 @@ async def create_user(payload: UserCreate, request: Request) -> dict:
             ),
             {
                 "username": payload.username,
-                "password_hash": hash_password(payload.password),
+                "password_hash": password_hash,
                 "is_admin": payload.is_admin,
                 "quota": quota,
                 "created_at": now,
@@ -204,16 +205,19 @@ async def delete_user(
         # 删除用户
         await db.delete(user)
 
+    invalidate_rpc_user_cache(user_id)
+
     # 删除用户文件引用（正确递减 ref_count 并清理物理文件）
-    from app.services.storage import delete_user_file_reference
+    from app.services.storage import delete_user_file_reference, get_user_dir, invalidate_user_dir_usage
     for user_file_id in user_file_ids:
         await delete_user_file_reference(user_file_id)
 
     # 可选：删除用户下载目录
     if delete_files:
-        user_download_dir = Path(settings.download_dir) / str(user_id)
+        user_download_dir = get_user_dir(user_id)
         if user_download_dir.exists():
-            shutil.rmtree(user_download_dir, ignore_errors=True)
+            await asyncio.to_thread(shutil.rmtree, user_download_dir, ignore_errors=True)
+        invalidate_user_dir_usage(user_id)
 
     return {"ok": True}
 
@@ -262,7 +266,7 @@ async def update_user(user_id: int, payload: UserUpdate, admin: User = Depends(r
             user.username = payload.username
 
         if payload.password is not None:
-            user.password_hash = hash_password(payload.password)
+            user.password_hash = await hash_password_async(payload.password)
             user.is_initial_password = True  # 管理员重置密码后，用户需要自行修改
             # 密码修改后使该用户的所有 session 失效
             await clear_user_sessions(user_id)
@@ -343,6 +347,7 @@ async def set_rpc_access(
             db_user.rpc_secret_created_at = created_at
             db.add(db_user)
             await db.commit()
+            invalidate_rpc_user_cache(user.id)
             return RpcAccessStatus(
                 enabled=True,
                 secret=new_secret,
@@ -354,6 +359,7 @@ async def set_rpc_access(
             db_user.rpc_secret_created_at = None
             db.add(db_user)
             await db.commit()
+            invalidate_rpc_user_cache(user.id)
             return RpcAccessStatus(
                 enabled=False,
                 secret=None,
@@ -386,6 +392,7 @@ async def refresh_rpc_secret(user: User = Depends(require_user)) -> RpcAccessSta
         db_user.rpc_secret_created_at = created_at
         db.add(db_user)
         await db.commit()
+        invalidate_rpc_user_cache(user.id)
 
         return RpcAccessStatus(
             enabled=True,
@@ -5,13 +5,16 @@
 """
 from __future__ import annotations
 import shutil
+import sqlite3
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 from app.aria2.client import Aria2Client
 from app.core.config import settings
 from app.core.state import AppState
-from app.db import execute, fetch_all, fetch_one, utc_now
+from app.db import execute, fetch_all_rows, fetch_one_row, utc_now
+from app.services.storage import get_user_dir, get_user_dir_usage
 
 
 # JSON-RPC 2.0 错误码
@@ -43,6 +46,16 @@ class RpcError(Exception):
         return error
 
 
+@dataclass(slots=True)
+class RpcResult:
+    """RPC 方法调用结果：ok 为 True 时 value 为结果，否则携带错误码、信息和附加数据"""
+    ok: bool
+    value: Any = None
+    code: int = 0
+    message: str = ""
+    data: Any = None
+
+
 class Aria2RpcHandler:
     """aria2 RPC 方法处理器
 
@@ -108,10 +121,7 @@ class Aria2RpcHandler:
         Raises:
             RpcError: 方法不存在或执行失败
         """
-        # 移除方法名中的前缀得到处理器名
-        handler_name = self._get_handler_name(method)
-        handler = getattr(self, handler_name, None)
-
+        handler = self._resolve_handler(method)
         if handler is None:
             raise RpcError(
                 RpcErrorCode.METHOD_NOT_FOUND,
@@ -120,7 +130,27 @@ class Aria2RpcHandler:
 
         return await handler(params)
 
-    def _get_handler_name(self, method: str) -> str:
+    async def dispatch(self, method: str, params: list) -> RpcResult:
+        """路由到具体方法处理，以返回值而非异常表示 RPC 错误
+
+        方法不存在时直接返回错误结果，不抛出异常；方法内部的 RpcError 在此转换为结果。
+        非 RpcError 的意外异常照常抛出，由调用方处理。
+        """
+        handler = self._resolve_handler(method)
+        if handler is None:
+            return RpcResult(False, code=RpcErrorCode.METHOD_NOT_FOUND, message=f"Method not found: {method}")
+        try:
+            return RpcResult(True, await handler(params))
+        except RpcError as exc:
+            return RpcResult(False, code=exc.code, message=exc.message, data=exc.data)
+
+    def _resolve_handler(self, method: str):
+        """查找方法对应的处理器，支持的方法名使用预先计算的处理器名"""
+        handler_name = _HANDLER_NAMES.get(method) or self._get_handler_name(method)
+        return getattr(self, handler_name, None)
+
+    @staticmethod
+    def _get_handler_name(method: str) -> str:
         """将 RPC 方法名转换为处理器方法名
 
         aria2.addUri -> _handle_add_uri
@@ -148,8 +178,7 @@ class Aria2RpcHandler:
     def _get_user_download_dir(self) -> str:
         """获取用户下载目录"""
         if self._user_dir is None:
-            base = Path(settings.download_dir).resolve()
-            user_dir = base / str(self.user_id)
+            user_dir = get_user_dir(self.user_id)
             user_dir.mkdir(parents=True, exist_ok=True)
             self._user_dir = str(user_dir)
         return self._user_dir
@@ -157,23 +186,22 @@ class Aria2RpcHandler:
     def _get_user_incomplete_dir(self) -> str:
         """获取用户的 .incomplete 目录（下载中文件存放位置）"""
         if self._user_incomplete_dir is None:
-            base = Path(settings.download_dir).resolve()
-            incomplete_dir = base / str(self.user_id) / ".incomplete"
+            incomplete_dir = get_user_dir(self.user_id) / ".incomplete"
             incomplete_dir.mkdir(parents=True, exist_ok=True)
             self._user_incomplete_dir = str(incomplete_dir)
         return self._user_incomplete_dir
 
-    def _verify_task_owner(self, gid: str) -> dict | None:
+    def _verify_task_owner(self, gid: str) -> sqlite3.Row | None:
         """检查 gid 对应的任务是否属于当前用户
 
         Args:
             gid: 任务 GID
 
         Returns:
-            任务信息字典，如果不属于当前用户或不存在则返回 None
+            任务行（仅含 id），如果不属于当前用户或不存在则返回 None
         """
-        return fetch_one(
-            "SELECT * FROM tasks WHERE gid = ? AND owner_id = ?",
+        return fetch_one_row(
+            "SELECT id FROM tasks WHERE gid = ? AND owner_id = ?",
             [gid, self.user_id]
         )
 
@@ -186,13 +214,14 @@ class Aria2RpcHandler:
         if not path:
             return path
 
-        user_dir = Path(self._get_user_download_dir())
-        try:
-            abs_path = Path(path)
-            if abs_path.is_absolute() and str(abs_path).startswith(str(user_dir)):
-                return str(abs_path.relative_to(user_dir))
-        except (ValueError, RuntimeError):
-            pass
+        # 纯字符串前缀比较，避免每个路径构造多个 Path 对象
+        user_dir = self._get_user_download_dir()
+        if path.startswith(user_dir):
+            rest = path[len(user_dir):]
+            if not rest or rest == "/":
+                return "."
+            if rest[0] == "/":
+                return rest[1:].rstrip("/")
 
         return path
 
@@ -223,21 +252,13 @@ class Aria2RpcHandler:
     def _get_user_available_space(self) -> int:
         """获取用户实际可用空间（考虑配额和机器空间限制）"""
         # 获取用户配额
-        user = fetch_one("SELECT quota FROM users WHERE id = ?", [self.user_id])
+        user = fetch_one_row("SELECT quota FROM users WHERE id = ?", [self.user_id])
         if not user:
             return 0
-        user_quota = user.get("quota", 100 * 1024 * 1024 * 1024)  # 默认 100GB
+        user_quota = user["quota"]
 
         # 计算用户已使用的空间
-        user_dir = Path(settings.download_dir) / str(self.user_id)
-        used_space = 0
-        if user_dir.exists():
-            for file_path in user_dir.rglob("*"):
-                if file_path.is_file():
-                    try:
-                        used_space += file_path.stat().st_size
-                    except Exception:
-                        pass
+        used_space = get_user_dir_usage(self.user_id)
 
         # 获取机器实际剩余空间
         download_path = Path(settings.download_dir)
@@ -258,8 +279,8 @@ class Aria2RpcHandler:
         disk = shutil.disk_usage(download_path)
 
         # 从配置获取最小空闲空间
-        config = fetch_one("SELECT value FROM config WHERE key = 'min_free_disk'")
-        min_free = int(config["value"]) if config else 1073741824  # 默认 1GB
+        from app.routers.config import get_min_free_disk
+        min_free = get_min_free_disk()
 
         return disk.free > min_free, disk.free
 
@@ -547,7 +568,7 @@ class Aria2RpcHandler:
         keys = params[0] if params and isinstance(params[0], list) else None
 
         # 获取用户的所有活动任务 GID
-        user_tasks = fetch_all(
+        user_tasks = fetch_all_rows(
             "SELECT gid FROM tasks WHERE owner_id = ? AND status = 'active' AND gid IS NOT NULL",
             [self.user_id]
         )
@@ -586,7 +607,7 @@ class Aria2RpcHandler:
         keys = params[2] if len(params) > 2 and isinstance(params[2], list) else None
 
         # 获取用户的等待/暂停任务 GID
-        user_tasks = fetch_all(
+        user_tasks = fetch_all_rows(
             "SELECT gid FROM tasks WHERE owner_id = ? AND status IN ('waiting', 'paused', 'queued') AND gid IS NOT NULL",
             [self.user_id]
         )
@@ -623,7 +644,7 @@ class Aria2RpcHandler:
         keys = params[2] if len(params) > 2 and isinstance(params[2], list) else None
 
         # 获取用户的已停止任务 GID
-        user_tasks = fetch_all(
+        user_tasks = fetch_all_rows(
             "SELECT gid FROM tasks WHERE owner_id = ? AND status IN ('complete', 'error', 'stopped', 'removed') AND gid IS NOT NULL",
             [self.user_id]
         )
@@ -702,21 +723,21 @@ class Aria2RpcHandler:
         注意：这里返回的是用户自己的任务统计，而非真正的全局统计
         """
         # 从数据库获取用户任务统计
-        active_count = fetch_one(
+        active_count = fetch_one_row(
             "SELECT COUNT(*) as cnt FROM tasks WHERE owner_id = ? AND status = 'active'",
             [self.user_id]
         )
-        waiting_count = fetch_one(
+        waiting_count = fetch_one_row(
             "SELECT COUNT(*) as cnt FROM tasks WHERE owner_id = ? AND status IN ('waiting', 'paused', 'queued')",
             [self.user_id]
         )
-        stopped_count = fetch_one(
+        stopped_count = fetch_one_row(
             "SELECT COUNT(*) as cnt FROM tasks WHERE owner_id = ? AND status IN ('complete', 'error', 'stopped', 'removed')",
             [self.user_id]
         )
 
         # 获取用户活动任务的实时速度
-        user_tasks = fetch_all(
+        user_tasks = fetch_all_rows(
             "SELECT gid FROM tasks WHERE owner_id = ? AND status = 'active' AND gid IS NOT NULL",
             [self.user_id]
         )
@@ -809,10 +830,11 @@ class Aria2RpcHandler:
                 continue
 
             try:
-                result = await self.handle(method_name, method_params)
-                results.append([result])  # 成功时包装在数组中
-            except RpcError as exc:
-                results.append({"faultCode": exc.code, "faultString": exc.message})
+                result = await self.dispatch(method_name, method_params)
+                if result.ok:
+                    results.append([result.value])  # 成功时包装在数组中
+                else:
+                    results.append({"faultCode": result.code, "faultString": result.message})
             except Exception as exc:
                 results.append({"faultCode": RpcErrorCode.INTERNAL_ERROR, "faultString": str(exc)})
 
@@ -922,3 +944,10 @@ class Aria2RpcHandler:
         aria2.getSessionInfo()
         """
         return {"sessionId": "proxy"}
+
+
+# 支持的方法名 -> 处理器方法名，导入时计算一次（只收录固定列表，客户端传入的任意方法名不进入缓存）
+_HANDLER_NAMES = {
+    method: Aria2RpcHandler._get_handler_name(method)
+    for method in Aria2RpcHandler.SUPPORTED_METHODS
+}
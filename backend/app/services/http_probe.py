@@ -23,6 +23,11 @@ DEFAULT_TIMEOUT = 30
 # Maximum number of redirects to follow
 MAX_REDIRECTS = 10
 
+# Content-Disposition filename patterns, tried in this order
+_FILENAME_EXT_RE = re.compile(r"filename\*\s*=\s*([^;]+)", re.IGNORECASE)
+_FILENAME_QUOTED_RE = re.compile(r'filename\s*=\s*"([^"]+)"', re.IGNORECASE)
+_FILENAME_RE = re.compile(r"filename\s*=\s*([^;\s]+)", re.IGNORECASE)
+
 
 @dataclass
 class ProbeResult:
@@ -53,7 +58,7 @@ def _parse_content_disposition(header: str) -> str | None:
         return None
 
     # Try RFC 5987 encoded filename first (filename*=)
-    match = re.search(r"filename\*\s*=\s*([^;]+)", header, re.IGNORECASE)
+    match = _FILENAME_EXT_RE.search(header)
     if match:
         value = match.group(1).strip()
         # Format: charset'language'encoded_value
@@ -66,12 +71,12 @@ def _parse_content_disposition(header: str) -> str | None:
                 pass
 
     # Try regular filename parameter
-    match = re.search(r'filename\s*=\s*"([^"]+)"', header, re.IGNORECASE)
+    match = _FILENAME_QUOTED_RE.search(header)
     if match:
         return match.group(1)
 
     # Try unquoted filename
-    match = re.search(r"filename\s*=\s*([^;\s]+)", header, re.IGNORECASE)
+    match = _FILENAME_RE.search(header)
     if match:
         return match.group(1).strip()
 
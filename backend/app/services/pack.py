@@ -4,6 +4,7 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
 import re
 import shutil
 import shlex
@@ -19,6 +20,12 @@ from sqlmodel import select, func
 from app.core.config import settings
 from app.database import get_session
 from app.models import PackTask, User
+from app.services.storage import (
+    get_dir_size,
+    get_user_dir,
+    get_user_dir_usage,
+    invalidate_user_dir_usage,
+)
 
 
 # 全局打包队列锁
@@ -43,6 +50,9 @@ _ALLOWED_7ZA_ARG_PREFIXES = (
     "-p",     # 密码（允许用户加密）
 )
 
+# 7za 进度输出（如 " 45%"）
+_PROGRESS_RE = re.compile(r"(\d+)%")
+
 
 class PackTaskManager:
     """Manages async pack task execution"""
@@ -116,7 +126,7 @@ class PackTaskManager:
         on_progress: Callable[[int, int], None] | None = None
     ) -> None:
         """Actually perform the packing (called within lock)"""
-        user_dir = Path(settings.download_dir) / str(user_id)
+        user_dir = get_user_dir(user_id)
 
         # 判断是多文件还是单文件夹
         is_multi = folder_path.startswith("[")
@@ -128,10 +138,10 @@ class PackTaskManager:
                 return
             sources = [user_dir / p for p in paths]
             # 验证所有路径存在
-            for source in sources:
-                if not source.exists():
-                    await cls._update_task_error(task_id, f"Path does not exist: {source.name}")
-                    return
+            missing = await asyncio.to_thread(_find_missing_source, sources)
+            if missing is not None:
+                await cls._update_task_error(task_id, f"Path does not exist: {missing.name}")
+                return
         else:
             source = user_dir / folder_path
             if not source.exists():
@@ -152,15 +162,10 @@ class PackTaskManager:
         else:
             base_name = sources[0].name
 
-        output_filename = f"{base_name}.{pack_format}"
-        output_path = user_dir / output_filename
-
         # Ensure unique filename
-        counter = 1
-        while output_path.exists():
-            output_filename = f"{base_name}_{counter}.{pack_format}"
-            output_path = user_dir / output_filename
-            counter += 1
+        output_path = await asyncio.to_thread(
+            _unique_output_path, user_dir, base_name, pack_format
+        )
 
         # Update status to packing using CAS pattern
         async with get_session() as db:
@@ -239,7 +244,7 @@ class PackTaskManager:
             async for line in process.stdout:
                 line_text = line.decode("utf-8", errors="ignore").strip()
                 # 7za progress format: " 45%" or similar
-                match = re.search(r"(\d+)%", line_text)
+                match = _PROGRESS_RE.search(line_text)
                 if match:
                     new_progress = int(match.group(1))
                     if new_progress != progress:
@@ -261,19 +266,10 @@ class PackTaskManager:
                 output_size = output_path.stat().st_size if output_path.exists() else 0
 
                 # Delete source files/folders and their .aria2 control files
-                for source in sources:
-                    if source.is_dir():
-                        shutil.rmtree(source)
-                        # 删除目录对应的 .aria2 控制文件（如果存在）
-                        aria2_file = source.parent / f"{source.name}.aria2"
-                        if aria2_file.exists():
-                            aria2_file.unlink()
-                    elif source.is_file():
-                        source.unlink()
-                        # 删除文件对应的 .aria2 控制文件（如果存在）
-                        aria2_file = source.parent / f"{source.name}.aria2"
-                        if aria2_file.exists():
-                            aria2_file.unlink()
+                # concurrently in worker threads so large trees don't block the loop
+                await asyncio.gather(*(
+                    asyncio.to_thread(_remove_source, source) for source in sources
+                ))
 
                 # Update status using CAS pattern
                 async with get_session() as db:
@@ -319,6 +315,8 @@ class PackTaskManager:
                 output_path.unlink()
             await cls._update_task_error(task_id, str(exc))
         finally:
+            # 打包输出/删除源文件都会改变用户目录占用
+            invalidate_user_dir_usage(user_id)
             async with _running_tasks_lock:
                 cls._running_tasks.pop(task_id, None)
 
@@ -354,16 +352,51 @@ class PackTaskManager:
             )
 
 
+def _remove_source(source: Path) -> None:
+    """Delete a packed source file/folder and its .aria2 control file"""
+    if source.is_dir():
+        shutil.rmtree(source)
+    elif source.is_file():
+        source.unlink()
+    else:
+        return
+    # 删除对应的 .aria2 控制文件（如果存在）
+    aria2_file = source.parent / f"{source.name}.aria2"
+    if aria2_file.exists():
+        aria2_file.unlink()
+
+
+def _find_missing_source(sources: list[Path]) -> Path | None:
+    """Return the first source that does not exist, or None"""
+    for source in sources:
+        if not source.exists():
+            return source
+    return None
+
+
+def _unique_output_path(directory: Path, base_name: str, ext: str) -> Path:
+    """Pick a non-colliding ``base_name[_N].ext`` in directory
+
+    Uses a single scandir to collect existing names instead of one stat per
+    candidate.
+    """
+    try:
+        with os.scandir(directory) as it:
+            existing = {entry.name for entry in it}
+    except FileNotFoundError:
+        existing = set()
+
+    candidate = f"{base_name}.{ext}"
+    counter = 0
+    while candidate in existing:
+        counter += 1
+        candidate = f"{base_name}_{counter}.{ext}"
+    return directory / candidate
+
+
 def calculate_folder_size(path: Path) -> int:
     """Calculate total size of folder in bytes"""
-    total = 0
-    try:
-        for entry in path.rglob("*"):
-            if entry.is_file():
-                total += entry.stat().st_size
-    except Exception:
-        pass
-    return total
+    return get_dir_size(path)
 
 
 async def get_reserved_space() -> int:
@@ -400,15 +433,7 @@ async def get_user_available_space_for_pack(user_id: int) -> int:
         user_quota = user.quota if user and user.quota else 100 * 1024 * 1024 * 1024
 
     # Calculate user's current usage
-    user_dir = Path(settings.download_dir) / str(user_id)
-    used_space = 0
-    if user_dir.exists():
-        for file_path in user_dir.rglob("*"):
-            if file_path.is_file():
-                try:
-                    used_space += file_path.stat().st_size
-                except Exception:
-                    pass
+    used_space = get_user_dir_usage(user_id)
 
     user_remaining = max(0, user_quota - used_space)
     server_available = await get_server_available_space()
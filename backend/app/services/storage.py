@@ -8,8 +8,12 @@ Handles:
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
 import shutil
+import time
+from functools import lru_cache
 from pathlib import Path
 
 from sqlalchemy import delete, update
@@ -22,17 +26,92 @@ from app.services.hash import calculate_content_hash
 
 logger = logging.getLogger(__name__)
 
+# 用户目录占用缓存 {用户目录路径: (已用字节, 目录 mtime_ns, 计算时间)}
+_user_dir_usage_cache: dict[str, tuple[int, int, float]] = {}
+# 用户目录占用缓存有效期（秒），兜底子目录内文件增长不改变顶层 mtime 的情况
+_USER_DIR_USAGE_TTL = 30.0
+
+
+@lru_cache(maxsize=8)
+def _resolve_download_root(download_dir: str) -> Path:
+    return Path(download_dir).resolve()
+
+
+@lru_cache(maxsize=1024)
+def _resolve_user_dir(download_dir: str, user_id: int) -> Path:
+    return _resolve_download_root(download_dir) / str(user_id)
+
+
+def get_download_root() -> Path:
+    """Get the resolved download root (cached per configured download_dir)."""
+    return _resolve_download_root(settings.download_dir)
+
+
+def get_user_dir(user_id: int) -> Path:
+    """Get a user's legacy download directory (cached, not created)."""
+    return _resolve_user_dir(settings.download_dir, user_id)
+
+
+def get_dir_size(path: Path | str) -> int:
+    """Calculate total size of regular files under a directory (recursive).
+
+    Uses os.scandir so each entry costs at most one stat; symlinks are not
+    followed. Missing or unreadable directories count as 0.
+    """
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += get_dir_size(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return total
+
+
+def get_user_dir_usage(user_id: int) -> int:
+    """Get used bytes of a user's download directory (cached).
+
+    The cached value is reused while the directory mtime is unchanged and the
+    entry is younger than _USER_DIR_USAGE_TTL; otherwise it is recomputed.
+    """
+    user_dir = str(get_user_dir(user_id))
+    try:
+        mtime_ns = os.stat(user_dir).st_mtime_ns
+    except OSError:
+        _user_dir_usage_cache.pop(user_dir, None)
+        return 0
+
+    now = time.monotonic()
+    cached = _user_dir_usage_cache.get(user_dir)
+    if cached and cached[1] == mtime_ns and now - cached[2] < _USER_DIR_USAGE_TTL:
+        return cached[0]
+
+    used = get_dir_size(user_dir)
+    _user_dir_usage_cache[user_dir] = (used, mtime_ns, now)
+    return used
+
+
+def invalidate_user_dir_usage(user_id: int) -> None:
+    """Drop the cached usage of a user's download directory."""
+    _user_dir_usage_cache.pop(str(get_user_dir(user_id)), None)
+
 
 def get_store_dir() -> Path:
     """Get the store directory path."""
-    store_dir = Path(settings.download_dir).resolve() / "store"
+    store_dir = get_download_root() / "store"
     store_dir.mkdir(parents=True, exist_ok=True)
     return store_dir
 
 
 def get_downloading_dir() -> Path:
     """Get the downloading directory path."""
-    downloading_dir = Path(settings.download_dir).resolve() / "downloading"
+    downloading_dir = get_download_root() / "downloading"
     downloading_dir.mkdir(parents=True, exist_ok=True)
     return downloading_dir
 
@@ -111,7 +190,7 @@ async def move_to_store(
 
     # Calculate size
     if source_path.is_dir():
-        size = sum(f.stat().st_size for f in source_path.rglob("*") if f.is_file())
+        size = get_dir_size(source_path)
         is_directory = True
     else:
         size = source_path.stat().st_size
@@ -369,18 +448,26 @@ async def delete_user_file_reference(user_file_id: int) -> bool:
     return True
 
 
+def _remove_path(path: Path) -> bool:
+    """Remove a file or directory tree; returns False if it did not exist."""
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+    else:
+        return False
+    return True
+
+
 async def _delete_stored_file_by_path(real_path: str) -> None:
     """Delete physical file by path."""
     path = Path(real_path)
-    if path.exists():
-        try:
-            if path.is_dir():
-                shutil.rmtree(path)
-            else:
-                path.unlink()
+    try:
+        # rmtree on a large tree would block the event loop, run it in a thread
+        if await asyncio.to_thread(_remove_path, path):
             logger.info(f"Deleted physical file: {path}")
-        except Exception as e:
-            logger.error(f"Failed to delete physical file {path}: {e}")
+    except Exception as e:
+        logger.error(f"Failed to delete physical file {path}: {e}")
 
 
 async def cleanup_task_download_dir(task_id: int) -> None:
@@ -392,12 +479,11 @@ async def cleanup_task_download_dir(task_id: int) -> None:
         task_id: The DownloadTask ID
     """
     task_dir = get_downloading_dir() / str(task_id)
-    if task_dir.exists():
-        try:
-            shutil.rmtree(task_dir)
+    try:
+        if await asyncio.to_thread(_remove_path, task_dir):
             logger.info(f"Cleaned up task download directory: {task_dir}")
-        except Exception as e:
-            logger.error(f"Failed to clean up task directory {task_dir}: {e}")
+    except Exception as e:
+        logger.error(f"Failed to clean up task directory {task_dir}: {e}")
 
 
 async def get_user_used_space_async(user_id: int) -> int:
@@ -441,12 +527,31 @@ async def get_user_frozen_space(user_id: int) -> int:
         return sum(sub.frozen_space for sub in subscriptions)
 
 
-async def get_user_space_info(user_id: int, user_quota: int) -> dict:
+def get_machine_free_space() -> int:
+    """Get free bytes on the download partition.
+
+    The download directory is created at startup; it is only re-created here
+    if it has gone missing.
+    """
+    try:
+        return shutil.disk_usage(settings.download_dir).free
+    except FileNotFoundError:
+        Path(settings.download_dir).mkdir(parents=True, exist_ok=True)
+        return shutil.disk_usage(settings.download_dir).free
+
+
+async def get_user_space_info(
+    user_id: int,
+    user_quota: int,
+    machine_free: int | None = None,
+) -> dict:
     """Get comprehensive space information for a user.
 
     Args:
         user_id: The user ID
         user_quota: User's quota in bytes
+        machine_free: Free bytes on the download partition if the caller
+            already has it (e.g. once per sync tick); queried when None
 
     Returns:
         Dict with used, frozen, available, and quota
@@ -455,10 +560,8 @@ async def get_user_space_info(user_id: int, user_quota: int) -> dict:
     frozen = await get_user_frozen_space(user_id)
 
     # Get machine free space
-    download_path = Path(settings.download_dir)
-    download_path.mkdir(parents=True, exist_ok=True)
-    disk = shutil.disk_usage(download_path)
-    machine_free = disk.free
+    if machine_free is None:
+        machine_free = get_machine_free_space()
 
     # Available = min(quota - used - frozen, machine_free)
     quota_available = max(0, user_quota - used - frozen)
@@ -3,7 +3,8 @@
 import os
 import sqlite3
 import tempfile
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Generator
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -103,7 +104,7 @@ def test_admin(temp_db: str) -> dict:
 def user_session(test_user: dict, temp_db: str) -> str:
     """Create a session for the test user."""
     session_id = "test_session_123"
-    expires_at = (datetime.now(timezone.utc) + timedelta(hours=12)).isoformat()
+    expires_at = int(time.time()) + 12 * 3600
     execute(
         "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
         [session_id, test_user["id"], expires_at]
@@ -115,7 +116,7 @@ def user_session(test_user: dict, temp_db: str) -> str:
 def admin_session(test_admin: dict, temp_db: str) -> str:
     """Create a session for the admin user."""
     session_id = "admin_session_456"
-    expires_at = (datetime.now(timezone.utc) + timedelta(hours=12)).isoformat()
+    expires_at = int(time.time()) + 12 * 3600
     execute(
         "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
         [session_id, test_admin["id"], expires_at]
@@ -153,6 +154,7 @@ def mock_aria2_client() -> AsyncMock:
     mock.unpause.return_value = "test_gid_12345"
     mock.force_remove.return_value = "test_gid_12345"
     mock.remove_download_result.return_value = "OK"
+    mock.force_remove_and_clear.return_value = None
     return mock
 
 
@@ -10,3 +10,263 @@ def test_aria2_rpc_handler_requires_app_state():
     client = Aria2Client("http://localhost:6800/jsonrpc")
     with pytest.raises(RuntimeError):
         Aria2RpcHandler(user_id=1, aria2_client=client, app_state=None)
+
+
+async def test_dispatch_returns_errors_as_results(temp_db):
+    """dispatch reports unknown methods and RpcError failures as results instead of raising."""
+    from app.core.state import AppState
+    from app.services.aria2_rpc_handler import RpcErrorCode
+
+    client = Aria2Client("http://localhost:6800/jsonrpc")
+    handler = Aria2RpcHandler(user_id=12, aria2_client=client, app_state=AppState())
+
+    result = await handler.dispatch("aria2.noSuchMethod", [])
+    assert not result.ok
+    assert result.code == RpcErrorCode.METHOD_NOT_FOUND
+    assert result.message == "Method not found: aria2.noSuchMethod"
+
+    result = await handler.dispatch("aria2.tellStatus", ["0123456789abcdef"])
+    assert not result.ok
+    assert result.code == RpcErrorCode.TASK_NOT_FOUND
+
+    result = await handler.dispatch("system.listMethods", [])
+    assert result.ok
+    assert "system.multicall" in result.value
+
+
+def test_sanitize_path_strips_user_dir(temp_db):
+    """Absolute paths under the user's dir become relative; others pass through."""
+    from app.core.state import AppState
+
+    client = Aria2Client("http://localhost:6800/jsonrpc")
+    handler = Aria2RpcHandler(user_id=12, aria2_client=client, app_state=AppState())
+    user_dir = handler._get_user_download_dir()
+
+    assert handler._sanitize_path(f"{user_dir}/movie/file.mp4") == "movie/file.mp4"
+    assert handler._sanitize_path(f"{user_dir}/.incomplete/a.iso") == ".incomplete/a.iso"
+    assert handler._sanitize_path(f"{user_dir}/") == "."
+    assert handler._sanitize_path(user_dir) == "."
+    # 前缀相同但属于其他用户目录
+    assert handler._sanitize_path(f"{user_dir}3/secret.txt") == f"{user_dir}3/secret.txt"
+    assert handler._sanitize_path("/other/path.txt") == "/other/path.txt"
+    assert handler._sanitize_path("") == ""
+
+
+def test_jsonrpc_endpoint_returns_json_error(client):
+    """JSON-RPC errors are serialized as JSON bodies with HTTP 200."""
+    resp = client.post("/aria2/jsonrpc", content=b"not json")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == {
+        "jsonrpc": "2.0",
+        "error": {"code": -32700, "message": "Parse error: Invalid JSON"},
+        "id": None,
+    }
+
+
+def test_rpc_secret_lookup_cached_until_rotated(authenticated_client, test_user):
+    """RPC secret lookups are cached; rotating the secret invalidates the old one."""
+    from unittest.mock import patch
+
+    from app.routers.aria2_rpc import get_user_by_rpc_secret
+
+    old_secret = authenticated_client.put("/api/users/me/rpc-access", json={"enabled": True}).json()["secret"]
+    assert get_user_by_rpc_secret(old_secret)["id"] == test_user["id"]
+
+    with patch("app.routers.aria2_rpc.fetch_one") as fetch_one:
+        assert get_user_by_rpc_secret(old_secret)["id"] == test_user["id"]
+        fetch_one.assert_not_called()
+
+    new_secret = authenticated_client.post("/api/users/me/rpc-access/refresh").json()["secret"]
+    assert get_user_by_rpc_secret(old_secret) is None
+    assert get_user_by_rpc_secret(new_secret)["id"] == test_user["id"]
+
+
+async def test_rpc_secret_cache_refreshes_in_background(authenticated_client, test_user):
+    """Entries past the refresh age are served while one background refresh runs."""
+    import asyncio
+    from unittest.mock import patch
+
+    from app.routers import aria2_rpc
+
+    secret = authenticated_client.put("/api/users/me/rpc-access", json={"enabled": True}).json()["secret"]
+    with patch("app.routers.aria2_rpc.time", return_value=1000.0):
+        assert aria2_rpc.get_user_by_rpc_secret(secret)["id"] == test_user["id"]
+
+    with patch("app.routers.aria2_rpc.time", return_value=1027.0), \
+            patch("app.routers.aria2_rpc._query_user_by_rpc_secret", return_value=None) as query:
+        assert aria2_rpc.get_user_by_rpc_secret(secret)["id"] == test_user["id"]
+        for _ in range(100):
+            if not aria2_rpc._rpc_user_refreshing:
+                break
+            await asyncio.sleep(0.01)
+        assert query.call_count == 1
+        # 后台刷新发现 Secret 已失效，缓存被移除
+        assert aria2_rpc._rpc_secret_key(secret) not in aria2_rpc._rpc_user_cache
+
+
+async def test_rpc_secret_refresh_dropped_after_invalidation(temp_db):
+    """A background refresh that finishes after an invalidation does not re-cache the user."""
+    import asyncio
+    from unittest.mock import patch
+
+    from app.routers import aria2_rpc
+
+    cache_key = aria2_rpc._rpc_secret_key("rotated")
+    user = {"id": 42, "username": "u", "is_admin": 0, "quota": 0}
+    aria2_rpc._rpc_user_refreshing.add(cache_key)
+    with patch("app.routers.aria2_rpc._query_user_by_rpc_secret", return_value=user):
+        # 查询在失效前完成，写回排在失效之后
+        aria2_rpc._refresh_rpc_user(
+            cache_key, "rotated", aria2_rpc._rpc_user_cache_generation, asyncio.get_running_loop()
+        )
+    aria2_rpc.invalidate_rpc_user_cache(42)
+    await asyncio.sleep(0)
+
+    assert cache_key not in aria2_rpc._rpc_user_cache
+    assert cache_key not in aria2_rpc._rpc_user_refreshing
+
+
+def test_rpc_handler_reused_per_user(temp_db):
+    """The same user, client and app state share one handler instance."""
+    from app.core.state import AppState
+    from app.routers.aria2_rpc import get_rpc_handler
+
+    client = Aria2Client("http://localhost:6800/jsonrpc")
+    state = AppState()
+    handler = get_rpc_handler(1, client, state)
+
+    assert get_rpc_handler(1, client, state) is handler
+    assert get_rpc_handler(2, client, state) is not handler
+    assert get_rpc_handler(1, client, AppState()) is not handler
+
+
+def test_jsonrpc_endpoint_rejects_missing_token(client):
+    """Valid JSON bodies are parsed and reach token authentication."""
+    resp = client.post(
+        "/aria2/jsonrpc",
+        content=b'{"jsonrpc": "2.0", "method": "aria2.getVersion", "params": [], "id": "7"}',
+    )
+
+    assert resp.status_code == 200
+    assert resp.json()["error"] == {"code": 1, "message": "Missing token parameter"}
+
+
+def test_extract_token_fast():
+    """The token prefilter reads params[0] from raw bytes and bails out on anything unusual."""
+    from app.routers.aria2_rpc import extract_token_fast
+
+    assert extract_token_fast(b'{"params": ["token:abc", []]}') == "abc"
+    assert extract_token_fast(b'[{"params":["token:s3cret"]},{"params":["token:other"]}]') == "s3cret"
+    assert extract_token_fast(b'{"params": []}') is None
+    assert extract_token_fast(b'{"params": ["token:"]}') is None
+    assert extract_token_fast(b'{"params": ["token:a\\"b"]}') is None
+    assert extract_token_fast(b'{"params": ["token:' + b"x" * 300 + b'"]}') is None
+    # Only params[0] counts; token-like strings elsewhere fall through to the full parse
+    assert extract_token_fast(b'{"id": "token:1", "params": ["token:abc"]}') is None
+    assert extract_token_fast(b'{"method": "token:x", "params": []}') is None
+    assert extract_token_fast(b'{"params" :\n [ "token:abc"]}') == "abc"
+
+
+def test_jsonrpc_endpoint_rejects_invalid_token_before_parsing(client):
+    """Bodies carrying an unknown token are rejected without a full JSON parse."""
+    from unittest.mock import patch
+
+    with patch("app.routers.aria2_rpc.orjson.loads") as loads:
+        resp = client.post(
+            "/aria2/jsonrpc",
+            content=b'{"jsonrpc": "2.0", "method": "aria2.getVersion", "params": ["token:nope"], "id": "7"}',
+        )
+        loads.assert_not_called()
+
+    assert resp.json()["error"] == {"code": 1, "message": "Invalid token"}
+
+
+def test_jsonrpc_endpoint_accepts_token_like_id(authenticated_client):
+    """A string id starting with token: does not shadow the real params[0] token."""
+    import json
+
+    secret = authenticated_client.put("/api/users/me/rpc-access", json={"enabled": True}).json()["secret"]
+    payload = {"jsonrpc": "2.0", "id": "token:nope", "method": "system.listMethods", "params": [f"token:{secret}"]}
+    resp = authenticated_client.post("/aria2/jsonrpc", content=json.dumps(payload))
+
+    body = resp.json()
+    assert "error" not in body
+    assert body["id"] == "token:nope"
+    assert "system.multicall" in body["result"]
+
+
+def test_jsonrpc_batch_runs_concurrently_in_order(authenticated_client):
+    """Batch sub-requests run concurrently and responses keep request order."""
+    import asyncio
+    import json
+    from unittest.mock import patch
+
+    secret = authenticated_client.put("/api/users/me/rpc-access", json={"enabled": True}).json()["secret"]
+    in_flight = 0
+    peak = 0
+
+    async def fake_process(request_body, handler, remaining_params_override=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"jsonrpc": "2.0", "result": remaining_params_override, "id": request_body["id"]}
+
+    batch = [
+        {"jsonrpc": "2.0", "method": "aria2.getVersion", "params": [f"token:{secret}", i], "id": i}
+        for i in range(4)
+    ]
+    with patch("app.routers.aria2_rpc.process_single_request", fake_process):
+        resp = authenticated_client.post("/aria2/jsonrpc", content=json.dumps(batch))
+
+    body = resp.json()
+    assert [item["id"] for item in body] == [0, 1, 2, 3]
+    assert body[0]["result"] == [0]
+    assert peak == 4
+
+
+def test_jsonrpc_mixed_batch_runs_in_client_order(authenticated_client):
+    """Batches containing state-changing methods run one item at a time, in order."""
+    import asyncio
+    import json
+    from unittest.mock import patch
+
+    secret = authenticated_client.put("/api/users/me/rpc-access", json={"enabled": True}).json()["secret"]
+    events = []
+
+    async def fake_process(request_body, handler, remaining_params_override=None):
+        events.append(("start", request_body["id"]))
+        # Earlier items take longer, so concurrent execution would finish out of order
+        await asyncio.sleep(0.01 * (4 - request_body["id"]))
+        events.append(("end", request_body["id"]))
+        return {"jsonrpc": "2.0", "result": "OK", "id": request_body["id"]}
+
+    methods = ["aria2.addUri", "aria2.tellStatus", "aria2.pause", "aria2.unpause"]
+    batch = [
+        {"jsonrpc": "2.0", "method": method, "params": [f"token:{secret}"], "id": i}
+        for i, method in enumerate(methods)
+    ]
+    with patch("app.routers.aria2_rpc.process_single_request", fake_process):
+        resp = authenticated_client.post("/aria2/jsonrpc", content=json.dumps(batch))
+
+    assert [item["id"] for item in resp.json()] == [0, 1, 2, 3]
+    assert events == [(kind, i) for i in range(4) for kind in ("start", "end")]
+
+
+def test_jsonrpc_endpoint_authenticates_once(authenticated_client):
+    """The token found by the byte prefilter is not looked up a second time."""
+    import json
+    from unittest.mock import patch
+
+    from app.routers.aria2_rpc import get_user_by_rpc_secret
+
+    secret = authenticated_client.put("/api/users/me/rpc-access", json={"enabled": True}).json()["secret"]
+    payload = {"jsonrpc": "2.0", "method": "system.listMethods", "params": [f"token:{secret}"], "id": 1}
+    with patch("app.routers.aria2_rpc.get_user_by_rpc_secret", wraps=get_user_by_rpc_secret) as lookup:
+        resp = authenticated_client.post("/aria2/jsonrpc", content=json.dumps(payload))
+
+    assert "system.multicall" in resp.json()["result"]
+    lookup.assert_called_once_with(secret)
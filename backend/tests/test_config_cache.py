@@ -0,0 +1,242 @@
+"""配置缓存测试"""
+from unittest.mock import patch
+
+from app.core.state import get_aria2_client
+from app.routers.config import get_config_value, set_config_value_async
+
+
+async def test_aria2_client_config_served_from_cache(temp_db):
+    """测试 aria2 客户端配置走缓存，修改配置后立即生效"""
+    await set_config_value_async("aria2_rpc_url", "http://aria2.test:6800/jsonrpc")
+    await set_config_value_async("aria2_rpc_secret", "s3cret")
+
+    with patch("app.routers.config.fetch_one_row") as fetch_one_row:
+        client = get_aria2_client()
+        fetch_one_row.assert_not_called()
+    assert client._rpc_url == "http://aria2.test:6800/jsonrpc"
+    assert client._secret == "s3cret"
+
+    await set_config_value_async("aria2_rpc_secret", "")
+    assert get_aria2_client()._secret == ""
+
+
+async def test_aria2_client_reused_for_same_config(temp_db):
+    """测试相同配置复用同一个 aria2 客户端实例"""
+    await set_config_value_async("aria2_rpc_url", "http://aria2.test:6800/jsonrpc")
+    await set_config_value_async("aria2_rpc_secret", "a")
+
+    client = get_aria2_client()
+    assert get_aria2_client() is client
+
+    await set_config_value_async("aria2_rpc_secret", "b")
+    assert get_aria2_client() is not client
+    assert get_aria2_client()._secret == "b"
+
+
+async def test_aria2_client_keeps_session_and_closes_replaced(temp_db):
+    """测试 aria2 客户端复用持久会话，配置变化后旧客户端的会话被关闭"""
+    import asyncio
+
+    from aiohttp import web
+
+    from app.core import state
+
+    async def rpc(request):
+        return web.json_response({"id": "aria2", "result": {"version": "1.37.0"}})
+
+    app = web.Application()
+    app.router.add_post("/jsonrpc", rpc)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        await set_config_value_async("aria2_rpc_url", f"http://127.0.0.1:{port}/jsonrpc")
+        client = get_aria2_client()
+        assert (await client.get_version())["version"] == "1.37.0"
+        session = client._session
+        await client.get_version()
+        assert client._session is session
+
+        await set_config_value_async("aria2_rpc_secret", "rotated")
+        earlier = set(state._closing_clients)
+        assert get_aria2_client() is not client
+        await asyncio.gather(*(state._closing_clients - earlier))
+        assert session.closed
+    finally:
+        await state.close_aria2_client()
+        await runner.cleanup()
+
+
+def test_config_cache_is_per_database(temp_db, tmp_path, monkeypatch):
+    """测试切换数据库路径后不会读到旧库的缓存值"""
+    from app.core.config import settings
+    from app.db import execute, init_db
+
+    assert get_config_value("pack_format") == "zip"
+
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "other.db"))
+    init_db()
+    execute("UPDATE config SET value = '7z' WHERE key = 'pack_format'")
+
+    assert get_config_value("pack_format") == "7z"
+
+
+async def test_prime_config_cache_batches_misses(temp_db):
+    """测试批量预热配置只执行一次查询，之后单键读取命中缓存"""
+    from app.routers.config import prime_config_cache
+
+    values = await prime_config_cache(("pack_format", "no_such_key", "min_free_disk"))
+    assert values["pack_format"] == "zip"
+    assert values["no_such_key"] is None
+
+    with patch("app.routers.config.fetch_one_row") as fetch_one_row, patch("app.routers.config.get_session") as get_session:
+        assert get_config_value("pack_format") == "zip"
+        assert (await prime_config_cache(("pack_format", "no_such_key")))["no_such_key"] is None
+        fetch_one_row.assert_not_called()
+        get_session.assert_not_called()
+
+
+async def test_set_config_values_updates_and_inserts(temp_db):
+    """测试批量设置配置：已有键更新、新键插入，缓存同步更新"""
+    from app.db import fetch_one_row
+    from app.routers.config import set_config_values_async
+
+    await set_config_values_async({"pack_format": "7z", "brand_new_key": "x"})
+
+    assert fetch_one_row("SELECT value FROM config WHERE key = 'pack_format'")["value"] == "7z"
+    assert fetch_one_row("SELECT value FROM config WHERE key = 'brand_new_key'")["value"] == "x"
+    with patch("app.routers.config.fetch_one_row") as db_read:
+        assert get_config_value("pack_format") == "7z"
+        assert get_config_value("brand_new_key") == "x"
+        db_read.assert_not_called()
+
+
+async def test_set_config_values_skips_unchanged(temp_db):
+    """测试值与新鲜缓存相同的键不写数据库"""
+    from app.routers.config import set_config_values_async
+
+    assert get_config_value("pack_format") == "zip"
+    with patch("app.routers.config.get_session") as get_session:
+        await set_config_values_async({"pack_format": "zip"})
+        get_session.assert_not_called()
+
+
+async def test_typed_config_defaults_and_clamps(temp_db):
+    """测试数值型配置：未设置或无法解析时取默认值，超出范围时截断"""
+    from app.routers.config import (
+        get_download_token_expiry,
+        get_pack_compression_level,
+        get_ws_reconnect_factor,
+        get_ws_reconnect_max_delay,
+    )
+
+    await set_config_value_async("pack_compression_level", "42")
+    await set_config_value_async("ws_reconnect_factor", "abc")
+    await set_config_value_async("ws_reconnect_max_delay", "")
+    await set_config_value_async("download_token_expiry", "5")
+
+    assert get_pack_compression_level() == 9
+    assert get_ws_reconnect_factor() == 2.0
+    assert get_ws_reconnect_max_delay() == 60.0
+    assert get_download_token_expiry() == 60
+
+
+def test_config_cache_is_bounded():
+    """测试配置缓存超过上限时淘汰最早写入的条目"""
+    from app.routers.config import _ConfigCache
+
+    cache = _ConfigCache(2)
+    cache["a"] = (1, 0.0)
+    cache["b"] = (2, 0.0)
+    cache["a"] = (3, 0.0)
+    cache["c"] = (4, 0.0)
+
+    assert list(cache) == ["a", "c"]
+    assert cache.get("b") is None
+    # 值未变化的写入（仅刷新时间）不改变版本号
+    version = cache.version
+    cache["a"] = (3, 1.0)
+    assert cache.version == version
+
+
+def test_get_config_etag(client, admin_session):
+    """测试配置未变化时 GET /api/config 返回 304，修改后 ETag 变化"""
+    from app.core.config import settings
+
+    client.cookies.set(settings.session_cookie_name, admin_session)
+    first = client.get("/api/config")
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/config", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    client.put("/api/config", json={"pack_format": "7z"})
+    changed = client.get("/api/config", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["pack_format"] == "7z"
+    assert changed.headers["ETag"] != etag
+
+
+async def test_stale_config_served_while_refreshing(temp_db):
+    """测试过期缓存在陈旧期内照常返回，并在后台刷新为新值"""
+    import asyncio
+    import threading
+
+    from app.db import execute
+    from app.routers import config
+
+    # 后台刷新等待 release 后才读取数据库，由测试决定刷新何时完成
+    release = threading.Event()
+    refresh = config._refresh_config_value
+
+    def blocked_refresh(cache_key, loop):
+        release.wait(5)
+        refresh(cache_key, loop)
+
+    with patch("app.routers.config.time", return_value=1000.0):
+        assert get_config_value("pack_format") == "zip"
+    execute("UPDATE config SET value = '7z' WHERE key = 'pack_format'")
+
+    with patch("app.routers.config.time", return_value=1100.0), \
+            patch("app.routers.config._refresh_config_value", blocked_refresh):
+        assert get_config_value("pack_format") == "zip"
+        assert get_config_value("pack_format") == "zip"
+        assert len(config._refreshing) == 1
+
+        release.set()
+        for _ in range(100):
+            if not config._refreshing:
+                break
+            await asyncio.sleep(0.01)
+        assert not config._refreshing
+        assert get_config_value("pack_format") == "7z"
+
+
+def test_stale_config_read_synchronously_without_loop(temp_db):
+    """测试不在事件循环中时过期缓存不返回，直接同步读取"""
+    from app.db import execute
+
+    with patch("app.routers.config.time", return_value=1000.0):
+        assert get_config_value("pack_format") == "zip"
+    execute("UPDATE config SET value = '7z' WHERE key = 'pack_format'")
+
+    with patch("app.routers.config.time", return_value=1100.0):
+        assert get_config_value("pack_format") == "7z"
+
+
+def test_generate_api_token_format():
+    """测试 API Token 格式：aria2_ 前缀 + 24 位字母数字，且每次不同"""
+    import string
+
+    from app.routers.config import generate_api_token
+
+    tokens = {generate_api_token() for _ in range(50)}
+    assert len(tokens) == 50
+    for token in tokens:
+        assert token.startswith("aria2_")
+        random_part = token[len("aria2_"):]
+        assert len(random_part) == 24
+        assert set(random_part) <= set(string.ascii_letters + string.digits)
@@ -81,3 +81,248 @@ async def test_database_integrity_with_corrupted_db():
         settings.database_path = original_path
         reset_engine()
         Path(tmp_path).unlink(missing_ok=True)
+
+
+def test_init_db_migrates_iso_session_expiry(monkeypatch, tmp_path):
+    """测试旧版 ISO 字符串格式的 session 过期时间迁移为 Unix 时间戳"""
+    import sqlite3
+
+    from app.db import init_db
+
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE sessions (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, expires_at TEXT NOT NULL)"
+    )
+    conn.executemany(
+        "INSERT INTO sessions VALUES (?, ?, ?)",
+        [("ok", 1, "2030-01-01T08:00:00.123456+08:00"), ("bad", 1, "not-a-date")],
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(settings, "database_path", str(db_path))
+    init_db()
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT id, expires_at, typeof(expires_at) FROM sessions").fetchall()
+    conn.close()
+    assert rows == [("ok", 1893456000, "integer")]
+
+
+def test_init_db_records_schema_version_and_skips_warm_start(monkeypatch, tmp_path):
+    """测试迁移完成后写入 user_version，再次启动时跳过迁移"""
+    import sqlite3
+
+    from app.db import SCHEMA_VERSION, init_db
+
+    db_path = tmp_path / "fresh.db"
+    monkeypatch.setattr(settings, "database_path", str(db_path))
+    init_db()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+    assert {"quota", "rpc_secret", "is_initial_password"} <= columns
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {
+        "idx_tasks_owner_status",
+        "idx_tasks_gid",
+        "idx_sessions_user",
+        "idx_sessions_expires",
+        "idx_users_rpc_secret",
+    } <= indexes
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM users WHERE rpc_secret = ?", ["x"]
+    ).fetchall()
+    assert "idx_users_rpc_secret" in " ".join(row[-1] for row in plan)
+    # 删除一张表后再次启动，版本号已是最新，不应重建
+    conn.execute("DROP TABLE pack_tasks")
+    conn.commit()
+    conn.close()
+
+    init_db()
+
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    assert "pack_tasks" not in tables
+
+
+def test_init_db_rolls_back_schema_on_failure(monkeypatch, tmp_path):
+    """测试迁移中途失败时建表整体回滚，版本号不变"""
+    import sqlite3
+
+    import app.db as legacy_db
+
+    db_path = tmp_path / "broken.db"
+    monkeypatch.setattr(settings, "database_path", str(db_path))
+    monkeypatch.setattr(legacy_db, "_INDEX_STATEMENTS", ("CREATE INDEX idx_bad ON missing(x)",))
+
+    with pytest.raises(sqlite3.OperationalError):
+        legacy_db.init_db()
+
+    conn = sqlite3.connect(db_path)
+    tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    assert tables == []
+    assert version == 0
+
+
+def test_legacy_connection_reused_and_follows_database_path(monkeypatch, tmp_path):
+    """测试旧版查询复用同一连接，数据库路径变化时重新连接"""
+    import app.db as legacy_db
+
+    first = tmp_path / "first.db"
+    second = tmp_path / "second.db"
+
+    monkeypatch.setattr(settings, "database_path", str(first))
+    legacy_db.execute("CREATE TABLE t (v INTEGER)")
+    legacy_db.execute("INSERT INTO t VALUES (1)")
+    conn = legacy_db._get_shared_connection()
+    assert legacy_db.fetch_one("SELECT v FROM t") == {"v": 1}
+    assert legacy_db._get_shared_connection() is conn
+
+    monkeypatch.setattr(settings, "database_path", str(second))
+    legacy_db.execute("CREATE TABLE t (v INTEGER)")
+    assert legacy_db._get_shared_connection() is not conn
+    assert legacy_db.fetch_one("SELECT v FROM t") is None
+
+    # 失败的语句回滚，不影响后续查询
+    with pytest.raises(Exception):
+        legacy_db.execute("INSERT INTO missing VALUES (1)")
+    assert legacy_db.fetch_all("SELECT v FROM t") == []
+    legacy_db.close_shared_connection()
+
+
+def test_fetch_rows_return_sqlite_rows(monkeypatch, tmp_path):
+    """测试 fetch_all_rows / fetch_one_row 直接返回 sqlite3.Row，支持按列名和下标访问"""
+    import sqlite3
+
+    import app.db as legacy_db
+
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "rows.db"))
+    legacy_db.execute("CREATE TABLE t (gid TEXT, v INTEGER)")
+    legacy_db.execute("INSERT INTO t VALUES ('a', 1)")
+
+    rows = legacy_db.fetch_all_rows("SELECT gid, v FROM t")
+    assert len(rows) == 1
+    assert isinstance(rows[0], sqlite3.Row)
+    assert rows[0]["gid"] == "a"
+    assert rows[0][1] == 1
+
+    row = legacy_db.fetch_one_row("SELECT gid, v FROM t WHERE gid = ?", ["a"])
+    assert isinstance(row, sqlite3.Row)
+    assert row["v"] == 1
+    assert legacy_db.fetch_one_row("SELECT gid FROM t WHERE gid = ?", ["missing"]) is None
+    legacy_db.close_shared_connection()
+
+
+def test_legacy_connections_are_per_thread_wal(monkeypatch, tmp_path):
+    """测试旧版查询每个线程使用独立的 WAL 连接，关闭后重新打开"""
+    import threading
+
+    import app.db as legacy_db
+
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "threads.db"))
+    legacy_db.execute("CREATE TABLE t (v INTEGER)")
+    main_conn = legacy_db._get_shared_connection()
+    assert legacy_db.fetch_one("PRAGMA journal_mode") == {"journal_mode": "wal"}
+    assert legacy_db._connection_key() in legacy_db._wal_databases
+
+    seen = {}
+
+    def worker():
+        legacy_db.execute("INSERT INTO t VALUES (1)")
+        seen["conn"] = legacy_db._get_shared_connection()
+        # journal_mode 为库级持久设置，其他线程的新连接无需再切换
+        seen["journal_mode"] = legacy_db.fetch_one("PRAGMA journal_mode")["journal_mode"]
+        seen["busy_timeout"] = legacy_db.fetch_one("PRAGMA busy_timeout")["timeout"]
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert seen["conn"] is not main_conn
+    assert seen["journal_mode"] == "wal"
+    assert seen["busy_timeout"] == 30000
+    assert legacy_db.fetch_one("SELECT COUNT(*) AS n FROM t") == {"n": 1}
+
+    legacy_db.close_shared_connection()
+    assert legacy_db._get_shared_connection() is not main_conn
+    assert legacy_db.fetch_one("SELECT COUNT(*) AS n FROM t") == {"n": 1}
+    legacy_db.close_shared_connection()
+
+
+def test_legacy_reads_use_query_only_connection(monkeypatch, tmp_path):
+    """测试旧版查询的读连接为只读，写入统一走写连接"""
+    import sqlite3
+
+    import app.db as legacy_db
+
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "rw.db"))
+    legacy_db.execute("CREATE TABLE t (v INTEGER)")
+    legacy_db.execute("INSERT INTO t VALUES (1)")
+
+    reader = legacy_db._get_shared_connection()
+    assert reader is not legacy_db._writer_conn
+    assert reader.execute("PRAGMA query_only").fetchone()[0] == 1
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("INSERT INTO t VALUES (2)")
+
+    # 写连接提交后读连接立即可见
+    legacy_db.execute("INSERT INTO t VALUES (3)")
+    assert legacy_db.fetch_all("SELECT v FROM t ORDER BY v") == [{"v": 1}, {"v": 3}]
+    legacy_db.close_shared_connection()
+    assert legacy_db._writer_conn is None
+
+
+@pytest.mark.asyncio
+async def test_engine_connections_apply_pragmas():
+    """测试引擎新建连接时应用连接级 PRAGMA"""
+    from sqlalchemy import text
+
+    engine = _get_engine()
+    async with engine.connect() as conn:
+        temp_store = (await conn.execute(text("PRAGMA temp_store"))).scalar()
+        cache_size = (await conn.execute(text("PRAGMA cache_size"))).scalar()
+    assert temp_store == 2  # MEMORY
+    assert cache_size == -65536
+
+
+@pytest.mark.asyncio
+async def test_optimize_database_periodically_runs_on_interval():
+    """测试后台任务按间隔执行 PRAGMA optimize，可被取消"""
+    import asyncio
+    from unittest.mock import AsyncMock, patch
+
+    from app.database import optimize_database_periodically
+
+    with patch("app.database.optimize_database", new=AsyncMock()) as optimize:
+        task = asyncio.create_task(optimize_database_periodically(0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert optimize.await_count >= 2
+
+
+def test_legacy_connection_reused_until_path_changes(monkeypatch, tmp_path):
+    """测试旧版连接只在数据库路径变化时重新打开，内存数据库也复用同一写连接"""
+    import app.db as legacy_db
+
+    monkeypatch.setattr(settings, "database_path", ":memory:")
+    legacy_db.execute("CREATE TABLE t (v INTEGER)")
+    writer = legacy_db._writer_conn
+    legacy_db.execute("INSERT INTO t VALUES (1)")
+    assert legacy_db._writer_conn is writer
+
+    reader = legacy_db._get_shared_connection()
+    assert legacy_db._get_shared_connection() is reader
+
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "other.db"))
+    legacy_db.execute("CREATE TABLE t (v INTEGER)")
+    assert legacy_db._writer_conn is not writer
+    assert legacy_db._get_shared_connection() is not reader
+    legacy_db.close_shared_connection()
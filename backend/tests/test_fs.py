@@ -0,0 +1,29 @@
+"""文件系统辅助函数测试"""
+import os
+
+from app.core.fs import preallocate_file, try_fallocate
+
+
+class TestFallocate:
+    def test_preallocate_keeps_visible_size(self, tmp_path):
+        path = tmp_path / "download.bin"
+        path.write_bytes(b"abc")
+
+        preallocate_file(str(path), 1024 * 1024)
+
+        assert path.stat().st_size == 3
+
+    def test_missing_file_is_skipped(self, tmp_path):
+        assert preallocate_file(str(tmp_path / "missing.bin"), 1024) is False
+
+    def test_non_positive_length_is_noop(self, tmp_path):
+        path = tmp_path / "empty.bin"
+        path.touch()
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            assert try_fallocate(fd, 0) is False
+        finally:
+            os.close(fd)
+
+    def test_invalid_fd_returns_false(self):
+        assert try_fallocate(-1, 1024) is False
@@ -1,6 +1,7 @@
 """Tests for initial password (zero-knowledge password) functionality."""
 
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import datetime, timezone
 
 import pytest
 from fastapi.testclient import TestClient
@@ -90,7 +91,7 @@ class TestAdminResetUserPassword:
 
         # Create admin session
         session_id = "admin_session_test"
-        expires_at = (datetime.now(timezone.utc) + timedelta(hours=12)).isoformat()
+        expires_at = int(time.time()) + 12 * 3600
         execute(
             "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
             [session_id, admin_id, expires_at]
@@ -135,7 +136,7 @@ class TestChangePassword:
 
         # Create session
         session_id = "change_session_test"
-        expires_at = (datetime.now(timezone.utc) + timedelta(hours=12)).isoformat()
+        expires_at = int(time.time()) + 12 * 3600
         execute(
             "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
             [session_id, user_id, expires_at]
@@ -168,7 +169,7 @@ class TestChangePassword:
 
         # Create session
         session_id = "init_session_test"
-        expires_at = (datetime.now(timezone.utc) + timedelta(hours=12)).isoformat()
+        expires_at = int(time.time()) + 12 * 3600
         execute(
             "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
             [session_id, user_id, expires_at]
@@ -204,7 +205,7 @@ class TestMeEndpoint:
 
         # Create session
         session_id = "me_session_test"
-        expires_at = (datetime.now(timezone.utc) + timedelta(hours=12)).isoformat()
+        expires_at = int(time.time()) + 12 * 3600
         execute(
             "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
             [session_id, user_id, expires_at]
@@ -215,3 +216,14 @@ class TestMeEndpoint:
 
         assert response.status_code == 200
         assert response.json()["is_initial_password"] is True
+
+    def test_me_response_matches_user_out_schema(self, authenticated_client: TestClient, test_user: dict):
+        """/me skips response_model validation but still returns every UserOut field."""
+        from app.schemas import UserOut
+
+        response = authenticated_client.get("/api/auth/me")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert set(body) == set(UserOut.model_fields)
+        assert UserOut.model_validate(body).model_dump() == body
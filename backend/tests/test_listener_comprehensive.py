@@ -3,6 +3,7 @@
 Tests for enhanced idempotency, frozen space release, and state mapping.
 """
 import asyncio
+import json
 import os
 import tempfile
 from datetime import datetime, timezone
@@ -3154,8 +3155,8 @@ class TestBroadcastTaskUpdateStatusOverride:
         captured_payloads = []
 
         class MockWebSocket:
-            async def send_json(self, data):
-                captured_payloads.append(data)
+            async def send_text(self, data):
+                captured_payloads.append(json.loads(data))
 
         mock_ws = MockWebSocket()
 
@@ -3231,8 +3232,8 @@ class TestBroadcastTaskUpdateStatusOverride:
         captured_payloads = []
 
         class MockWebSocket:
-            async def send_json(self, data):
-                captured_payloads.append(data)
+            async def send_text(self, data):
+                captured_payloads.append(json.loads(data))
 
         mock_ws = MockWebSocket()
 
@@ -833,6 +833,32 @@ class TestSpaceCalculation:
         size = calculate_folder_size(Path("/nonexistent/path"))
         assert size == 0
 
+    def test_unique_output_path_skips_existing_names(self, tmp_path: Path):
+        """_unique_output_path picks the first free numeric suffix."""
+        from app.services.pack import _unique_output_path
+
+        (tmp_path / "movie.zip").touch()
+        (tmp_path / "movie_1.zip").touch()
+
+        assert _unique_output_path(tmp_path, "movie", "zip") == tmp_path / "movie_2.zip"
+        assert _unique_output_path(tmp_path, "other", "zip") == tmp_path / "other.zip"
+        assert _unique_output_path(tmp_path / "missing", "a", "7z").name == "a.7z"
+
+    def test_find_missing_source(self, tmp_path: Path):
+        """_find_missing_source reports the first source absent from its parent."""
+        from app.services.pack import _find_missing_source
+
+        (tmp_path / "a.txt").touch()
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "b.txt").touch()
+
+        present = [tmp_path / "a.txt", tmp_path / "sub", tmp_path / "sub" / "b.txt"]
+        assert _find_missing_source(present) is None
+        assert _find_missing_source(present + [tmp_path / "c.txt"]) == tmp_path / "c.txt"
+        assert _find_missing_source([tmp_path / "nope" / "x"]) == tmp_path / "nope" / "x"
+        (tmp_path / "dangling").symlink_to(tmp_path / "gone")
+        assert _find_missing_source([tmp_path / "dangling"]) == tmp_path / "dangling"
+
 
 # ========== PackTaskManager Tests ==========
 
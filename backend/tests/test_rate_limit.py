@@ -13,7 +13,7 @@ from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 
 from app.core.config import settings
-from app.core.rate_limit import ApiRateLimiter
+from app.core.rate_limit import ApiRateLimiter, LoginRateLimiter
 
 
 class TestApiRateLimiter:
@@ -107,6 +107,102 @@ class TestApiRateLimiter:
         # 剩余 3 次
         assert await limiter.get_remaining(user_id, endpoint, limit=5) == 3
 
+    async def test_periodic_sweep_drops_expired_keys(self):
+        """测试定期清理会删除窗口已过期的 key"""
+        limiter = ApiRateLimiter()
+        for user_id in range(10):
+            await limiter.is_allowed(user_id, "test", limit=5, window_seconds=1)
+
+        await asyncio.sleep(1.1)
+        limiter._last_gc = 0.0
+        await limiter.is_allowed(99, "test", limit=5, window_seconds=1)
+
+        assert list(limiter._requests) == ["99:test"]
+
+
+class TestLoginRateLimiter:
+    """LoginRateLimiter 单元测试"""
+
+    async def test_blocks_after_max_failures_and_expires(self):
+        """测试失败次数达到上限后被阻止，窗口过期后解除"""
+        with patch("app.core.rate_limit.time", return_value=100.0):
+            limiter = LoginRateLimiter(max_attempts=3, window_seconds=10)
+            for _ in range(3):
+                await limiter.record_failure("1.2.3.4")
+            assert await limiter.is_blocked("1.2.3.4")
+            assert not await limiter.is_blocked("5.6.7.8")
+
+        # 仍在窗口内：计数保留
+        with patch("app.core.rate_limit.time", return_value=109.0):
+            assert await limiter.is_blocked("1.2.3.4")
+
+        # 超过窗口加一个桶后，旧桶被淘汰
+        with patch("app.core.rate_limit.time", return_value=112.0):
+            assert not await limiter.is_blocked("1.2.3.4")
+
+    async def test_clear_removes_key_from_all_buckets(self):
+        """测试登录成功后清除所有桶中的失败记录"""
+        with patch("app.core.rate_limit.time", return_value=100.0):
+            limiter = LoginRateLimiter(max_attempts=2, window_seconds=10)
+            await limiter.record_failure("1.2.3.4")
+        with patch("app.core.rate_limit.time", return_value=104.0):
+            await limiter.record_failure("1.2.3.4")
+            assert await limiter.is_blocked("1.2.3.4")
+            await limiter.clear("1.2.3.4")
+            assert not await limiter.is_blocked("1.2.3.4")
+
+    async def test_idle_keys_drop_out_with_bucket_rotation(self):
+        """测试空闲 key 随桶轮换自动淘汰，桶数量有上限"""
+        with patch("app.core.rate_limit.time", return_value=100.0):
+            limiter = LoginRateLimiter(max_attempts=3, window_seconds=10)
+            for ip in ("1.1.1.1", "2.2.2.2"):
+                await limiter.record_failure(ip)
+
+        with patch("app.core.rate_limit.time", return_value=1000.0):
+            assert not await limiter.is_blocked("3.3.3.3")
+
+        assert len(limiter._buckets) == LoginRateLimiter._BUCKETS + 1
+        assert not any(limiter._buckets)
+
+
+class TestRpcRateLimiter:
+    """aria2 JSON-RPC 限流器单元测试"""
+
+    def test_blocks_when_bucket_empty_and_refills(self):
+        """测试令牌耗尽后被阻止，令牌按速率逐步补充"""
+        from app.routers.aria2_rpc import RpcRateLimiter
+
+        limiter = RpcRateLimiter(max_requests=4, window_seconds=10)
+        with patch("app.routers.aria2_rpc.time", return_value=100.0):
+            for _ in range(4):
+                assert limiter.try_acquire("1.2.3.4")
+            assert not limiter.try_acquire("1.2.3.4")
+            assert limiter.try_acquire("5.6.7.8")
+
+        # 每 2.5 秒补充一个令牌
+        with patch("app.routers.aria2_rpc.time", return_value=102.5):
+            assert limiter.try_acquire("1.2.3.4")
+            assert not limiter.try_acquire("1.2.3.4")
+
+        # 空闲一个窗口后令牌补满，但不超过容量
+        with patch("app.routers.aria2_rpc.time", return_value=200.0):
+            for _ in range(4):
+                assert limiter.try_acquire("1.2.3.4")
+            assert not limiter.try_acquire("1.2.3.4")
+
+    def test_periodic_sweep_drops_idle_ips(self):
+        """测试定期清理会删除空闲 IP 的记录"""
+        from app.routers.aria2_rpc import RpcRateLimiter
+
+        limiter = RpcRateLimiter(max_requests=3, window_seconds=1)
+        with patch("app.routers.aria2_rpc.time", return_value=100.0):
+            limiter.try_acquire("1.1.1.1")
+
+        with patch("app.routers.aria2_rpc.time", return_value=200.0):
+            limiter.try_acquire("2.2.2.2")
+
+        assert list(limiter._buckets) == ["2.2.2.2"]
+
 
 class TestApiRateLimitIntegration:
     """API 频率限制集成测试"""
@@ -163,3 +259,25 @@ class TestApiRateLimitIntegration:
             )
             assert response.status_code == 429
             assert "频繁" in response.json()["detail"]
+
+
+class TestRpcPreflight:
+    """aria2 JSON-RPC 预检请求不计入限流"""
+
+    def test_options_does_not_consume_rpc_tokens(self, client: TestClient):
+        """测试 CORS 预检和普通 OPTIONS 请求都不进入 RPC 处理流程"""
+        from app.routers.aria2_rpc import rpc_limiter
+
+        with patch.object(rpc_limiter, "try_acquire") as try_acquire:
+            preflight = client.options(
+                "/aria2/jsonrpc",
+                headers={
+                    "Origin": "http://localhost:3000",
+                    "Access-Control-Request-Method": "POST",
+                },
+            )
+            plain = client.options("/aria2/jsonrpc")
+            try_acquire.assert_not_called()
+
+        assert preflight.status_code == 200
+        assert plain.status_code == 405
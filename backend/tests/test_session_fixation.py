@@ -110,3 +110,34 @@ class TestSessionFixationProtection:
                 assert response.status_code == 200
             else:
                 assert response.status_code == 401
+
+
+class TestSessionExpiry:
+    """session 过期测试"""
+
+    async def test_expired_session_rejected_and_removed(self, temp_db, test_user):
+        """测试过期 session 不返回用户，并在后台被删除"""
+        import asyncio
+        import time
+
+        from app.auth import get_user_by_session
+        from app.db import execute, fetch_one
+
+        execute(
+            "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
+            ["expired_session", test_user["id"], int(time.time()) - 10],
+        )
+        execute(
+            "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
+            ["valid_session", test_user["id"], int(time.time()) + 3600],
+        )
+
+        assert await get_user_by_session("expired_session") is None
+        user = await get_user_by_session("valid_session")
+        assert user is not None and user.id == test_user["id"]
+
+        for _ in range(50):
+            if fetch_one("SELECT id FROM sessions WHERE id = ?", ["expired_session"]) is None:
+                break
+            await asyncio.sleep(0.01)
+        assert fetch_one("SELECT id FROM sessions WHERE id = ?", ["expired_session"]) is None
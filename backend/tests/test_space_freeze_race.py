@@ -278,7 +278,7 @@ class TestSyncTasksSpaceFreeze:
 
         state = AppState()
         mock_client = AsyncMock()
-        mock_client.tell_status.return_value = {
+        mock_client.multi_tell_status.return_value = [{
             "gid": gid,
             "status": "active",
             "totalLength": str(total_length),
@@ -287,9 +287,9 @@ class TestSyncTasksSpaceFreeze:
             "uploadSpeed": "0",
             "files": [{"path": "dummy"}],
             "connections": "0",
-        }
+        }]
 
-        async def fake_space_info(user_id: int, quota: int):
+        async def fake_space_info(user_id: int, quota: int, machine_free: int | None = None):
             return {
                 "available": total_length + 1,
                 "used": 0,
@@ -325,7 +325,7 @@ class TestSyncTasksSpaceFreeze:
 
         state = AppState()
         mock_client = AsyncMock()
-        mock_client.tell_status.return_value = {
+        mock_client.multi_tell_status.return_value = [{
             "gid": gid,
             "status": "active",
             "totalLength": str(total_length),
@@ -334,11 +334,11 @@ class TestSyncTasksSpaceFreeze:
             "uploadSpeed": "0",
             "files": [{"path": "dummy"}],
             "connections": "0",
-        }
+        }]
         mock_client.force_remove.return_value = "OK"
         mock_client.remove_download_result.return_value = "OK"
 
-        async def fake_space_info(user_id: int, quota: int):
+        async def fake_space_info(user_id: int, quota: int, machine_free: int | None = None):
             return {
                 "available": total_length - 1,
                 "used": 0,
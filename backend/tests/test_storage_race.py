@@ -826,3 +826,49 @@ class TestSameUserConcurrentReferenceCreation:
 
         # Verify physical file is deleted
         assert not file_dir.exists(), "Physical file should be deleted"
+
+
+class TestUserDirUsageCache:
+    """Test the mtime-invalidated user directory usage cache."""
+
+    def test_usage_cached_until_dir_changes_or_invalidated(self, temp_db_storage):
+        from app.services.storage import get_user_dir_usage, invalidate_user_dir_usage
+
+        user_dir = Path(temp_db_storage["download_dir"]) / "7"
+        (user_dir / "sub").mkdir(parents=True)
+        (user_dir / "sub" / "a.bin").write_bytes(b"x" * 100)
+        assert get_user_dir_usage(7) == 100
+
+        # Nested growth does not touch the top-level mtime: cached value is kept
+        (user_dir / "sub" / "b.bin").write_bytes(b"x" * 50)
+        assert get_user_dir_usage(7) == 100
+
+        invalidate_user_dir_usage(7)
+        assert get_user_dir_usage(7) == 150
+
+        # A new top-level entry changes the directory mtime
+        (user_dir / "c.bin").write_bytes(b"x" * 10)
+        os.utime(user_dir, ns=(0, os.stat(user_dir).st_mtime_ns + 1))
+        assert get_user_dir_usage(7) == 160
+
+    def test_missing_user_dir_is_zero(self, temp_db_storage):
+        from app.services.storage import get_user_dir_usage
+
+        assert get_user_dir_usage(424242) == 0
+
+
+class TestTaskDirCleanup:
+    """Test task download directory cleanup runs off the event loop."""
+
+    async def test_cleanup_task_download_dir_removes_tree(self, temp_db_storage):
+        from app.services.storage import cleanup_task_download_dir, get_downloading_dir
+
+        task_dir = get_downloading_dir() / "99"
+        (task_dir / "a" / "b").mkdir(parents=True)
+        (task_dir / "a" / "b" / "f.bin").write_bytes(b"x")
+
+        await cleanup_task_download_dir(99)
+        assert not task_dir.exists()
+
+        # Missing directory is a no-op
+        await cleanup_task_download_dir(99)
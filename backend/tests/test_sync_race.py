@@ -360,3 +360,191 @@ class TestPeakValueSequentialUpdates:
                 )
                 db_task = result.first()
                 assert db_task.peak_download_speed == initial_peak
+
+
+class TestUpdateTaskStatementCache:
+    """Test the keyset-specialized UPDATE used by _update_task."""
+
+    @pytest.mark.asyncio
+    async def test_update_task_keeps_peak_and_reuses_statement(self, temp_db_sync, test_task_sync):
+        from app.aria2.sync import _UPDATE_STMT_CACHE, _update_task
+
+        task_id = test_task_sync.id
+        await _update_task(task_id, {"download_speed": 500, "peak_download_speed": 500})
+        cached = len(_UPDATE_STMT_CACHE)
+        await _update_task(task_id, {"download_speed": 100, "peak_download_speed": 100})
+        assert len(_UPDATE_STMT_CACHE) == cached
+
+        async with get_session() as db:
+            result = await db.exec(select(DownloadTask).where(DownloadTask.id == task_id))
+            task = result.first()
+            assert task.download_speed == 100
+            assert task.peak_download_speed == 500
+
+
+class TestMapStatus:
+    """Test aria2 status mapping."""
+
+    def test_map_status_full_and_partial(self):
+        from app.aria2.sync import _map_status
+
+        mapped = _map_status({
+            "status": "active",
+            "totalLength": "100",
+            "completedLength": "40",
+            "downloadSpeed": "7",
+            "uploadSpeed": "1",
+            "files": [{"path": "/downloads/downloading/1/movie.mkv"}],
+        }, 1)
+        assert mapped["name"] == "movie.mkv"
+        assert (mapped["total_length"], mapped["completed_length"]) == (100, 40)
+        assert mapped["error"] is None
+
+        partial = _map_status({
+            "status": "error",
+            "errorMessage": "errorCode=3 not found",
+            "bittorrent": {"info": {"name": "ubuntu"}},
+            "files": [],
+        }, 2)
+        assert partial["name"] == "ubuntu"
+        assert partial["total_length"] == 0
+        assert partial["error_display"]
+
+
+class TestActiveTaskSnapshot:
+    """Test the in-memory active task snapshot used by the sync loop."""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_reused_until_invalidated(self, temp_db_sync, test_task_sync):
+        from app.aria2.sync import _apply_to_active_tasks, _load_active_tasks
+        from app.core.state import AppState, invalidate_active_tasks
+
+        state = AppState()
+        tasks = await _load_active_tasks(state)
+        assert [t.id for t in tasks] == [test_task_sync.id]
+
+        async with get_session() as db:
+            db.add(DownloadTask(
+                uri_hash="snapshot_hash", uri="https://example.com/b.zip",
+                gid="gid_snapshot_b", status="active",
+                created_at=utc_now_str(), updated_at=utc_now_str(),
+            ))
+
+        assert len(await _load_active_tasks(state)) == 1
+        invalidate_active_tasks(state)
+        assert len(await _load_active_tasks(state)) == 2
+
+        _apply_to_active_tasks(state, [(test_task_sync.id, {"status": "complete"})])
+        assert test_task_sync.id not in state.active_tasks
+
+
+class TestMultiTellStatus:
+    """Test batching tellStatus through system.multicall."""
+
+    @pytest.mark.asyncio
+    async def test_multicall_payload_and_fault_mapping(self):
+        from app.aria2.client import Aria2Client
+
+        client = Aria2Client("http://localhost:6800/jsonrpc", "secret")
+        fault = {"code": 1, "message": "GID not found"}
+        with patch.object(client, "_post", new_callable=AsyncMock, return_value=[[{"gid": "a"}], fault]) as post:
+            results = await client.multi_tell_status(["a", "b"])
+
+        method, params = post.call_args.args
+        assert method == "system.multicall"
+        assert params == [[
+            {"methodName": "aria2.tellStatus", "params": ["token:secret", "a"]},
+            {"methodName": "aria2.tellStatus", "params": ["token:secret", "b"]},
+        ]]
+        assert results[0] == {"gid": "a"}
+        assert isinstance(results[1], RuntimeError)
+
+
+class TestForceRemoveAndClear:
+    """Test clearing aria2 download results after a forced removal."""
+
+    @pytest.mark.asyncio
+    async def test_force_remove_defers_clear_to_stop_status_query(self):
+        from app.aria2.client import Aria2Client
+
+        client = Aria2Client("http://localhost:6800/jsonrpc")
+        with patch.object(client, "force_remove", new_callable=AsyncMock, return_value="g1") as force_remove, \
+                patch.object(client, "remove_download_result", new_callable=AsyncMock) as remove_result, \
+                patch.object(client, "_post", new_callable=AsyncMock,
+                             return_value=[[{"gid": "g1"}], ["OK"]]) as post:
+            await client.force_remove_and_clear("g1")
+            force_remove.assert_awaited_once_with("g1")
+            # 活动任务异步停止，等停止事件后才清除结果
+            remove_result.assert_not_awaited()
+            post.assert_not_awaited()
+
+            # 停止事件的状态查询与清除合并为一次 multicall
+            assert await client.tell_status("g1", clear_removed=True) == {"gid": "g1"}
+            method, params = post.await_args.args
+            assert method == "system.multicall"
+            assert [call["methodName"] for call in params[0]] == [
+                "aria2.tellStatus", "aria2.removeDownloadResult",
+            ]
+
+            # 结果只清除一次
+            await client.tell_status("g1", clear_removed=True)
+            assert post.await_args.args[0] == "aria2.tellStatus"
+
+    @pytest.mark.asyncio
+    async def test_force_remove_on_stopped_task_clears_immediately(self):
+        from app.aria2.client import Aria2Client
+
+        client = Aria2Client("http://localhost:6800/jsonrpc")
+        with patch.object(client, "force_remove", new_callable=AsyncMock,
+                          side_effect=RuntimeError({"code": 1, "message": "Active Download not found"})), \
+                patch.object(client, "remove_download_result", new_callable=AsyncMock,
+                             return_value="OK") as remove_result, \
+                patch.object(client, "_post", new_callable=AsyncMock, return_value={"gid": "g1"}) as post:
+            await client.force_remove_and_clear("g1")
+            await client.tell_status("g1", clear_removed=True)
+
+        remove_result.assert_awaited_once_with("g1")
+        assert post.await_args.args[0] == "aria2.tellStatus"
+
+    @pytest.mark.asyncio
+    async def test_stop_of_unrelated_task_keeps_result(self):
+        from app.aria2.client import Aria2Client
+
+        client = Aria2Client("http://localhost:6800/jsonrpc")
+        with patch.object(client, "_post", new_callable=AsyncMock, return_value={"gid": "g2"}) as post:
+            await client.tell_status("g2", clear_removed=True)
+
+        post.assert_awaited_once_with("aria2.tellStatus", ["g2"])
+
+
+class TestBulkUpdateTasks:
+    """Test the per-cycle executemany task update."""
+
+    @pytest.mark.asyncio
+    async def test_bulk_update_groups_by_keyset(self, temp_db_sync, test_task_sync):
+        from app.aria2.sync import _bulk_update_tasks
+
+        async with get_session() as db:
+            other = DownloadTask(
+                uri_hash="bulk_hash", uri="https://example.com/bulk.zip",
+                gid="gid_bulk", status="active", peak_download_speed=900,
+                created_at=utc_now_str(), updated_at=utc_now_str(),
+            )
+            db.add(other)
+            await db.commit()
+            await db.refresh(other)
+
+        async with get_session() as db:
+            await _bulk_update_tasks(db, [
+                (test_task_sync.id, {"download_speed": 300, "peak_download_speed": 300}),
+                (other.id, {"download_speed": 200, "peak_download_speed": 200}),
+                (other.id, {"gid": "gid_bulk_next"}),
+            ])
+
+        async with get_session() as db:
+            first = (await db.exec(select(DownloadTask).where(DownloadTask.id == test_task_sync.id))).first()
+            second = (await db.exec(select(DownloadTask).where(DownloadTask.id == other.id))).first()
+
+        assert (first.download_speed, first.peak_download_speed) == (300, 300)
+        assert (second.download_speed, second.peak_download_speed) == (200, 900)
+        assert second.gid == "gid_bulk_next"
@@ -1,4 +1,6 @@
 """Tests for task cancellation endpoint edge cases."""
+from unittest.mock import AsyncMock, patch
+
 import pytest
 from sqlmodel import select
 
@@ -57,3 +59,58 @@ class TestCancelTaskWithoutGid:
             assert db_task is not None
             assert db_task.status == "error"
             assert db_task.error_display == "已取消"
+
+
+class TestCancelActiveTaskClearsResult:
+    """Cancelling an active task clears its aria2 result once aria2 stops it."""
+
+    @pytest.mark.asyncio
+    async def test_stop_event_clears_result_of_cancelled_task(self, authenticated_client, test_user):
+        from app.aria2.client import Aria2Client
+        from app.aria2.listener import handle_aria2_event
+        from app.core.state import AppState
+
+        async with get_session() as db:
+            task = DownloadTask(
+                uri_hash="cancel_active_hash",
+                uri="https://example.com/active.zip",
+                gid="active_gid",
+                status="active",
+                name="active.zip",
+                total_length=0,
+                completed_length=0,
+                created_at=utc_now_str(),
+                updated_at=utc_now_str(),
+            )
+            db.add(task)
+            await db.commit()
+            await db.refresh(task)
+
+            subscription = UserTaskSubscription(
+                owner_id=test_user["id"],
+                task_id=task.id,
+                frozen_space=0,
+                status="pending",
+                created_at=utc_now_str(),
+            )
+            db.add(subscription)
+            await db.commit()
+            await db.refresh(subscription)
+
+            sub_id = subscription.id
+
+        # 在类上打桩：取消接口与监听器使用的是不同的客户端实例
+        with patch.object(Aria2Client, "force_remove", new_callable=AsyncMock, return_value="active_gid"), \
+                patch.object(Aria2Client, "_multicall", new_callable=AsyncMock,
+                             return_value=[{}, "OK"]) as multicall:
+            response = authenticated_client.delete(f"/api/tasks/{sub_id}")
+            assert response.status_code == 200
+            # 活动任务由 aria2 异步停止，此时尚未清除结果
+            multicall.assert_not_awaited()
+
+            await handle_aria2_event(AppState(), "active_gid", "stop")
+
+        multicall.assert_awaited_once_with([
+            ("aria2.tellStatus", ["active_gid"]),
+            ("aria2.removeDownloadResult", ["active_gid"]),
+        ])
@@ -83,3 +83,31 @@ class TestConcurrentFirstUserCreation:
             result = await db.exec(select(User))
             users = result.all()
             assert len(users) == 1
+
+
+class TestUserSpaceLocks:
+    """用户空间锁测试"""
+
+    async def test_lock_shared_while_held_and_released_after(self):
+        """测试同一用户在锁被持有期间拿到同一把锁，无引用后自动回收"""
+        import gc
+
+        from app.core.state import AppState, get_user_space_lock
+
+        state = AppState()
+        lock = await get_user_space_lock(state, 1)
+        assert await get_user_space_lock(state, 1) is lock
+        assert await get_user_space_lock(state, 2) is not lock
+
+        del lock
+        gc.collect()
+        assert len(state.user_space_locks) == 0
+
+    async def test_existing_lock_skips_global_lock(self):
+        """测试已存在的用户锁无需获取全局 state.lock"""
+        from app.core.state import AppState, get_user_space_lock
+
+        state = AppState()
+        lock = await get_user_space_lock(state, 1)
+        async with state.lock:
+            assert await asyncio.wait_for(get_user_space_lock(state, 1), timeout=1) is lock
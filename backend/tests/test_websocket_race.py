@@ -6,6 +6,7 @@ Tests for:
 3. Concurrent broadcast operations
 """
 import asyncio
+import json
 import os
 import tempfile
 from datetime import datetime, timezone
@@ -88,6 +89,9 @@ class MockWebSocket:
             raise ConnectionError("WebSocket connection closed after threshold")
         self.messages.append(data)
 
+    async def send_text(self, data):
+        await self.send_json(json.loads(data))
+
     async def close(self):
         self.closed = True
 
@@ -388,3 +392,50 @@ class TestWebSocketRegistration:
         assert len(remaining) == 5
         for sock in sockets[5:]:
             assert sock in remaining
+
+
+class TestBatchTaskBroadcast:
+    """Test batched task update broadcast used by the sync loop."""
+
+    @pytest.mark.asyncio
+    async def test_batch_broadcast_sends_one_frame_per_socket(self, temp_db_ws, test_user_ws, mock_app_state_ws):
+        """All updated tasks of a user arrive in a single task_updates frame."""
+        from app.routers.tasks import broadcast_task_updates_to_subscribers
+
+        user_id = test_user_ws["id"]
+        task_ids = []
+        async with get_session() as db:
+            for i in range(3):
+                task = DownloadTask(
+                    uri_hash=f"batch_hash_{i}",
+                    uri=f"https://example.com/batch_{i}.zip",
+                    gid=f"gid_batch_{i}",
+                    status="active",
+                    created_at=utc_now_str(),
+                    updated_at=utc_now_str(),
+                )
+                db.add(task)
+                await db.commit()
+                await db.refresh(task)
+                task_ids.append(task.id)
+                db.add(UserTaskSubscription(
+                    owner_id=user_id,
+                    task_id=task.id,
+                    status="pending",
+                    created_at=utc_now_str(),
+                ))
+                await db.commit()
+
+        good_socket = MockWebSocket()
+        bad_socket = MockWebSocket(should_fail=True)
+        mock_app_state_ws.ws_connections[user_id] = {good_socket, bad_socket}
+
+        await broadcast_task_updates_to_subscribers(mock_app_state_ws, task_ids)
+
+        assert good_socket.send_count == 1
+        message = good_socket.messages[0]
+        assert message["type"] == "task_updates"
+        assert sorted(t["uri"] for t in message["tasks"]) == [
+            f"https://example.com/batch_{i}.zip" for i in range(3)
+        ]
+        assert bad_socket not in mock_app_state_ws.ws_connections[user_id]
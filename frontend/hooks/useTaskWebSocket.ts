@@ -57,6 +57,10 @@ export function useTaskWebSocket(callbacks: TaskWebSocketCallbacks) {
           const payload = JSON.parse(event.data);
           if (payload.type === "task_update") {
             callbacksRef.current.onTaskUpdate(payload.task);
+          } else if (payload.type === "task_updates") {
+            for (const task of payload.tasks) {
+              callbacksRef.current.onTaskUpdate(task);
+            }
           } else if (payload.type === "notification") {
             const level =
               payload.level === "error"